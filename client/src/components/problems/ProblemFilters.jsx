@@ -1,4 +1,4 @@
-const ProblemFilters = ({ filters, onFilterChange }) => {
+const ProblemFilters = ({ filters, facets, onFilterChange }) => {
   const difficulties = ['All', 'Easy', 'Medium', 'Hard'];
   const categories = [
     'All',
@@ -17,6 +17,19 @@ const ProblemFilters = ({ filters, onFilterChange }) => {
     'Queues',
   ];
 
+  // "(12)", or "(3/12)" with the user's completed count, from /api/problems/facets
+  const facetCount = (counts, value) =>
+    value === 'All'
+      ? Object.values(counts).reduce((sum, count) => sum + count, 0)
+      : counts[value] || 0;
+
+  const countLabel = (facet, value) => {
+    if (!facets) return '';
+    const count = facetCount(facets[facet], value);
+    if (!facets.completed) return ` (${count})`;
+    return ` (${facetCount(facets.completed[facet], value)}/${count})`;
+  };
+
   const handleDifficultyChange = (difficulty) => {
     onFilterChange({
       ...filters,
@@ -64,6 +77,7 @@ const ProblemFilters = ({ filters, onFilterChange }) => {
               }`}
             >
               {diff}
+              {countLabel('difficulty', diff)}
             </button>
           ))}
         </div>
@@ -79,6 +93,7 @@ const ProblemFilters = ({ filters, onFilterChange }) => {
           {categories.map((cat) => (
             <option key={cat} value={cat}>
               {cat}
+              {countLabel('category', cat)}
             </option>
           ))}
         </select>
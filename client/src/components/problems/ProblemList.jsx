@@ -12,6 +12,7 @@ const ProblemList = ({ onTrackProblem }) => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [showAddForm, setShowAddForm] = useState(false);
+  const [facets, setFacets] = useState(null);
   const [filters, setFilters] = useState({
     search: '',
     difficulty: '',
@@ -26,6 +27,10 @@ const ProblemList = ({ onTrackProblem }) => {
     applyFilters();
   }, [problems, filters]);
 
+  useEffect(() => {
+    fetchFacets();
+  }, [filters.difficulty, filters.category, isAuthenticated]);
+
   const fetchProblems = async () => {
     try {
       setLoading(true);
@@ -40,6 +45,16 @@ const ProblemList = ({ onTrackProblem }) => {
     }
   };
 
+  const fetchFacets = async () => {
+    try {
+      setFacets(await problemService.getFacets(filters, isAuthenticated));
+    } catch (err) {
+      // Counts are optional; the filters work without them
+      setFacets(null);
+      console.error('Error fetching facet counts:', err);
+    }
+  };
+
   const applyFilters = () => {
     let filtered = [...problems];
 
@@ -67,6 +82,7 @@ const ProblemList = ({ onTrackProblem }) => {
   const handleAddSuccess = () => {
     setShowAddForm(false);
     fetchProblems();
+    fetchFacets();
   };
 
   if (loading) {
@@ -107,7 +123,7 @@ const ProblemList = ({ onTrackProblem }) => {
         </div>
       )}
 
-      <ProblemFilters filters={filters} onFilterChange={setFilters} />
+      <ProblemFilters filters={filters} facets={facets} onFilterChange={setFilters} />
 
       <div className="my-4 text-gray-400">
         <p>Showing {filteredProblems.length} of {problems.length} problems</p>
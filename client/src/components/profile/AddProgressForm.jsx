@@ -46,7 +46,7 @@ const AddProgressForm = ({ onSuccess, onCancel }) => {
 
       await problemService.trackProblem({
         user_id: user.id,
-        problem_id: values.problem_id,
+        problem_id: Number(values.problem_id),
         status: values.status,
         num_attempts: values.num_attempts,
         notes: values.notes || '',
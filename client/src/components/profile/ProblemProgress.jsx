@@ -5,7 +5,7 @@ const ProblemProgress = ({ userProblem, problemDetails, onUpdate, onDelete }) =>
   const [isEditing, setIsEditing] = useState(false);
   const [formData, setFormData] = useState({
     status: userProblem.status,
-    notes: userProblem.notes || '',
+    notes: userProblem.notes_preview || '',
     num_attempts: userProblem.num_attempts || 1,
   });
   const [loading, setLoading] = useState(false);
@@ -36,6 +36,29 @@ const ProblemProgress = ({ userProblem, problemDetails, onUpdate, onDelete }) =>
     }
   };
 
+  // Lists only carry notes_preview; load the full notes before editing them
+  const handleToggleEdit = async () => {
+    if (isEditing) {
+      setIsEditing(false);
+      return;
+    }
+    try {
+      setLoading(true);
+      const full = await problemService.getUserProblem(userProblem.user_id, userProblem.problem_id);
+      setFormData({
+        status: full.status,
+        notes: full.notes || '',
+        num_attempts: full.num_attempts || 1,
+      });
+      setIsEditing(true);
+    } catch (error) {
+      console.error('Failed to load notes:', error);
+      alert('Failed to load notes');
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleUpdate = async () => {
     try {
       setLoading(true);
@@ -54,6 +77,19 @@ const ProblemProgress = ({ userProblem, problemDetails, onUpdate, onDelete }) =>
     }
   };
 
+  const handleLogAttempt = async () => {
+    try {
+      setLoading(true);
+      await problemService.logAttempt(userProblem.user_id, userProblem.problem_id);
+      if (onUpdate) onUpdate();
+    } catch (error) {
+      console.error('Failed to log attempt:', error);
+      alert('Failed to log attempt');
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleDelete = async () => {
     if (confirm('Are you sure you want to remove this problem from your tracking?')) {
       try {
@@ -96,7 +132,8 @@ const ProblemProgress = ({ userProblem, problemDetails, onUpdate, onDelete }) =>
           </div>
         </div>
         <button
-          onClick={() => setIsEditing(!isEditing)}
+          onClick={handleToggleEdit}
+          disabled={loading}
           className="ml-4 px-4 py-2 bg-transparent border border-slate-600 rounded-lg text-sm font-medium text-gray-300 hover:border-blue-500 hover:text-blue-400 transition-all"
         >
           {isEditing ? 'Cancel' : 'Edit'}
@@ -168,16 +205,23 @@ const ProblemProgress = ({ userProblem, problemDetails, onUpdate, onDelete }) =>
             <div className="bg-slate-700/50 rounded-lg p-3">
               <span className="block text-gray-500 text-xs uppercase tracking-wide mb-1">Attempts</span>
               <span className="text-white font-semibold">{userProblem.num_attempts}</span>
+              <button
+                onClick={handleLogAttempt}
+                disabled={loading}
+                className="ml-2 px-2 py-0.5 text-xs bg-slate-600 text-gray-200 rounded hover:bg-blue-500 disabled:opacity-50 disabled:cursor-not-allowed transition-all"
+              >
+                +1
+              </button>
             </div>
             <div className="bg-slate-700/50 rounded-lg p-3">
               <span className="block text-gray-500 text-xs uppercase tracking-wide mb-1">Date</span>
               <span className="text-white font-semibold">{userProblem.date_attempted}</span>
             </div>
           </div>
-          {userProblem.notes && (
+          {userProblem.notes_preview && (
             <div className="mt-4 pt-4 border-t border-slate-700">
               <span className="block text-gray-500 text-xs uppercase tracking-wide mb-2">Notes</span>
-              <p className="m-0 text-gray-300 leading-relaxed whitespace-pre-wrap">{userProblem.notes}</p>
+              <p className="m-0 text-gray-300 leading-relaxed whitespace-pre-wrap">{userProblem.notes_preview}</p>
             </div>
           )}
         </div>
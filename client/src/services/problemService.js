@@ -16,6 +16,29 @@ export const problemService = {
     return response.problems || response;
   },
 
+  /**
+   * Get the whole catalog as a cached, versioned snapshot
+   * @returns {Promise} - { version, problems: [...] }
+   */
+  getCatalogSnapshot: async () => {
+    return await api.get('/problems/snapshot');
+  },
+
+  /**
+   * Get problem counts per difficulty and category for the current filters
+   * @param {object} filters - { difficulty, category, tags, match }
+   * @param {boolean} includeCompleted - Also count the current user's completed problems
+   * @returns {Promise} - { total, difficulty: { Easy: n, ... }, category: { Arrays: n, ... }, completed? }
+   */
+  getFacets: async (filters = {}, includeCompleted = false) => {
+    const params = new URLSearchParams();
+    ['difficulty', 'category', 'tags', 'match'].forEach((key) => {
+      if (filters[key]) params.set(key, filters[key]);
+    });
+    if (includeCompleted) params.set('include', 'completed');
+    return await api.get(`/problems/facets?${params}`);
+  },
+
   /**
    * Get a specific problem by ID
    * @param {number} id - Problem ID
@@ -64,7 +87,7 @@ export const problemService = {
   /**
    * Get problems for a specific user
    * @param {number} userId - User ID
-   * @returns {Promise} - Array of user's problem attempts
+   * @returns {Promise} - Array of user's problem attempts, with notes_preview instead of notes
    */
   getUserProblems: async (userId) => {
     return await api.get(`/users/${userId}/problems`);
@@ -79,6 +102,16 @@ export const problemService = {
     return await api.post('/user-problems', attemptData);
   },
 
+  /**
+   * Get one of a user's problem attempts, including its full notes
+   * @param {number} userId - User ID
+   * @param {number} problemId - Problem ID
+   * @returns {Promise} - User-problem object
+   */
+  getUserProblem: async (userId, problemId) => {
+    return await api.get(`/users/${userId}/problems/${problemId}`);
+  },
+
   /**
    * Update user's progress on a problem
    * @param {number} userId - User ID
@@ -90,6 +123,52 @@ export const problemService = {
     return await api.patch(`/users/${userId}/problems/${problemId}`, updates);
   },
 
+  /**
+   * Log one more try at a problem; the server increments num_attempts atomically
+   * @param {number} userId - User ID
+   * @param {number} problemId - Problem ID
+   * @param {object} [attempt] - { status, date_attempted }, defaulting to the current status (Attempted on a first try) and now
+   * @returns {Promise} - Updated user-problem object
+   */
+  logAttempt: async (userId, problemId, attempt = {}) => {
+    return await api.post(`/users/${userId}/problems/${problemId}/attempts`, attempt);
+  },
+
+  /**
+   * Autosave a user's notes on a problem; the server buffers them and writes
+   * the latest within flush_interval seconds (use updateUserProblem for an immediate save)
+   * @param {number} userId - User ID
+   * @param {number} problemId - Problem ID
+   * @param {string} notes - The whole note
+   * @returns {Promise} - { saved_at, flush_interval }
+   */
+  autosaveNotes: async (userId, problemId, notes) => {
+    return await api.put(`/users/${userId}/problems/${problemId}/notes/autosave`, { notes });
+  },
+
+  /**
+   * List the revisions of a user's notes on a problem, newest first
+   * @param {number} userId - User ID
+   * @param {number} problemId - Problem ID
+   * @param {object} [params] - { page, per_page }
+   * @returns {Promise} - { revisions: [{ revision, kind, length, created_at }], page, per_page, total, pages }
+   */
+  getNoteRevisions: async (userId, problemId, params = {}) => {
+    const query = new URLSearchParams(params);
+    return await api.get(`/users/${userId}/problems/${problemId}/notes/revisions?${query}`);
+  },
+
+  /**
+   * Get a user's notes on a problem as of one revision
+   * @param {number} userId - User ID
+   * @param {number} problemId - Problem ID
+   * @param {number} revision - Revision number
+   * @returns {Promise} - { revision, notes }
+   */
+  getNoteRevision: async (userId, problemId, revision) => {
+    return await api.get(`/users/${userId}/problems/${problemId}/notes/revisions/${revision}`);
+  },
+
   /**
    * Delete user's problem attempt
    * @param {number} userId - User ID
@@ -99,6 +178,37 @@ export const problemService = {
   deleteUserProblem: async (userId, problemId) => {
     return await api.delete(`/users/${userId}/problems/${problemId}`);
   },
+
+  /**
+   * Get a user's attempt history, oldest first
+   * @param {number} userId - User ID
+   * @param {number} [problemId] - Only this problem's attempts
+   * @returns {Promise} - { attempts: [{ problem_id, ts, status, attempts }], limit }
+   */
+  getAttemptHistory: async (userId, problemId) => {
+    const path = problemId ? `/users/${userId}/problems/${problemId}/history` : `/users/${userId}/attempts`;
+    return await api.get(path);
+  },
+
+  /**
+   * Get a user's activity per day, week or month
+   * @param {number} userId - User ID
+   * @param {string} bucket - 'day', 'week' or 'month'
+   * @returns {Promise} - { bucket, series: [{ start, events, attempts, by_status, by_difficulty }] }
+   */
+  getTimeseries: async (userId, bucket = 'week') => {
+    return await api.get(`/users/${userId}/timeseries?bucket=${bucket}`);
+  },
+
+  /**
+   * Get catalog and own progress changes since a sync sequence
+   * @param {number} since - The 'seq' returned by the previous call (0 for a full load)
+   * @returns {Promise} - { seq, problems, user_problems, deleted: { problems, user_problems } };
+   *   deleted.user_problems also lists every deleted problem, whose attempts went with it
+   */
+  getChanges: async (since = 0) => {
+    return await api.get(`/changes?since=${since}`);
+  },
 };
 
 export default problemService;
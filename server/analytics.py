@@ -0,0 +1,366 @@
+"""Cohort analytics computed in bulk over columnar NumPy arrays
+
+The insights endpoint never touches UserProblem objects. Instead, the
+user_problems rows and their problems are periodically loaded into flat,
+int-coded arrays and every per-user / per-category statistic is derived from
+them with vectorized bincount and searchsorted calls.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from config import db
+from models.models import UserProblem, Problem
+from sharding import fan_out
+
+# Status codes used in the columnar arrays (order matters: index == code)
+STATUSES = ('Completed', 'Attempted', 'Skipped')
+STATUS_COMPLETED = 0
+STATUS_SKIPPED = 2
+
+# How long a computed snapshot is served before a refresh is triggered
+REFRESH_SECONDS = int(os.getenv('ANALYTICS_REFRESH_SECONDS', '300'))
+
+# Rows fetched per round trip while loading the snapshot
+LOAD_BATCH_SIZE = 10000
+
+# Number of categories reported as weakest areas
+WEAKEST_AREAS_LIMIT = 3
+
+# Empirical difficulty fit: Newton rounds and precision of the N(0, 1) priors
+DIFFICULTY_ITERATIONS = 30
+DIFFICULTY_PRIOR = 1.0
+
+
+class CohortSnapshot:
+    """Immutable, precomputed cohort statistics for every user"""
+
+    def __init__(self, user_ids, status, num_attempts, day, difficulty, category,
+                 difficulty_labels, category_labels):
+        self.generated_at = datetime.now(timezone.utc)
+        self.difficulty_labels = difficulty_labels
+        self.category_labels = category_labels
+
+        # Columnar, int-coded attempt data
+        self.status = status
+        self.num_attempts = num_attempts
+        self.day = day
+        self.difficulty = difficulty
+        self.category = category
+
+        self.user_ids, user_idx = np.unique(user_ids, return_inverse=True)
+        self.user_rows = {int(uid): row for row, uid in enumerate(self.user_ids)}
+        self._compute(user_idx)
+
+    def _compute(self, user_idx):
+        n_users = len(self.user_ids)
+        n_categories = len(self.category_labels)
+        size = n_users * n_categories
+
+        tried_mask = self.status != STATUS_SKIPPED
+        completed_mask = self.status == STATUS_COMPLETED
+        cell = user_idx * n_categories + self.category
+
+        # Per-user / per-category counts, shape (n_users, n_categories)
+        self.tried = np.bincount(cell, weights=tried_mask, minlength=size).reshape(n_users, n_categories)
+        self.completed = np.bincount(cell, weights=completed_mask, minlength=size).reshape(n_users, n_categories)
+        attempts = np.bincount(cell, weights=self.num_attempts * tried_mask, minlength=size).reshape(n_users, n_categories)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.success_rate = np.where(self.tried > 0, self.completed / self.tried, np.nan)
+            self.efficiency = np.where(attempts > 0, self.completed / attempts, np.nan)
+
+            # Per-user totals across all categories
+            self.total_tried = self.tried.sum(axis=1)
+            self.total_completed = self.completed.sum(axis=1)
+            total_attempts = attempts.sum(axis=1)
+            self.overall_success = np.where(self.total_tried > 0, self.total_completed / self.total_tried, np.nan)
+            self.overall_efficiency = np.where(total_attempts > 0, self.total_completed / total_attempts, np.nan)
+
+            # Cohort-wide success rate per category
+            cohort_tried = self.tried.sum(axis=0)
+            self.cohort_success = np.where(cohort_tried > 0, self.completed.sum(axis=0) / cohort_tried, np.nan)
+
+        # Distinct active days per user
+        if len(self.day):
+            pairs = np.unique(np.stack([user_idx, self.day]), axis=1)
+            self.active_days = np.bincount(pairs[0], minlength=n_users)
+        else:
+            self.active_days = np.zeros(n_users, dtype=np.int64)
+
+        # Percentile ranks within the cohort
+        self.success_percentile = np.column_stack(
+            [_percentile_rank(self.success_rate[:, c]) for c in range(n_categories)]
+        ) if n_categories else np.empty((n_users, 0))
+        self.overall_success_percentile = _percentile_rank(self.overall_success)
+        self.overall_efficiency_percentile = _percentile_rank(self.overall_efficiency)
+
+    @property
+    def cohort_size(self):
+        return len(self.user_ids)
+
+    def insights_for(self, user_id):
+        """Return the precomputed insights for a single user as a dict"""
+        row = self.user_rows.get(user_id)
+        result = {
+            'user_id': user_id,
+            'generated_at': self.generated_at.isoformat(),
+            'cohort_size': self.cohort_size,
+        }
+
+        if row is None:
+            result.update({'overall': None, 'categories': [], 'weakest_areas': []})
+            return result
+
+        result['overall'] = {
+            'tried': int(self.total_tried[row]),
+            'completed': int(self.total_completed[row]),
+            'success_rate': _as_float(self.overall_success[row]),
+            'success_rate_percentile': _as_float(self.overall_success_percentile[row]),
+            'attempt_efficiency': _as_float(self.overall_efficiency[row]),
+            'attempt_efficiency_percentile': _as_float(self.overall_efficiency_percentile[row]),
+            'active_days': int(self.active_days[row]),
+        }
+
+        categories = []
+        for c in np.flatnonzero(self.tried[row] > 0):
+            categories.append({
+                'category': self.category_labels[c],
+                'tried': int(self.tried[row, c]),
+                'completed': int(self.completed[row, c]),
+                'success_rate': _as_float(self.success_rate[row, c]),
+                'cohort_success_rate': _as_float(self.cohort_success[c]),
+                'percentile': _as_float(self.success_percentile[row, c]),
+                'attempt_efficiency': _as_float(self.efficiency[row, c]),
+            })
+        result['categories'] = categories
+
+        # Weakest areas: lowest percentile first, then lowest raw success rate
+        ranked = sorted(categories, key=lambda c: (c['percentile'], c['success_rate']))
+        result['weakest_areas'] = [c['category'] for c in ranked[:WEAKEST_AREAS_LIMIT]]
+        return result
+
+
+def _percentile_rank(values):
+    """Midpoint percentile rank (0-100) of each value among the non-NaN values"""
+    ranks = np.full(values.shape, np.nan)
+    valid = ~np.isnan(values)
+    population = np.sort(values[valid])
+    if not len(population):
+        return ranks
+
+    below = np.searchsorted(population, values[valid], side='left')
+    at_or_below = np.searchsorted(population, values[valid], side='right')
+    ranks[valid] = (below + at_or_below) / 2.0 / len(population) * 100.0
+    return ranks
+
+
+def _as_float(value):
+    """Convert a NumPy scalar to a JSON-friendly float (NaN becomes None)"""
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
+
+
+def _encode(labels, values):
+    """Int-code a list of strings against a growing label table"""
+    index = {label: code for code, label in enumerate(labels)}
+    codes = np.empty(len(values), dtype=np.int64)
+    for i, value in enumerate(values):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(labels)
+            labels.append(value)
+        codes[i] = code
+    return codes
+
+
+def _to_day(date_strings):
+    """Convert ISO date strings to days since the Unix epoch"""
+    return np.array([s[:10] for s in date_strings], dtype='datetime64[D]').astype(np.int64)
+
+
+def _load_shard(connection):
+    """One shard's user_problems rows as columnar arrays, problems still as ids"""
+    table = UserProblem.__table__
+    stmt = db.select(table.c.user_id, table.c.problem_id, table.c.status, table.c.num_attempts, table.c.date_attempted)
+    chunks = {name: [] for name in ('user_id', 'problem_id', 'status', 'num_attempts', 'day')}
+
+    for batch in connection.execution_options(yield_per=LOAD_BATCH_SIZE).execute(stmt).partitions():
+        user_id, problem_id, status, num_attempts, date_attempted = zip(*batch)
+        chunks['user_id'].append(np.array(user_id, dtype=np.int64))
+        chunks['problem_id'].append(np.array(problem_id, dtype=np.int64))
+        chunks['status'].append(_encode(list(STATUSES), status))
+        chunks['num_attempts'].append(np.array([n or 1 for n in num_attempts], dtype=np.int64))
+        chunks['day'].append(_to_day(date_attempted))
+    return chunks
+
+
+def load_columns():
+    """
+    Every shard's user_problems rows, read in parallel, as concatenated columns
+    Returns: {'user_id', 'problem_id', 'status', 'num_attempts', 'day': array}
+    """
+    chunks = {name: [] for name in ('user_id', 'problem_id', 'status', 'num_attempts', 'day')}
+    for shard_chunks in fan_out(_load_shard).values():
+        for name, parts in shard_chunks.items():
+            chunks[name].extend(parts)
+    return {
+        name: np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        for name, parts in chunks.items()
+    }
+
+
+def load_snapshot():
+    """
+    Load user_problems and their problems' difficulty and category into columnar arrays
+
+    user_problems may be spread over several shards (sharding.py), so it is
+    read from each in parallel and joined to the catalog here, by indexing
+    per-problem code arrays with the problem ids.
+    """
+    difficulty_labels, category_labels = [], []
+    catalog = db.session.execute(db.select(Problem.id, Problem.difficulty, Problem.category)).all()
+    size = max((problem_id for problem_id, _, _ in catalog), default=-1) + 1
+    problem_difficulty = np.full(size, -1, dtype=np.int64)
+    problem_category = np.full(size, -1, dtype=np.int64)
+    if catalog:
+        problem_ids, difficulties, categories = zip(*catalog)
+        problem_difficulty[list(problem_ids)] = _encode(difficulty_labels, difficulties)
+        problem_category[list(problem_ids)] = _encode(category_labels, categories)
+
+    columns = load_columns()
+
+    # Inner join: drop rows whose problem no longer exists
+    problem_id = columns.pop('problem_id')
+    known = problem_id < size
+    known[known] = problem_difficulty[problem_id[known]] >= 0
+    columns = {name: values[known] for name, values in columns.items()}
+    problem_id = problem_id[known]
+
+    return CohortSnapshot(
+        columns['user_id'], columns['status'], columns['num_attempts'], columns['day'],
+        problem_difficulty[problem_id], problem_category[problem_id], difficulty_labels, category_labels
+    )
+
+
+# Process-wide snapshot cache
+_snapshot = None
+_snapshot_loaded_at = 0.0
+_refresh_lock = threading.Lock()
+
+
+def refresh_snapshot():
+    """Rebuild the cached snapshot from the database"""
+    global _snapshot, _snapshot_loaded_at
+    snapshot = load_snapshot()
+    _snapshot, _snapshot_loaded_at = snapshot, time.monotonic()
+    return snapshot
+
+
+def _refresh_in_background(app):
+    def run():
+        try:
+            with app.app_context():
+                refresh_snapshot()
+        finally:
+            _refresh_lock.release()
+
+    threading.Thread(target=run, name='analytics-refresh', daemon=True).start()
+
+
+def get_snapshot(app):
+    """
+    Return the cached snapshot, refreshing it when stale
+
+    The first call builds the snapshot synchronously. After that, a stale
+    snapshot keeps being served while a single background thread rebuilds it.
+    """
+    if _snapshot is None:
+        with _refresh_lock:
+            if _snapshot is None:
+                refresh_snapshot()
+        return _snapshot
+
+    if time.monotonic() - _snapshot_loaded_at > REFRESH_SECONDS and _refresh_lock.acquire(blocking=False):
+        _refresh_in_background(app)
+
+    return _snapshot
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def fit_difficulty(user_idx, problem_idx, outcome, n_users, n_problems, iterations=DIFFICULTY_ITERATIONS):
+    """
+    Fit a Rasch model, P(solve) = sigmoid(ability[user] - difficulty[problem]),
+    by alternating per-parameter Newton steps computed with bincount
+
+    outcome is in [0, 1] per row. The N(0, 1) priors shrink rarely tried
+    problems towards the average, so one unlucky user can't make an easy
+    problem look hard.
+    Returns: (ability per user, difficulty per problem), in logits
+    """
+    ability = np.zeros(n_users)
+    difficulty = np.zeros(n_problems)
+    for _ in range(iterations):
+        p = _sigmoid(ability[user_idx] - difficulty[problem_idx])
+        gradient = np.bincount(user_idx, weights=outcome - p, minlength=n_users) - DIFFICULTY_PRIOR * ability
+        curvature = np.bincount(user_idx, weights=p * (1 - p), minlength=n_users) + DIFFICULTY_PRIOR
+        ability += gradient / curvature
+
+        p = _sigmoid(ability[user_idx] - difficulty[problem_idx])
+        gradient = np.bincount(problem_idx, weights=p - outcome, minlength=n_problems) - DIFFICULTY_PRIOR * difficulty
+        curvature = np.bincount(problem_idx, weights=p * (1 - p), minlength=n_problems) + DIFFICULTY_PRIOR
+        difficulty += gradient / curvature
+    return ability, difficulty
+
+
+def problem_stats(problem_ids):
+    """
+    Solve counters and empirical difficulty of the given problems, from every user's rows
+
+    Skipped rows don't count. A completion scores 1 / num_attempts, so a
+    first-try solve counts fully and a grind only partially. The fitted
+    difficulty is calibrated against the median user: the score is the
+    chance (0-100) that they don't solve the problem first try.
+    Returns: {problem_id: (attempt_count, completion_count, attempts_total, empirical_difficulty)}
+    """
+    columns = load_columns()
+    tried = columns['status'] != STATUS_SKIPPED
+    columns = {name: values[tried] for name, values in columns.items()}
+
+    # Inner join on a dense id -> position lookup, as in load_snapshot()
+    n_problems = len(problem_ids)
+    lookup = np.full(max(problem_ids, default=-1) + 1, -1, dtype=np.int64)
+    lookup[list(problem_ids)] = np.arange(n_problems)
+    problem_idx = np.full(len(columns['problem_id']), -1, dtype=np.int64)
+    in_range = columns['problem_id'] < len(lookup)
+    problem_idx[in_range] = lookup[columns['problem_id'][in_range]]
+    known = problem_idx >= 0
+    columns = {name: values[known] for name, values in columns.items()}
+    problem_idx = problem_idx[known]
+
+    completed = columns['status'] == STATUS_COMPLETED
+    attempt_count = np.bincount(problem_idx, minlength=n_problems)
+    completion_count = np.bincount(problem_idx, weights=completed, minlength=n_problems)
+    attempts_total = np.bincount(problem_idx, weights=columns['num_attempts'], minlength=n_problems)
+
+    users, user_idx = np.unique(columns['user_id'], return_inverse=True)
+    outcome = np.where(completed, 1.0 / np.maximum(columns['num_attempts'], 1), 0.0)
+    ability, difficulty = fit_difficulty(user_idx, problem_idx, outcome, len(users), n_problems)
+    median_ability = float(np.median(ability)) if len(users) else 0.0
+    score = 100.0 * (1.0 - _sigmoid(median_ability - difficulty))
+
+    return {
+        problem_id: (
+            int(attempt_count[i]),
+            int(completion_count[i]),
+            int(attempts_total[i]),
+            round(float(score[i]), 2) if attempt_count[i] else None,
+        )
+        for i, problem_id in enumerate(problem_ids)
+    }
@@ -1,10 +1,64 @@
-from config import app
-from routes.routes import *
-from models.models import *
+from flask import Flask
+from config import db, migrate, bcrypt, api, load_config, init_cors
 
+
+def create_app(config_overrides=None):
+    """
+    Application factory
+
+    Route modules are imported here rather than at module import time, so
+    importing this file is cheap. Heavy dependencies (authlib, requests,
+    numpy) are only imported by the handlers that need them, on first use.
+    """
+    app = Flask(__name__)
+    load_config(app, config_overrides)
+
+    # Initialize extensions
+    db.init_app(app)
+    migrate.init_app(app, db)
+    bcrypt.init_app(app)
+
+    # Importing the route modules queues their resources on the shared Api
+    from routes.routes import auth_bp, events_bp
+    from review import reschedule_reviews_command
+    from attempts import rebuild_summaries_command, create_partitions_command, archive_attempts_command
+    from rollups import rebuild_rollups_command
+    from problem_stats import refresh_problem_stats_command
+    from jobs import jobs_cli, init_jobs
+    from sharding import shards_cli, init_sharding
+    from profiling import init_profiling
+    from health import init_health_checks
+    from autosave import init_autosave
+    from events import init_events
+
+    init_sharding(app)
+    api.init_app(app)
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(events_bp)
+    app.cli.add_command(reschedule_reviews_command)
+    app.cli.add_command(rebuild_summaries_command)
+    app.cli.add_command(create_partitions_command)
+    app.cli.add_command(archive_attempts_command)
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(refresh_problem_stats_command)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(shards_cli)
+    init_jobs(app)
+    init_profiling(app)
+    init_autosave(app)
+    # Every process publishes its committed changes, whether or not it serves event streams
+    init_events(app)
+
+    init_cors(app)
+    init_health_checks(app)
+
+    return app
+
+
+# Development server; production runs wsgi.py under gunicorn (gunicorn.conf.py)
 if __name__ == "__main__":
+    app = create_app()
     # Debug mode is configured in config.py based on FLASK_ENV
     # In development: debug=True
     # In production: debug=False
     app.run(port=5555, debug=app.config['DEBUG'])
-
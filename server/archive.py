@@ -0,0 +1,288 @@
+"""
+Memory-mapped columnar archive of old attempt events
+
+attempts.archive_attempts moves events older than ATTEMPT_ARCHIVE_DAYS out of
+attempt_events into append-only segments: one directory per batch with a
+.npy file per column, rows sorted by (user_id, ts, id), plus a per-user
+index (user_ids.npy, offsets.npy). Reading one user's history is a binary
+search and a contiguous slice of memory-mapped arrays, so only the pages
+touched are read from disk.
+
+manifest.json lists the segments and is replaced atomically, so readers see
+whole segments only. Segments are never modified in place: deleting history
+records an AttemptArchiveDeletion, readers hide matching rows archived
+before it, and compact() later rewrites the affected segments without them.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+
+import numpy as np
+
+MANIFEST = 'manifest.json'
+
+# Column dtypes; status is int-coded against each segment's own label table
+COLUMNS = {
+    'id': np.int64,
+    'user_id': np.int64,
+    'problem_id': np.int64,
+    'ts': 'datetime64[us]',
+    'status': np.int16,
+    'attempts': np.int64,
+}
+
+_manifest_lock = threading.Lock()
+
+# Parsed manifest per directory: directory -> (mtime_ns, [Segment])
+_segments = {}
+
+
+class Segment:
+    """One immutable segment; columns are memory-mapped on first use"""
+
+    def __init__(self, directory, entry):
+        self.name = entry['name']
+        self.path = os.path.join(directory, entry['name'])
+        self.rows = entry['rows']
+        self.statuses = np.array(entry['statuses'], dtype=object)
+        self.archived_at = datetime.fromisoformat(entry['archived_at'])
+        self.min_ts = np.datetime64(entry['min_ts'], 'us')
+        self.max_ts = np.datetime64(entry['max_ts'], 'us')
+        self._arrays = {}
+
+    def column(self, name):
+        array = self._arrays.get(name)
+        if array is None:
+            array = self._arrays[name] = np.load(os.path.join(self.path, f'{name}.npy'), mmap_mode='r')
+        return array
+
+    def user_rows(self, user_id):
+        """Slice of the rows belonging to user_id"""
+        user_ids = self.column('user_ids')
+        i = int(np.searchsorted(user_ids, user_id))
+        if i == len(user_ids) or user_ids[i] != user_id:
+            return slice(0, 0)
+        offsets = self.column('offsets')
+        return slice(int(offsets[i]), int(offsets[i + 1]))
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'segments': []}
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def segments(directory):
+    """The directory's current segments, re-read only when the manifest changes"""
+    try:
+        mtime = os.stat(os.path.join(directory, MANIFEST)).st_mtime_ns
+    except FileNotFoundError:
+        return []
+
+    cached = _segments.get(directory)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    loaded = [Segment(directory, entry) for entry in _read_manifest(directory)['segments']]
+    _segments[directory] = (mtime, loaded)
+    return loaded
+
+
+def _write_segment_files(directory, columns, statuses, archived_at):
+    """Sort and index columns into a new segment directory; returns its manifest entry"""
+    order = np.lexsort((columns['id'], columns['ts'], columns['user_id']))
+    columns = {name: np.ascontiguousarray(columns[name][order]) for name in COLUMNS}
+    user_ids, starts = np.unique(columns['user_id'], return_index=True)
+
+    name = f'segment-{int(columns["id"].min())}-{uuid.uuid4().hex[:8]}'
+    tmp_path = os.path.join(directory, f'.{name}.tmp')
+    os.makedirs(tmp_path)
+    for column, values in columns.items():
+        np.save(os.path.join(tmp_path, f'{column}.npy'), values)
+    np.save(os.path.join(tmp_path, 'user_ids.npy'), user_ids)
+    np.save(os.path.join(tmp_path, 'offsets.npy'), np.append(starts, len(order)).astype(np.int64))
+    os.rename(tmp_path, os.path.join(directory, name))
+
+    return {
+        'name': name,
+        'rows': len(order),
+        'statuses': list(statuses),
+        'archived_at': archived_at.isoformat(),
+        'min_ts': str(columns['ts'].min()),
+        'max_ts': str(columns['ts'].max()),
+    }
+
+
+def write_segment(directory, rows, archived_at):
+    """
+    Append a segment holding rows of (id, user_id, problem_id, ts, status, attempts)
+    archived_at is when the rows were read from attempt_events
+    """
+    os.makedirs(directory, exist_ok=True)
+    ids, user_ids, problem_ids, ts, status, attempts = zip(*rows)
+    statuses, codes = np.unique(np.array(status, dtype=object), return_inverse=True)
+    entry = _write_segment_files(directory, {
+        'id': np.array(ids, dtype=np.int64),
+        'user_id': np.array(user_ids, dtype=np.int64),
+        'problem_id': np.array(problem_ids, dtype=np.int64),
+        'ts': np.array(ts, dtype='datetime64[us]'),
+        'status': codes.astype(np.int16),
+        'attempts': np.array(attempts, dtype=np.int64),
+    }, statuses, archived_at)
+
+    with _manifest_lock:
+        manifest = _read_manifest(directory)
+        manifest['segments'].append(entry)
+        _write_manifest(directory, manifest)
+
+
+def last_segment_keys(directory):
+    """(user_id, ts, id) of every row in the newest segment"""
+    found = segments(directory)
+    if not found:
+        return []
+    segment = found[-1]
+    return list(zip(
+        segment.column('user_id').tolist(),
+        segment.column('ts').astype('datetime64[us]').tolist(),
+        segment.column('id').tolist(),
+    ))
+
+
+def _hidden(segment, columns, deletions):
+    """Mask of rows removed by deletions recorded after the segment was archived"""
+    hidden = np.zeros(len(columns['id']), dtype=bool)
+    for user_id, problem_id, deleted_at in deletions:
+        if deleted_at <= segment.archived_at:
+            continue
+        match = np.ones(len(hidden), dtype=bool)
+        if user_id is not None:
+            match &= columns['user_id'] == user_id
+        if problem_id is not None:
+            match &= columns['problem_id'] == problem_id
+        hidden |= match
+    return hidden
+
+
+def _segment_rows(segment, deletions, user_id=None, problem_id=None, start=None, end=None):
+    """A segment's visible rows matching the filters, as columns (status decoded)"""
+    rows = segment.user_rows(user_id) if user_id is not None else slice(None)
+    columns = {name: np.asarray(segment.column(name)[rows]) for name in COLUMNS}
+
+    keep = ~_hidden(segment, columns, deletions)
+    if problem_id is not None:
+        keep &= columns['problem_id'] == problem_id
+    if start is not None:
+        keep &= columns['ts'] >= np.datetime64(start, 'us')
+    if end is not None:
+        keep &= columns['ts'] < np.datetime64(end, 'us')
+
+    columns = {name: values[keep] for name, values in columns.items()}
+    columns['status'] = segment.statuses[columns['status']]
+    return columns
+
+
+def scan(directory, deletions, user_id=None):
+    """Visible rows of every segment, one column dict per segment"""
+    for segment in segments(directory):
+        columns = _segment_rows(segment, deletions, user_id=user_id)
+        if len(columns['id']):
+            yield columns
+
+
+def history(directory, deletions, user_id, problem_id=None, start=None, end=None, limit=None):
+    """
+    A user's archived events in (ts, id) order, the first limit of them
+    Returns: list of (id, user_id, problem_id, ts, status, attempts) tuples
+    """
+    parts = []
+    for segment in segments(directory):
+        if (start is not None and segment.max_ts < np.datetime64(start, 'us')) or \
+                (end is not None and segment.min_ts >= np.datetime64(end, 'us')):
+            continue
+        columns = _segment_rows(segment, deletions, user_id, problem_id, start, end)
+        if len(columns['id']):
+            parts.append(columns)
+    if not parts:
+        return []
+
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+    order = np.lexsort((columns['id'], columns['ts']))[:limit]
+    return list(zip(*(
+        (columns[name][order].astype('datetime64[us]') if name == 'ts' else columns[name][order]).tolist()
+        for name in COLUMNS
+    )))
+
+
+def pair_totals(directory, deletions, user_id=None):
+    """
+    Per (user_id, problem_id): summed attempts and the id, ts and status of
+    the latest archived event, computed per segment with sorted reductions
+    Returns: {(user_id, problem_id): [attempts, last_id, ts, status]}
+    """
+    totals = {}
+    for columns in scan(directory, deletions, user_id):
+        order = np.lexsort((columns['id'], columns['problem_id'], columns['user_id']))
+        users, problems = columns['user_id'][order], columns['problem_id'][order]
+        starts = np.flatnonzero(np.r_[True, (users[1:] != users[:-1]) | (problems[1:] != problems[:-1])])
+        sums = np.add.reduceat(columns['attempts'][order], starts)
+        last = order[np.r_[starts[1:], len(order)] - 1]
+
+        ts = columns['ts'][last].astype('datetime64[us]').tolist()
+        for i, row in enumerate(last.tolist()):
+            key = (int(users[starts[i]]), int(problems[starts[i]]))
+            event_id = int(columns['id'][row])
+            total = totals.get(key)
+            if total is None:
+                totals[key] = [int(sums[i]), event_id, ts[i], columns['status'][row]]
+                continue
+            total[0] += int(sums[i])
+            if event_id > total[1]:
+                total[1:] = [event_id, ts[i], columns['status'][row]]
+    return totals
+
+
+def compact(directory, deletions):
+    """
+    Rewrite segments that contain deleted rows without them
+    Returns: number of segments rewritten or dropped
+    """
+    changed = {}
+    for segment in segments(directory):
+        columns = {name: np.asarray(segment.column(name)) for name in COLUMNS}
+        hidden = _hidden(segment, columns, deletions)
+        if not hidden.any():
+            continue
+        if hidden.all():
+            changed[segment.name] = None
+            continue
+        kept = {name: values[~hidden] for name, values in columns.items()}
+        changed[segment.name] = _write_segment_files(
+            directory, kept, segment.statuses.tolist(), segment.archived_at
+        )
+
+    if not changed:
+        return 0
+    with _manifest_lock:
+        manifest = _read_manifest(directory)
+        manifest['segments'] = [
+            changed.get(entry['name'], entry) for entry in manifest['segments']
+            if changed.get(entry['name'], entry) is not None
+        ]
+        _write_manifest(directory, manifest)
+    # Readers that still have the old files mapped keep them until they reopen
+    for name in changed:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    return len(changed)
@@ -0,0 +1,435 @@
+"""
+Append-only attempt history and the user_problems summary derived from it
+
+Every try at a problem appends one attempt_events row, a plain INSERT with no
+read of existing history, and bumps the activity rollups (rollups.py). The
+user_problems row for the pair is a summary of its events: num_attempts is
+the sum of their attempt counts, and date_attempted/status come from the
+most recently recorded event. It is kept up to date incrementally as events
+are appended and can be rebuilt from the log with
+`flask rebuild-attempt-summaries`.
+
+On Postgres attempt_events is range-partitioned by month on ts, so chart
+queries only touch the months they cover and old months can be detached or
+archived cheaply. A daily job (or `flask create-attempt-partitions`) creates
+upcoming months ahead of time; anything outside them lands in the default partition.
+
+Events older than ATTEMPT_ARCHIVE_DAYS are moved by a nightly job (or
+`flask archive-attempts`) into memory-mapped columnar segments (archive.py).
+History reads and rebuilds merge the archive with the live table, so the hot
+table and its indexes only hold recent events.
+"""
+import os
+from datetime import date, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from config import db
+from models.models import AttemptEvent, AttemptArchiveDeletion, Problem, UserProblem
+from review import parse_review_time, utcnow, bulk_reschedule, schedule_review
+from changes import next_change_seq, stamp_change
+from sharding import update_user_problems, shard_for_user
+from rollups import add_to_rollups, rollup_difficulty
+from problem_stats import update_problem_stats
+from jobs import job_handler, PRIORITY_LOW
+
+# Months of partitions created ahead of the current one (Postgres only)
+PARTITION_MONTHS_AHEAD = int(os.getenv('ATTEMPT_PARTITION_MONTHS_AHEAD', '3'))
+
+# Summaries rewritten per UPDATE batch during a rebuild
+REBUILD_BATCH_SIZE = 1000
+
+# Events older than this many days are moved to the archive
+ARCHIVE_AFTER_DAYS = int(os.getenv('ATTEMPT_ARCHIVE_DAYS', '730'))
+
+# Events per archive segment
+ARCHIVE_SEGMENT_ROWS = int(os.getenv('ATTEMPT_ARCHIVE_SEGMENT_ROWS', '500000'))
+
+
+def archive_dir(app):
+    return os.getenv('ATTEMPT_ARCHIVE_DIR') or os.path.join(app.instance_path, 'attempt_archive')
+
+
+def _archive():
+    """The archive module and directory, or (None, None) while nothing has been archived"""
+    directory = archive_dir(current_app)
+    if not os.path.isdir(directory):
+        return None, None
+    # Imported lazily so NumPy stays off the app startup path
+    import archive
+    return archive, directory
+
+
+def archive_deletions():
+    """(user_id, problem_id, deleted_at) of history deleted since the last compaction"""
+    return db.session.execute(db.select(
+        AttemptArchiveDeletion.user_id, AttemptArchiveDeletion.problem_id, AttemptArchiveDeletion.deleted_at
+    )).all()
+
+
+def forget_archived_attempts(user_id=None, problem_id=None):
+    """Hide the archived events of a pair, a user or a problem, in the current transaction"""
+    db.session.add(AttemptArchiveDeletion(user_id=user_id, problem_id=problem_id, deleted_at=utcnow()))
+
+
+def iter_archived_events(user_id=None):
+    """Archived events as (user_id, problem_id, ts, status, attempts), a segment at a time"""
+    archive, directory = _archive()
+    if archive is None:
+        return
+    for columns in archive.scan(directory, archive_deletions(), user_id):
+        yield from zip(
+            columns['user_id'].tolist(),
+            columns['problem_id'].tolist(),
+            columns['ts'].astype('datetime64[us]').tolist(),
+            columns['status'].tolist(),
+            columns['attempts'].tolist(),
+        )
+
+
+def append_attempt(user_id, problem_id, ts, status, attempts=1):
+    """Append one attempt event and count it in the rollups, in the current transaction"""
+    db.session.execute(db.insert(AttemptEvent).values(
+        user_id=user_id,
+        problem_id=problem_id,
+        ts=ts,
+        status=status,
+        attempts=attempts,
+    ))
+    difficulty = rollup_difficulty(db.session.get(Problem, problem_id))
+    add_to_rollups([(user_id, ts, status, difficulty, attempts)])
+
+
+def record_attempt(user_problem, date_attempted, status, num_attempts):
+    """
+    Append an attempt event and fold it into its user_problems summary
+    and its problem's solve stats
+
+    num_attempts is the new total the client reports; the event stores the
+    difference, so summing a pair's events always gives the current total.
+    """
+    # A summary without a status is new and hasn't counted towards its problem yet
+    before = (user_problem.status, user_problem.num_attempts) if user_problem.status is not None else None
+    attempts = num_attempts - (user_problem.num_attempts or 0)
+    ts = parse_review_time(date_attempted) or utcnow()
+    append_attempt(user_problem.user_id, user_problem.problem_id, ts, status, attempts)
+
+    user_problem.num_attempts = num_attempts
+    user_problem.date_attempted = date_attempted
+    user_problem.status = status
+    update_problem_stats(user_problem.problem_id, before, (status, num_attempts))
+    return user_problem
+
+
+def _upsert_summary(user_id, problem_id, date_attempted, status, seq):
+    """
+    Insert a pair's summary with one attempt, or add one to its existing
+    num_attempts, in a single statement that returns the row. An existing
+    row keeps its status, so the returned status is the previous one
+    """
+    table = UserProblem.__table__
+    shard_id = shard_for_user(user_id, pin=True)
+    bind_arguments = {'shard_id': shard_id}
+    values = {
+        'user_id': user_id,
+        'problem_id': problem_id,
+        'date_attempted': date_attempted,
+        'status': status,
+        'num_attempts': 1,
+        'change_seq': seq,
+    }
+    increment = {
+        'num_attempts': db.func.coalesce(table.c.num_attempts, 1) + 1,
+        'date_attempted': date_attempted,
+        'change_seq': seq,
+    }
+
+    dialect = db.session.get_bind(shard_id=shard_id).dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        # No upsert: the UPDATE locks an existing row, so the follow-up read is consistent
+        key = (table.c.user_id == user_id) & (table.c.problem_id == problem_id)
+        updated = db.session.execute(db.update(table).where(key).values(**increment), bind_arguments=bind_arguments)
+        if not updated.rowcount:
+            db.session.execute(db.insert(table).values(**values), bind_arguments=bind_arguments)
+        return db.session.execute(db.select(table).where(key), bind_arguments=bind_arguments).one()
+
+    stmt = insert(table).values(**values)
+    stmt = stmt.on_conflict_do_update(index_elements=['user_id', 'problem_id'], set_=increment)
+    return db.session.execute(stmt.returning(*table.c), bind_arguments=bind_arguments).one()
+
+
+def increment_attempt(user_id, problem_id, date_attempted, status):
+    """
+    Count one more try at a problem, creating its summary on the first one,
+    in the current transaction
+
+    num_attempts is incremented in the database by a single upsert, so
+    concurrent tries are all counted and a first try can't collide with
+    another one on the primary key. The upsert leaves the row locked until
+    commit; the new status and review schedule are then written by primary
+    key, and the problem's solve stats move from the previous status.
+    With status None the try keeps the existing status (Attempted for a
+    first try).
+    Returns: the new summary, as a UserProblem that is not in the session
+    """
+    summary = UserProblem(user_id=user_id, problem_id=problem_id)
+    seq = stamp_change(summary)
+    row = _upsert_summary(user_id, problem_id, date_attempted, status or 'Attempted', seq)
+    mapper = db.inspect(UserProblem)
+    for column, value in zip(UserProblem.__table__.c, row):
+        setattr(summary, mapper.get_property_by_column(column).key, value)
+
+    # A first try is inserted with num_attempts = 1; any other is an increment
+    before = (row.status, row.num_attempts - 1) if row.num_attempts > 1 else None
+    status = status or row.status
+    summary.status = status
+    append_attempt(user_id, problem_id, parse_review_time(date_attempted) or utcnow(), status, 1)
+    update_problem_stats(problem_id, before, (status, summary.num_attempts))
+
+    schedule_review(summary)
+    update_user_problems([{
+        'user_id': user_id,
+        'problem_id': problem_id,
+        'status': status,
+        'ease_factor': summary.ease_factor,
+        'review_interval': summary.review_interval,
+        'review_repetitions': summary.review_repetitions,
+        'due_at': summary.due_at,
+    }])
+    return summary
+
+
+def delete_attempts(user_id, problem_id):
+    """Remove a pair's history, live and archived, so a rebuild can't revive it"""
+    removed = db.session.execute(
+        db.delete(AttemptEvent).where(
+            AttemptEvent.user_id == user_id,
+            AttemptEvent.problem_id == problem_id
+        ).returning(AttemptEvent.ts, AttemptEvent.status, AttemptEvent.attempts)
+    ).all()
+
+    archive, directory = _archive()
+    if archive is not None:
+        archived = archive.history(directory, archive_deletions(), user_id, problem_id)
+        removed += [(ts, status, attempts) for _, _, _, ts, status, attempts in archived]
+    forget_archived_attempts(user_id, problem_id)
+
+    if removed:
+        difficulty = rollup_difficulty(db.session.get(Problem, problem_id))
+        add_to_rollups([(user_id, ts, status, difficulty, attempts) for ts, status, attempts in removed], sign=-1)
+
+
+def attempt_history(user_id, problem_id=None, start=None, end=None, limit=None):
+    """
+    Events for a user in ts order: an index range scan over
+    (user_id[, problem_id], ts), merged with the user's archived events
+    """
+    stmt = db.select(AttemptEvent).where(AttemptEvent.user_id == user_id)
+    if problem_id is not None:
+        stmt = stmt.where(AttemptEvent.problem_id == problem_id)
+    if start is not None:
+        stmt = stmt.where(AttemptEvent.ts >= start)
+    if end is not None:
+        stmt = stmt.where(AttemptEvent.ts < end)
+    stmt = stmt.order_by(AttemptEvent.ts, AttemptEvent.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    events = db.session.execute(stmt).scalars().all()
+
+    archive, directory = _archive()
+    if archive is None:
+        return events
+    archived = [
+        AttemptEvent(id=event_id, user_id=user_id, problem_id=pid, ts=ts, status=status, attempts=attempts)
+        for event_id, _, pid, ts, status, attempts
+        in archive.history(directory, archive_deletions(), user_id, problem_id, start, end, limit)
+    ]
+    if not archived:
+        return events
+    merged = sorted(archived + list(events), key=lambda event: (event.ts, event.id))
+    return merged[:limit] if limit is not None else merged
+
+
+def rebuild_summaries(user_id=None, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recompute num_attempts, date_attempted and status of existing summaries
+    from the event log, then their review schedules
+
+    Summaries may live on a user shard (sharding.py), so events aren't joined
+    to them; updates for pairs without a summary simply match no row.
+    Archived events are folded in per pair from the archive's columns.
+    Returns: number of user-problem pairs in the event log rewritten
+    """
+    totals = db.select(
+        AttemptEvent.user_id,
+        AttemptEvent.problem_id,
+        db.func.sum(AttemptEvent.attempts).label('num_attempts'),
+        db.func.max(AttemptEvent.id).label('last_id'),
+    ).group_by(AttemptEvent.user_id, AttemptEvent.problem_id)
+    if user_id is not None:
+        totals = totals.where(AttemptEvent.user_id == user_id)
+    totals = totals.subquery()
+
+    rows = db.session.execute(
+        db.select(
+            totals.c.user_id, totals.c.problem_id, totals.c.num_attempts,
+            totals.c.last_id, AttemptEvent.ts, AttemptEvent.status
+        )
+        .join(AttemptEvent, AttemptEvent.id == totals.c.last_id)
+        .order_by(totals.c.user_id, totals.c.problem_id)
+    ).all()
+
+    archive, directory = _archive()
+    if archive is not None:
+        pairs = archive.pair_totals(directory, archive_deletions(), user_id)
+        for row_user_id, problem_id, num_attempts, last_id, ts, status in rows:
+            total = pairs.setdefault((row_user_id, problem_id), [0, last_id, ts, status])
+            total[0] += num_attempts
+            if last_id > total[1]:
+                total[1:] = [last_id, ts, status]
+        rows = [key + tuple(total) for key, total in sorted(pairs.items())]
+
+    total = 0
+    for start in range(0, len(rows), batch_size):
+        seq = next_change_seq()
+        mappings = [
+            {
+                'user_id': row_user_id,
+                'problem_id': problem_id,
+                'num_attempts': max(int(num_attempts), 1),
+                'date_attempted': ts.isoformat(),
+                'status': status,
+                'change_seq': seq,
+            }
+            for row_user_id, problem_id, num_attempts, _, ts, status in rows[start:start + batch_size]
+        ]
+        update_user_problems(mappings)
+        db.session.commit()
+        total += len(mappings)
+
+    bulk_reschedule(user_id=user_id)
+    return total
+
+
+def partition_bounds(month_start):
+    """The [start, end) dates of the monthly partition containing month_start"""
+    month_start = month_start.replace(day=1)
+    if month_start.month == 12:
+        return month_start, month_start.replace(year=month_start.year + 1, month=1)
+    return month_start, month_start.replace(month=month_start.month + 1)
+
+
+@job_handler('attempts.ensure_partitions', cron='5 0 * * *', priority=PRIORITY_LOW)
+def ensure_partitions(months_ahead=PARTITION_MONTHS_AHEAD, today=None):
+    """
+    Create monthly attempt_events partitions from this month onwards (Postgres only)
+    Returns: names of the partitions that now exist for that range
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return []
+
+    start = (today or date.today()).replace(day=1)
+    names = []
+    for _ in range(months_ahead + 1):
+        start, end = partition_bounds(start)
+        name = f'attempt_events_y{start.year}m{start.month:02d}'
+        db.session.execute(db.text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF attempt_events "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        ))
+        names.append(name)
+        start = end
+    db.session.commit()
+    return names
+
+
+def _delete_live_events(keys, batch_size=REBUILD_BATCH_SIZE):
+    """Delete archived events from attempt_events by primary key, a batch per transaction"""
+    for start in range(0, len(keys), batch_size):
+        db.session.execute(db.delete(AttemptEvent).where(
+            db.tuple_(AttemptEvent.user_id, AttemptEvent.ts, AttemptEvent.id).in_(keys[start:start + batch_size])
+        ))
+        db.session.commit()
+
+
+@job_handler('attempts.archive', cron='35 2 * * *', priority=PRIORITY_LOW)
+def archive_attempts(older_than_days=ARCHIVE_AFTER_DAYS, segment_rows=ARCHIVE_SEGMENT_ROWS):
+    """
+    Move events older than older_than_days to the archive, a segment per
+    batch, then compact deleted history out of the archive
+    Returns: number of events archived
+    """
+    # Imported lazily so NumPy stays off the app startup path
+    import archive
+    directory = archive_dir(current_app)
+    cutoff = utcnow() - timedelta(days=older_than_days)
+
+    # Rows of a segment written just before a crash may still be live
+    _delete_live_events(archive.last_segment_keys(directory))
+
+    total = 0
+    while True:
+        archived_at = utcnow()
+        rows = db.session.execute(
+            db.select(
+                AttemptEvent.id, AttemptEvent.user_id, AttemptEvent.problem_id,
+                AttemptEvent.ts, AttemptEvent.status, AttemptEvent.attempts
+            )
+            .where(AttemptEvent.ts < cutoff)
+            .order_by(AttemptEvent.id)
+            .limit(segment_rows)
+        ).all()
+        if not rows:
+            break
+        archive.write_segment(directory, rows, archived_at)
+        _delete_live_events([(row_user_id, ts, event_id) for event_id, row_user_id, _, ts, _, _ in rows])
+        total += len(rows)
+
+    # Apply the deletions recorded so far to the segments, then drop them
+    deletions = db.session.execute(db.select(
+        AttemptArchiveDeletion.id, AttemptArchiveDeletion.user_id,
+        AttemptArchiveDeletion.problem_id, AttemptArchiveDeletion.deleted_at
+    )).all()
+    if deletions:
+        archive.compact(directory, [tuple(row[1:]) for row in deletions])
+        db.session.execute(db.delete(AttemptArchiveDeletion).where(
+            AttemptArchiveDeletion.id <= max(row[0] for row in deletions)
+        ))
+    db.session.commit()
+    return total
+
+
+@click.command('rebuild-attempt-summaries')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user\'s summaries')
+@with_appcontext
+def rebuild_summaries_command(user_id):
+    """Recompute user_problems summaries from the attempt event log"""
+    count = rebuild_summaries(user_id=user_id)
+    click.echo(f'Rebuilt {count} user-problem summaries.')
+
+
+@click.command('create-attempt-partitions')
+@click.option('--months-ahead', type=int, default=PARTITION_MONTHS_AHEAD, show_default=True)
+@with_appcontext
+def create_partitions_command(months_ahead):
+    """Create upcoming monthly attempt_events partitions (Postgres only)"""
+    names = ensure_partitions(months_ahead)
+    if names:
+        click.echo(f'Partitions ready: {", ".join(names)}')
+    else:
+        click.echo('attempt_events is only partitioned on Postgres; nothing to do.')
+
+
+@click.command('archive-attempts')
+@click.option('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS, show_default=True)
+@with_appcontext
+def archive_attempts_command(older_than_days):
+    """Move old attempt events from attempt_events to the columnar archive"""
+    count = archive_attempts(older_than_days)
+    click.echo(f'Archived {count} attempt events to {archive_dir(current_app)}.')
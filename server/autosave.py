@@ -0,0 +1,173 @@
+"""
+Coalesced writes of autosaved notes
+
+An autosaving editor sends the whole note every few seconds. Instead of a
+load, validate and commit per request, the autosave endpoint drops the text
+into a per-process buffer keyed by (user_id, problem_id), where a newer
+save replaces the pending one, and answers straight away. A background
+thread flushes the buffer every NOTES_AUTOSAVE_FLUSH_INTERVAL seconds, or
+as soon as NOTES_AUTOSAVE_MAX_PENDING pairs are waiting, writing
+NOTES_AUTOSAVE_BATCH_SIZE rows per transaction. The buffer is also flushed
+when the process exits (atexit, and gunicorn's worker_exit hook).
+
+Last write wins across processes too: each save is stamped with the time
+it was received, and a flush only overwrites notes whose notes_updated_at is
+older, so a slow worker can't replace notes saved later through another
+worker or the regular PATCH endpoint.
+
+Saves still pending when a process is killed outright are lost; the editor
+holds the text and can save it again.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from flask import current_app
+
+from config import db
+from models.models import UserProblem
+from changes import stamp_change
+from note_revisions import record_note_revision
+from review import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Seconds a save may wait in the buffer, and the pending pairs that trigger an early flush
+FLUSH_INTERVAL = float(os.getenv('NOTES_AUTOSAVE_FLUSH_INTERVAL', '5'))
+MAX_PENDING = int(os.getenv('NOTES_AUTOSAVE_MAX_PENDING', '500'))
+
+# Rows written per flush transaction
+BATCH_SIZE = int(os.getenv('NOTES_AUTOSAVE_BATCH_SIZE', '200'))
+
+
+def write_notes(saves):
+    """
+    Write {(user_id, problem_id): (notes, saved_at)} in the current
+    transaction, skipping rows whose notes were written after saved_at and
+    rows that no longer exist
+    Returns: the updated UserProblem rows
+    """
+    user_ids = {user_id for user_id, _ in saves}
+    rows = (
+        UserProblem.query
+        .filter(
+            # user_id first, so the sharded session only asks these users' shards
+            UserProblem.user_id.in_(user_ids),
+            db.tuple_(UserProblem.user_id, UserProblem.problem_id).in_(list(saves))
+        )
+        .options(db.undefer(UserProblem.notes_compressed))
+        .with_for_update()
+        .all()
+    )
+
+    updated = []
+    for user_problem in rows:
+        notes, saved_at = saves[(user_problem.user_id, user_problem.problem_id)]
+        if user_problem.notes_updated_at is not None and user_problem.notes_updated_at >= saved_at:
+            continue
+        record_note_revision(user_problem.user_id, user_problem.problem_id, user_problem.notes, notes)
+        user_problem.notes = notes
+        user_problem.notes_updated_at = saved_at
+        updated.append(user_problem)
+    if updated:
+        stamp_change(*updated)
+    return updated
+
+
+class NotesAutosave:
+    """Per-process buffer of the latest autosaved notes per pair, flushed by a background thread"""
+
+    def __init__(self, app, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING, batch_size=BATCH_SIZE):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self._pending = {}  # (user_id, problem_id) -> (notes, saved_at)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Flushes run one at a time, in save order
+        self._wake = threading.Event()
+        self._pid = None
+
+    def save(self, user_id, problem_id, notes):
+        """Buffer a pair's notes, replacing any pending save; returns the time it was received"""
+        with self._lock:
+            # Stamped under the lock, so a later save of a pair always has the later time
+            saved_at = utcnow()
+            self._pending[(user_id, problem_id)] = (notes, saved_at)
+            full = len(self._pending) >= self.max_pending
+        self._start_flusher()
+        if full:
+            self._wake.set()
+        return saved_at
+
+    def flush(self):
+        """Write every buffered save, a batch per transaction; returns the number of rows updated"""
+        with self._flush_lock:
+            with self._lock:
+                saves, self._pending = self._pending, {}
+            if not saves:
+                return 0
+
+            items = list(saves.items())
+            written = done = 0
+            with self.app.app_context():
+                try:
+                    for start in range(0, len(items), self.batch_size):
+                        batch = dict(items[start:start + self.batch_size])
+                        written += len(write_notes(batch))
+                        db.session.commit()
+                        done += len(batch)
+                except Exception:
+                    db.session.rollback()
+                    self._requeue(items[done:])
+                    raise
+                finally:
+                    db.session.remove()
+            return written
+
+    def _requeue(self, items):
+        # Saves made since the buffer was swapped out are newer and stay
+        with self._lock:
+            for key, save in items:
+                self._pending.setdefault(key, save)
+
+    def _start_flusher(self):
+        # One thread per process, started after any fork (gunicorn preloads the app)
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name='notes-autosave', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush autosaved notes')
+
+    def shutdown(self):
+        """Flush what is left before the process exits"""
+        try:
+            written = self.flush()
+            if written:
+                logger.info('Flushed %d autosaved notes on shutdown', written)
+        except Exception:
+            logger.exception('Failed to flush autosaved notes on shutdown')
+
+
+def init_autosave(app):
+    """Create the app's notes autosave buffer, flushed at exit"""
+    autosave = NotesAutosave(app)
+    app.extensions['notes_autosave'] = autosave
+    atexit.register(autosave.shutdown)
+
+
+def notes_autosave(app=None):
+    """The app's NotesAutosave"""
+    return (app or current_app).extensions['notes_autosave']
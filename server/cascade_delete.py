@@ -0,0 +1,116 @@
+"""
+Deletes of users and problems with a large user_problems fan-out
+
+Small deletes rely on ON DELETE CASCADE in a single statement. When a parent
+has more than DELETE_FANOUT_THRESHOLD dependent rows, the delete is handed to
+a background job (jobs.py) that removes the children (user_problems, then
+their attempt_events and note_revisions history) in short chunked transactions before deleting
+the parent, so the request finishes in constant time and no single
+transaction holds locks over the whole fan-out.
+"""
+import os
+
+from config import db
+from models.models import User, Problem, UserProblem, AttemptEvent, NoteRevision
+from jobs import job_handler, enqueue
+from sharding import sharding_enabled
+
+DELETE_FANOUT_THRESHOLD = int(os.getenv('DELETE_FANOUT_THRESHOLD', '5000'))
+DELETE_CHUNK_SIZE = int(os.getenv('DELETE_CHUNK_SIZE', '1000'))
+
+# Parent model and referencing user_problems column per deletable entity
+PARENTS = {
+    'user': (User, UserProblem.user_id),
+    'problem': (Problem, UserProblem.problem_id),
+}
+
+
+def has_large_fanout(fk_column, parent_id, threshold=DELETE_FANOUT_THRESHOLD):
+    """Check whether more than threshold user_problems rows reference the parent"""
+    # LIMIT keeps this an index probe instead of a full COUNT(*)
+    rows = db.session.execute(
+        db.select(UserProblem.user_id).where(fk_column == parent_id).limit(threshold + 1)
+    ).all()
+    return len(rows) > threshold
+
+
+def delete_children_in_chunks(fk_column, parent_id, chunk_size=DELETE_CHUNK_SIZE):
+    """Delete user_problems rows referencing the parent, one chunk per transaction"""
+    deleted = 0
+    while True:
+        keys = db.session.execute(
+            db.select(UserProblem.user_id, UserProblem.problem_id)
+            .where(fk_column == parent_id)
+            .limit(chunk_size)
+        ).all()
+        if not keys:
+            return deleted
+
+        db.session.execute(
+            db.delete(UserProblem).where(
+                db.tuple_(UserProblem.user_id, UserProblem.problem_id).in_([tuple(k) for k in keys])
+            )
+        )
+        db.session.commit()
+        deleted += len(keys)
+
+
+def delete_events_in_chunks(fk_column, parent_id, chunk_size=DELETE_CHUNK_SIZE):
+    """Delete attempt_events rows referencing the parent, one chunk per transaction"""
+    event_column = getattr(AttemptEvent, fk_column.key)
+    while True:
+        ids = db.session.execute(
+            db.select(AttemptEvent.id).where(event_column == parent_id).limit(chunk_size)
+        ).scalars().all()
+        if not ids:
+            return
+
+        db.session.execute(db.delete(AttemptEvent).where(AttemptEvent.id.in_(ids)))
+        db.session.commit()
+
+
+def delete_note_revisions_in_chunks(fk_column, parent_id, chunk_size=DELETE_CHUNK_SIZE):
+    """Delete note_revisions rows referencing the parent, one chunk per transaction"""
+    revision_column = getattr(NoteRevision, fk_column.key)
+    key = (NoteRevision.user_id, NoteRevision.problem_id, NoteRevision.revision)
+    while True:
+        keys = db.session.execute(
+            db.select(*key).where(revision_column == parent_id).limit(chunk_size)
+        ).all()
+        if not keys:
+            return
+
+        db.session.execute(db.delete(NoteRevision).where(db.tuple_(*key).in_([tuple(k) for k in keys])))
+        db.session.commit()
+
+
+def delete_sharded_children(entity, parent_id):
+    """
+    Delete the user_problems rows of a 'user' or 'problem' on user shards
+    (sharding.py), which ON DELETE CASCADE in the main database can't reach
+    """
+    if sharding_enabled():
+        _, fk_column = PARENTS[entity]
+        db.session.execute(db.delete(UserProblem).where(fk_column == parent_id))
+
+
+@job_handler('cascade.chunked_delete')
+def chunked_delete(entity, parent_id):
+    """Background job: drain the children, then delete the parent row"""
+    model, fk_column = PARENTS[entity]
+    delete_children_in_chunks(fk_column, parent_id)
+    delete_events_in_chunks(fk_column, parent_id)
+    delete_note_revisions_in_chunks(fk_column, parent_id)
+    # Any rows added meanwhile are removed by ON DELETE CASCADE
+    delete_sharded_children(entity, parent_id)
+    db.session.execute(db.delete(model).where(model.id == parent_id))
+    db.session.commit()
+
+
+def schedule_chunked_delete(entity, parent_id):
+    """Queue a chunked delete of a 'user' or 'problem' in the current transaction"""
+    enqueue(
+        'cascade.chunked_delete',
+        {'entity': entity, 'parent_id': parent_id},
+        dedupe_key=f'cascade.chunked_delete:{entity}:{parent_id}'
+    )
@@ -0,0 +1,146 @@
+"""
+Versioned, precompressed snapshot files of the full problem catalog
+
+The catalog version is the highest change sequence of any problem write or
+delete. Each version is written once as JSON (and MessagePack when
+available), plus gzip and brotli variants, so serving it is a sendfile of a
+ready-made file with immutable cache headers. Every catalog write enqueues a
+rebuild job in its own transaction (coalesced while one is still queued); a
+web worker that finds the current version missing builds it on demand.
+"""
+import os
+import threading
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import db
+from models.models import Problem, Tombstone, Tag, ProblemTag
+from jobs import job_handler, enqueue
+from encoding import (
+    dumps_json, dumps_msgpack, compress_gzip, compress_brotli,
+    msgpack, brotli, JSON_MIMETYPE, MSGPACK_MIMETYPE
+)
+
+SNAPSHOT_COLUMNS = ('id', 'problem_name', 'problem_link', 'difficulty', 'category', 'change_seq')
+
+# File extensions per format and suffixes per Content-Encoding
+FORMAT_EXTENSIONS = {JSON_MIMETYPE: 'json', MSGPACK_MIMETYPE: 'msgpack'}
+ENCODING_SUFFIXES = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+
+# Older versions kept on disk for clients still holding their URLs
+KEEP_VERSIONS = 3
+
+_build_lock = threading.Lock()
+
+
+def snapshot_dir(app):
+    return os.getenv('CATALOG_SNAPSHOT_DIR', os.path.join(app.instance_path, 'snapshots'))
+
+
+def snapshot_path(directory, version, mimetype=JSON_MIMETYPE, encoding='identity'):
+    return os.path.join(
+        directory, f'catalog-{version}.{FORMAT_EXTENSIONS[mimetype]}{ENCODING_SUFFIXES[encoding]}'
+    )
+
+
+def catalog_version():
+    """Highest change sequence of any catalog write or delete (two index lookups)"""
+    written = db.session.execute(db.select(db.func.max(Problem.change_seq))).scalar()
+    deleted = db.session.execute(
+        db.select(db.func.max(Tombstone.seq)).where(Tombstone.entity == 'problem')
+    ).scalar()
+    return max(written or 0, deleted or 0)
+
+
+def _write_atomic(path, body):
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+
+
+def build_snapshot(directory, version):
+    """Write every format/encoding variant of the catalog for version"""
+    rows = db.session.execute(
+        db.select(*(getattr(Problem, column) for column in SNAPSHOT_COLUMNS)).order_by(Problem.id)
+    ).all()
+    tag_names = {}
+    for problem_id, name in db.session.execute(
+        db.select(ProblemTag.problem_id, Tag.name).join(Tag, Tag.id == ProblemTag.tag_id).order_by(Tag.name)
+    ):
+        tag_names.setdefault(problem_id, []).append(name)
+    document = {
+        'version': version,
+        'problems': [
+            {**dict(zip(SNAPSHOT_COLUMNS, row)), 'tags': tag_names.get(row.id, [])}
+            for row in rows
+        ],
+    }
+
+    bodies = {JSON_MIMETYPE: dumps_json(document)}
+    if msgpack is not None:
+        bodies[MSGPACK_MIMETYPE] = dumps_msgpack(document)
+
+    os.makedirs(directory, exist_ok=True)
+    for mimetype, body in bodies.items():
+        # Compression happens once per version, so use the strongest settings
+        _write_atomic(snapshot_path(directory, version, mimetype, 'gzip'), compress_gzip(body, level=9))
+        if brotli is not None:
+            _write_atomic(snapshot_path(directory, version, mimetype, 'br'), compress_brotli(body, quality=11))
+        # The identity file is written last: its presence marks the version complete
+        _write_atomic(snapshot_path(directory, version, mimetype), body)
+
+    _prune(directory, version)
+
+
+def _prune(directory, current_version):
+    versions = set()
+    for name in os.listdir(directory):
+        if name.startswith('catalog-') and not name.endswith('.tmp'):
+            try:
+                versions.add(int(name.split('-', 1)[1].split('.', 1)[0]))
+            except ValueError:
+                continue
+
+    stale = sorted(v for v in versions if v != current_version)[:-KEEP_VERSIONS]
+    for name in os.listdir(directory):
+        if any(name.startswith(f'catalog-{v}.') for v in stale):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+def snapshot_exists(directory, version):
+    return os.path.exists(snapshot_path(directory, version))
+
+
+def ensure_snapshot(app):
+    """Return the current catalog version, building its files if missing"""
+    directory = snapshot_dir(app)
+    version = catalog_version()
+    if not snapshot_exists(directory, version):
+        with _build_lock:
+            if not snapshot_exists(directory, version):
+                build_snapshot(directory, version)
+    return version
+
+
+@job_handler('catalog.rebuild_snapshot')
+def rebuild_snapshot():
+    """Background job: build the snapshot for the latest catalog version"""
+    ensure_snapshot(current_app)
+
+
+@event.listens_for(Session, 'before_commit')
+def _schedule_rebuild(session):
+    if session.info.pop('catalog_changed', False):
+        # Bursts of catalog writes coalesce into one queued rebuild
+        enqueue('catalog.rebuild_snapshot', dedupe_key='catalog.rebuild_snapshot')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rebuild(session):
+    session.info.pop('catalog_changed', None)
@@ -0,0 +1,68 @@
+"""Change sequence numbers and tombstones behind the delta sync feed (/api/changes)"""
+from datetime import datetime, timezone
+
+from config import db
+from models.models import ChangeCounter, Tombstone, Problem
+
+COUNTER_NAME = 'changes'
+
+
+def next_change_seq():
+    """
+    Allocate the next change sequence number inside the current transaction
+
+    The counter row stays locked until commit, so sequence numbers become
+    visible in commit order: a client that has seen seq N can never later
+    miss a write numbered at or below N.
+    """
+    seq = db.session.execute(
+        db.update(ChangeCounter)
+        .where(ChangeCounter.name == COUNTER_NAME)
+        .values(value=ChangeCounter.value + 1)
+        .returning(ChangeCounter.value)
+    ).scalar_one_or_none()
+
+    if seq is None:
+        # Databases created without migrations have no counter row yet
+        db.session.add(ChangeCounter(name=COUNTER_NAME, value=1))
+        db.session.flush()
+        seq = 1
+    return seq
+
+
+def current_change_seq():
+    """Return the highest committed change sequence number"""
+    seq = db.session.execute(
+        db.select(ChangeCounter.value).where(ChangeCounter.name == COUNTER_NAME)
+    ).scalar_one_or_none()
+    return seq or 0
+
+
+def stamp_change(*objects):
+    """Mark Problem / UserProblem objects as changed in the current transaction"""
+    seq = next_change_seq()
+    for obj in objects:
+        obj.change_seq = seq
+
+    # Picked up by events.py and pushed to subscribers once the transaction commits
+    db.session.info.setdefault('changed_objects', []).extend(objects)
+    if any(isinstance(obj, Problem) for obj in objects):
+        # Picked up by catalog_snapshot.py to rebuild the catalog snapshot
+        db.session.info['catalog_changed'] = True
+    return seq
+
+
+def record_tombstone(entity, problem_id, user_id=None):
+    """Record the deletion of a problem or user_problem for delta sync clients"""
+    seq = next_change_seq()
+    db.session.add(Tombstone(
+        seq=seq,
+        entity=entity,
+        problem_id=problem_id,
+        user_id=user_id,
+        deleted_at=datetime.now(timezone.utc).replace(tzinfo=None)
+    ))
+    db.session.info.setdefault('deleted_rows', []).append((entity, problem_id, user_id, seq))
+    if entity == 'problem':
+        db.session.info['catalog_changed'] = True
+    return seq
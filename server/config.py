@@ -1,6 +1,6 @@
-from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import MetaData
+from sqlalchemy import MetaData, event
+from sqlalchemy.engine import Engine
 from flask_migrate import Migrate
 from flask_bcrypt import Bcrypt
 from flask_restful import Api
@@ -9,20 +9,15 @@ from dotenv import load_dotenv
 from pathlib import Path
 import os
 
-# Load environment variables from project root .env file
+# Project root .env file
 # This ensures .env is found whether running from server/ or project root
 env_path = Path(__file__).resolve().parent.parent / '.env'
-load_dotenv(dotenv_path=env_path)
 
-# Validate required environment variables
-required_env_vars = ['FLASK_SECRET_KEY', 'DATABASE_URI']
-for var in required_env_vars:
-    if not os.getenv(var):
-        raise ValueError(f"Required environment variable '{var}' is not set. Please check your .env file.")
-
-# Get environment configuration
-ENV = os.getenv('FLASK_ENV', 'development')
-IS_PRODUCTION = ENV == 'production'
+# Required environment variables and the config keys that can supply them instead
+required_env_vars = {
+    'FLASK_SECRET_KEY': 'SECRET_KEY',
+    'DATABASE_URI': 'SQLALCHEMY_DATABASE_URI',
+}
 
 # SQLAlchemy naming convention for migrations
 naming_convention = {
@@ -35,55 +30,89 @@ naming_convention = {
 
 metadata = MetaData(naming_convention=naming_convention)
 
-# Initialize Flask app
-app = Flask(__name__)
+# Extensions are created unbound and attached to an app in create_app()
+db = SQLAlchemy(metadata=metadata)
+
+migrate = Migrate()
+
+bcrypt = Bcrypt()
+
+api = Api()
+
+
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite ignores ON DELETE CASCADE unless foreign keys are enabled per connection"""
+    if type(dbapi_connection).__module__.startswith('sqlite3'):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def load_config(app, overrides=None):
+    """Load environment variables, validate them and apply the app configuration"""
+    # Load environment variables from project root .env file
+    load_dotenv(dotenv_path=env_path)
+    overrides = overrides or {}
+
+    # Validate required environment variables
+    for var, config_key in required_env_vars.items():
+        if not os.getenv(var) and not overrides.get(config_key):
+            raise ValueError(f"Required environment variable '{var}' is not set. Please check your .env file.")
+
+    # Get environment configuration
+    env = os.getenv('FLASK_ENV', 'development')
+    is_production = env == 'production'
 
-# Basic configuration
-app.secret_key = os.getenv("FLASK_SECRET_KEY")
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URI")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    # Basic configuration
+    app.secret_key = os.getenv("FLASK_SECRET_KEY")
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URI")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-# Request size limits (prevent DoS attacks)
-app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16 MB max request size
+    # Optional per-user sharding of user_problems: one bind per database (see sharding.py)
+    shard_uris = [uri.strip() for uri in os.getenv('USER_SHARD_URIS', '').split(',') if uri.strip()]
+    app.config["SQLALCHEMY_BINDS"] = {f'user_shard_{i}': uri for i, uri in enumerate(shard_uris)}
 
-# Session security configuration
-app.config["SESSION_COOKIE_SECURE"] = IS_PRODUCTION  # Only send cookie over HTTPS in production
-app.config["SESSION_COOKIE_HTTPONLY"] = True  # Prevent JavaScript access to session cookie
-app.config["SESSION_COOKIE_SAMESITE"] = "Lax"  # CSRF protection
-app.config["PERMANENT_SESSION_LIFETIME"] = 3600  # Session expires after 1 hour
+    # Request size limits (prevent DoS attacks)
+    app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16 MB max request size
 
-# Environment-based debug mode - default to production (safe)
-app.config["DEBUG"] = ENV == 'development'  # Only enable debug in development
+    # Session security configuration
+    app.config["SESSION_COOKIE_SECURE"] = is_production  # Only send cookie over HTTPS in production
+    app.config["SESSION_COOKIE_HTTPONLY"] = True  # Prevent JavaScript access to session cookie
+    app.config["SESSION_COOKIE_SAMESITE"] = "Lax"  # CSRF protection
+    app.config["PERMANENT_SESSION_LIFETIME"] = 3600  # Session expires after 1 hour
 
-# Initialize extensions
-db = SQLAlchemy(app=app, metadata=metadata)
+    # Environment-based debug mode - default to production (safe)
+    app.config["DEBUG"] = env == 'development'  # Only enable debug in development
 
-migrate = Migrate(app=app, db=db)
+    # Run background jobs in a thread of the web process instead of `flask jobs work`
+    app.config["JOBS_IN_PROCESS_WORKER"] = os.getenv('JOBS_IN_PROCESS_WORKER', 'false').lower() == 'true'
 
-bcrypt = Bcrypt(app=app)
+    # Explicit overrides (e.g. from tests or benchmarks) win over the environment
+    app.config.update(overrides)
 
-api = Api(app=app)
 
-# CORS configuration - restrict to specific origins
-allowed_origins_str = os.getenv('ALLOWED_ORIGINS', 'http://localhost:3000,http://localhost:5173')
-allowed_origins = [origin.strip() for origin in allowed_origins_str.split(',') if origin.strip()]
+def init_cors(app):
+    """CORS configuration - restrict to specific origins"""
+    allowed_origins_str = os.getenv('ALLOWED_ORIGINS', 'http://localhost:3000,http://localhost:5173')
+    allowed_origins = [origin.strip() for origin in allowed_origins_str.split(',') if origin.strip()]
 
-# Validate that origins are valid URLs
-valid_origins = []
-for origin in allowed_origins:
-    # Basic URL validation
-    if origin.startswith('http://') or origin.startswith('https://'):
-        valid_origins.append(origin)
-    else:
-        print(f"Warning: Invalid CORS origin '{origin}' ignored. Must start with http:// or https://")
+    # Validate that origins are valid URLs
+    valid_origins = []
+    for origin in allowed_origins:
+        # Basic URL validation
+        if origin.startswith('http://') or origin.startswith('https://'):
+            valid_origins.append(origin)
+        else:
+            print(f"Warning: Invalid CORS origin '{origin}' ignored. Must start with http:// or https://")
 
-if not valid_origins:
-    print("Warning: No valid CORS origins configured. Using default localhost origins.")
-    valid_origins = ['http://localhost:3000', 'http://localhost:5173']
+    if not valid_origins:
+        print("Warning: No valid CORS origins configured. Using default localhost origins.")
+        valid_origins = ['http://localhost:3000', 'http://localhost:5173']
 
-CORS(app,
-     origins=valid_origins,
-     supports_credentials=True,
-     methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH'],
-     allow_headers=['Content-Type', 'Authorization']
-)
+    CORS(app,
+         origins=valid_origins,
+         supports_credentials=True,
+         methods=['GET', 'POST', 'PUT', 'DELETE', 'PATCH'],
+         allow_headers=['Content-Type', 'Authorization']
+    )
@@ -0,0 +1,108 @@
+"""
+Serialization, compression and content negotiation for API responses
+
+JSON is encoded with orjson when it is installed. Clients can ask for
+MessagePack (Accept: application/msgpack or ?format=msgpack), and bodies
+above COMPRESSION_THRESHOLD bytes are gzip/brotli compressed according to
+Accept-Encoding.
+"""
+import gzip
+import json
+import os
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Responses smaller than this are sent uncompressed (compression wouldn't pay off)
+COMPRESSION_THRESHOLD = int(os.getenv('COMPRESSION_THRESHOLD', '1024'))
+
+
+def dumps_json(data):
+    """Encode data as compact UTF-8 JSON bytes (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def dumps_msgpack(data):
+    """Encode data as MessagePack bytes"""
+    if msgpack is None:
+        raise RuntimeError('msgpack is not installed')
+    return msgpack.packb(data, use_bin_type=True)
+
+
+def compress_gzip(body, level=6):
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def compress_brotli(body, quality=5):
+    if brotli is None:
+        raise RuntimeError('brotli is not installed')
+    return brotli.compress(body, quality=quality)
+
+
+def available_formats():
+    """Response formats that can be produced with the installed libraries"""
+    return [JSON_MIMETYPE] + ([MSGPACK_MIMETYPE] if msgpack is not None else [])
+
+
+def available_encodings():
+    """Content-Encodings that can be produced, most preferred first"""
+    return (['br'] if brotli is not None else []) + ['gzip']
+
+
+def negotiate_format(request):
+    """Pick the response mimetype from ?format=json|msgpack or the Accept header"""
+    requested = request.args.get('format')
+    if requested == 'msgpack' and msgpack is not None:
+        return MSGPACK_MIMETYPE
+    if requested == 'json':
+        return JSON_MIMETYPE
+    return request.accept_mimetypes.best_match(available_formats(), default=JSON_MIMETYPE)
+
+
+def negotiate_encoding(request):
+    """Pick the Content-Encoding from the Accept-Encoding header ('identity' if none fits)"""
+    return request.accept_encodings.best_match(available_encodings() + ['identity'], default='identity')
+
+
+def compress(body, encoding):
+    """Compress body for a negotiated Content-Encoding using per-request settings"""
+    if encoding == 'br':
+        return compress_brotli(body)
+    if encoding == 'gzip':
+        return compress_gzip(body)
+    return body
+
+
+def encode_response(request, data, status=200):
+    """Build a response for data in the client's preferred format and encoding"""
+    mimetype = negotiate_format(request)
+    body = dumps_msgpack(data) if mimetype == MSGPACK_MIMETYPE else dumps_json(data)
+
+    response = Response(body, status=status, mimetype=mimetype)
+    response.vary.update(('Accept', 'Accept-Encoding'))
+
+    if len(body) >= COMPRESSION_THRESHOLD:
+        encoding = negotiate_encoding(request)
+        if encoding != 'identity':
+            response.set_data(compress(body, encoding))
+            response.headers['Content-Encoding'] = encoding
+    return response
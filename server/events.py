@@ -0,0 +1,272 @@
+"""
+Server-sent event fan-out for catalog and progress changes
+
+Writes publish small change notifications ({type, op, ids, seq}) once their
+transaction commits. Notifications go through a broker so that every worker
+process sees them: a local SQLite file stands in for a real broker, written
+by publishers and tailed by one poller thread per process. The poller hands
+each event to the matching in-process subscribers.
+
+Subscribers don't get a thread of their own here. Each one has a bounded
+buffer and an Event to wait on, but the request serving the stream blocks on
+that Event: under gunicorn's gevent worker an idle connection costs one
+greenlet and a small deque, while under the sync and gthread workers it ties
+up a worker thread, so gunicorn.conf.py caps streams there (see
+routes/events.py).
+If a slow client's buffer overflows, the oldest events are dropped and the
+client is told to resync through /api/changes.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Per-connection buffer size and heartbeat interval
+SUBSCRIBER_BUFFER_SIZE = int(os.getenv('EVENTS_BUFFER_SIZE', '100'))
+HEARTBEAT_SECONDS = float(os.getenv('EVENTS_HEARTBEAT_SECONDS', '15'))
+
+# Maximum concurrent subscribers per process; gunicorn.conf.py lowers it to
+# the threads a blocking (sync or gthread) worker can spare
+MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', '10000'))
+
+# Broker polling and retention
+POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', '0.25'))
+RETENTION_SECONDS = 3600
+POLL_BATCH_SIZE = 500
+
+
+class SQLiteBroker:
+    """Cross-process event log in a local SQLite file (a stand-in for a real broker)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS events ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'user_id INTEGER, '
+                'payload TEXT NOT NULL, '
+                'created_at REAL NOT NULL)'
+            )
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def publish_many(self, events):
+        """Append events: iterable of (user_id or None, payload dict)"""
+        rows = [(user_id, json.dumps(payload), time.time()) for user_id, payload in events]
+        conn = self._connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('INSERT INTO events (user_id, payload, created_at) VALUES (?, ?, ?)', rows)
+
+    def last_id(self):
+        return self._connection().execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+
+    def read_after(self, last_id, limit=POLL_BATCH_SIZE):
+        return self._connection().execute(
+            'SELECT id, user_id, payload FROM events WHERE id > ? ORDER BY id LIMIT ?',
+            (last_id, limit)
+        ).fetchall()
+
+    def prune(self, older_than):
+        conn = self._connection()
+        with conn:
+            conn.execute('DELETE FROM events WHERE created_at < ?', (older_than,))
+
+
+class Subscriber:
+    """One SSE connection: a bounded buffer plus a wake-up flag"""
+
+    def __init__(self, user_id, buffer_size=SUBSCRIBER_BUFFER_SIZE):
+        self.user_id = user_id
+        self.buffer = deque(maxlen=buffer_size)
+        self.overflowed = False
+        self._ready = threading.Event()
+
+    def deliver(self, event_id, payload):
+        if len(self.buffer) == self.buffer.maxlen:
+            self.overflowed = True
+        self.buffer.append((event_id, payload))
+        self._ready.set()
+
+    def wait(self, timeout):
+        """
+        Wait up to timeout seconds for events
+        Returns: (events, overflowed)
+        """
+        self._ready.wait(timeout)
+        self._ready.clear()
+        events = []
+        while self.buffer:
+            events.append(self.buffer.popleft())
+        overflowed, self.overflowed = self.overflowed, False
+        return events, overflowed
+
+
+class EventHub:
+    """In-process pub/sub fed by a single broker poller thread"""
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._subscribers = {}  # user_id -> set of Subscriber
+        self._count = 0
+        self._lock = threading.Lock()
+        self._poller_pid = None
+
+    def subscribe(self, user_id):
+        """Register a subscriber, or return None if this process is at capacity"""
+        self._ensure_poller()
+        with self._lock:
+            if self._count >= MAX_SUBSCRIBERS:
+                return None
+            subscriber = Subscriber(user_id)
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+            self._count += 1
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(subscriber.user_id)
+            if subscribers and subscriber in subscribers:
+                subscribers.discard(subscriber)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscriber.user_id]
+
+    def publish(self, events):
+        """Publish (user_id or None, payload) events to every worker"""
+        if events:
+            self.broker.publish_many(events)
+
+    def dispatch(self, event_id, user_id, payload):
+        """Deliver one event: catalog events go to everyone, user events to that user"""
+        with self._lock:
+            if user_id is None:
+                targets = [s for subscribers in self._subscribers.values() for s in subscribers]
+            else:
+                targets = list(self._subscribers.get(user_id, ()))
+        for subscriber in targets:
+            subscriber.deliver(event_id, payload)
+
+    def _ensure_poller(self):
+        if self._poller_pid == os.getpid():
+            return
+        with self._lock:
+            if self._poller_pid != os.getpid():
+                self._poller_pid = os.getpid()
+                threading.Thread(target=self._poll, name='events-poller', daemon=True).start()
+
+    def _poll(self):
+        last_id = self.broker.last_id()
+        last_prune = time.monotonic()
+        while True:
+            try:
+                rows = self.broker.read_after(last_id)
+                for event_id, user_id, payload in rows:
+                    self.dispatch(event_id, user_id, json.loads(payload))
+                    last_id = event_id
+
+                if time.monotonic() - last_prune > RETENTION_SECONDS:
+                    self.broker.prune(time.time() - RETENTION_SECONDS)
+                    last_prune = time.monotonic()
+
+                if len(rows) < POLL_BATCH_SIZE:
+                    time.sleep(POLL_INTERVAL)
+            except Exception:
+                logger.exception('Event broker poll failed')
+                time.sleep(1)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def init_events(app):
+    """
+    Create the process-wide hub, with the broker file in the instance folder
+
+    Called by create_app, so web workers and job workers publish to the
+    broker from their first commit; the poller thread only starts once this
+    process serves a subscriber.
+    """
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            path = os.getenv('EVENTS_BROKER_PATH', os.path.join(app.instance_path, 'events.db'))
+            _hub = EventHub(SQLiteBroker(path))
+    return _hub
+
+
+def get_hub():
+    return _hub
+
+
+# Session hooks: turn objects stamped by changes.py into events once committed
+
+def _describe(obj, op):
+    """Build the (user_id, payload) event for a changed or deleted row"""
+    if obj['entity'] == 'problem':
+        return None, {'type': 'problem', 'op': op, 'problem_id': obj['problem_id'], 'seq': obj['seq']}
+    return obj['user_id'], {
+        'type': 'user_problem', 'op': op,
+        'user_id': obj['user_id'], 'problem_id': obj['problem_id'], 'seq': obj['seq']
+    }
+
+
+@event.listens_for(Session, 'before_commit')
+def _collect_changes(session):
+    changed = session.info.pop('changed_objects', None)
+    deleted = session.info.pop('deleted_rows', None)
+    if not changed and not deleted:
+        return
+
+    # Flush so new rows have their primary keys
+    if changed:
+        session.flush()
+
+    pending = session.info.setdefault('pending_events', [])
+    for obj in changed or ():
+        if obj.__tablename__ == 'problems':
+            row = {'entity': 'problem', 'problem_id': obj.id, 'user_id': None, 'seq': obj.change_seq}
+        else:
+            row = {'entity': 'user_problem', 'problem_id': obj.problem_id, 'user_id': obj.user_id, 'seq': obj.change_seq}
+        pending.append(_describe(row, 'upsert'))
+
+    for entity, problem_id, user_id, seq in deleted or ():
+        row = {'entity': entity, 'problem_id': problem_id, 'user_id': user_id, 'seq': seq}
+        pending.append(_describe(row, 'delete'))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_changes(session):
+    pending = session.info.pop('pending_events', None)
+    if not pending or _hub is None:
+        return
+    try:
+        _hub.publish(pending)
+    except Exception:
+        # Clients still catch up through /api/changes
+        logger.exception('Failed to publish change events')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    for key in ('changed_objects', 'deleted_rows', 'pending_events'):
+        session.info.pop(key, None)
+
@@ -0,0 +1,94 @@
+"""
+Facet counts for the problem filters
+
+One grouped query counts the catalog per (difficulty, category) cell, under
+the tag filter if any. Each facet is rolled up from those cells with the
+other facet's selection applied but not its own, so picking "Easy" still
+shows how many Medium and Hard problems there are. Cells are cached per
+process, keyed by the catalog version (catalog_snapshot.catalog_version)
+and tag filter: any catalog write or delete bumps the version, so stale
+entries are never read again and fall out of the LRU.
+
+The current user's completed counts come from their own summaries (on their
+shard, see sharding.py) and are never cached.
+"""
+import threading
+from collections import OrderedDict
+
+from config import db
+from models.models import Problem, UserProblem
+from catalog_snapshot import catalog_version
+from tags import filter_by_tags
+
+# Tag filters whose cells are kept per process
+FACET_CACHE_SIZE = 256
+
+_cells = OrderedDict()
+_cells_lock = threading.Lock()
+
+
+def _count_cells(query):
+    """[(difficulty, category, count)] of a Problem query, in one grouped query"""
+    rows = (
+        query.with_entities(Problem.difficulty, Problem.category, db.func.count())
+        .group_by(Problem.difficulty, Problem.category)
+        .all()
+    )
+    return [tuple(row) for row in rows]
+
+
+def _catalog_cells(tags, match):
+    key = (catalog_version(), tuple(tags), match)
+    with _cells_lock:
+        cells = _cells.get(key)
+        if cells is not None:
+            _cells.move_to_end(key)
+            return cells
+
+    query = Problem.query
+    if tags:
+        query = filter_by_tags(query, tags, match)
+    cells = _count_cells(query)
+
+    with _cells_lock:
+        _cells[key] = cells
+        while len(_cells) > FACET_CACHE_SIZE:
+            _cells.popitem(last=False)
+    return cells
+
+
+def _completed_cells(user_id, tags, match):
+    problem_ids = db.session.execute(
+        db.select(UserProblem.problem_id)
+        .where(UserProblem.user_id == user_id, UserProblem.status == 'Completed')
+    ).scalars().all()
+    if not problem_ids:
+        return []
+    query = Problem.query.filter(Problem.id.in_(problem_ids))
+    if tags:
+        query = filter_by_tags(query, tags, match)
+    return _count_cells(query)
+
+
+def _roll_up(cells, difficulty=None, category=None):
+    """Per-difficulty counts within category, per-category counts within difficulty, and the total"""
+    by_difficulty, by_category, total = {}, {}, 0
+    for cell_difficulty, cell_category, count in cells:
+        if not category or cell_category == category:
+            by_difficulty[cell_difficulty] = by_difficulty.get(cell_difficulty, 0) + count
+        if not difficulty or cell_difficulty == difficulty:
+            by_category[cell_category] = by_category.get(cell_category, 0) + count
+            if not category or cell_category == category:
+                total += count
+    return {'total': total, 'difficulty': by_difficulty, 'category': by_category}
+
+
+def problem_facets(difficulty=None, category=None, tags=(), match='all', completed_by=None):
+    """
+    Problem counts per difficulty and per category for a filter, plus the
+    counts completed by user id completed_by, if given
+    """
+    facets = _roll_up(_catalog_cells(tags, match), difficulty, category)
+    if completed_by is not None:
+        facets['completed'] = _roll_up(_completed_cells(completed_by, tags, match), difficulty, category)
+    return facets
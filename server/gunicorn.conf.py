@@ -0,0 +1,87 @@
+"""
+Gunicorn configuration for production
+
+    cd server && gunicorn -c gunicorn.conf.py
+
+The app is preloaded in the master and shared copy-on-write by the workers,
+so imports and create_app() run once instead of once per worker. Database
+connection pools must not cross the fork: the master disposes its engines
+once the app is loaded, and each worker drops any pool state it inherited
+before serving.
+
+Every setting can be overridden from the environment (see .env.example).
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+from config import env_path
+
+# Settings below are read before the app loads the .env file itself
+load_dotenv(dotenv_path=env_path)
+
+wsgi_app = 'wsgi:app'
+
+bind = os.getenv('GUNICORN_BIND') or f"0.0.0.0:{os.getenv('PORT', '5555')}"
+
+# Processes, and threads per process; more than one thread selects the gthread worker
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS') or ('gthread' if threads > 1 else 'sync')
+
+# A server-sent event stream (/api/events) holds the thread serving it while it
+# is open. Unless the worker is cooperative (gevent or eventlet, where a stream
+# is a greenlet), cap streams per process so one thread is always left for
+# other requests: none under the sync worker, threads - 1 under gthread.
+# Set before the app is loaded, which reads EVENTS_MAX_SUBSCRIBERS (events.py)
+if 'gevent' not in worker_class and 'eventlet' not in worker_class:
+    blocking_streams = threads - 1 if 'gthread' in worker_class else 0
+    os.environ['EVENTS_MAX_SUBSCRIBERS'] = str(
+        min(int(os.getenv('EVENTS_MAX_SUBSCRIBERS', '10000')), blocking_streams)
+    )
+
+# Recycle each worker after this many requests (plus up to the jitter, so they
+# don't all restart at once), bounding slow memory growth
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def _app_engines():
+    from wsgi import app
+    from config import db
+    with app.app_context():
+        return list(db.engines.values())
+
+
+def when_ready(server):
+    """In the master, after preloading: close connections opened while creating the app"""
+    if server.cfg.preload_app:
+        for engine in _app_engines():
+            engine.dispose()
+
+
+def post_fork(server, worker):
+    """
+    In each new worker: replace inherited pools without closing their
+    connections, which may still belong to the master
+    """
+    if server.cfg.preload_app:
+        for engine in _app_engines():
+            engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    """In each exiting worker: write notes still waiting in the autosave buffer (autosave.py)"""
+    from wsgi import app
+    from autosave import notes_autosave
+    notes_autosave(app).shutdown()
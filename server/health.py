@@ -0,0 +1,75 @@
+"""
+Load-balancer health checks, answered below Flask
+
+/healthz and /readyz are served by WSGI middleware in front of the Flask
+app, so probes skip routing, the session cookie, CORS and every
+before/after request hook (profiling, the in-process job worker).
+
+/healthz says the process is up and never touches the database.
+/readyz pings every database the app uses (main and user shards) with a
+connection from its pool: SELECT 1, no ORM session. It answers 503 if any
+of them fails.
+"""
+import json
+import logging
+
+from config import db
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PATH = '/healthz'
+READY_PATH = '/readyz'
+
+
+def _respond(start_response, status, body):
+    payload = json.dumps(body).encode('utf-8')
+    start_response(status, [
+        ('Content-Type', 'application/json'),
+        ('Content-Length', str(len(payload))),
+        ('Cache-Control', 'no-store'),
+    ])
+    return [payload]
+
+
+class HealthChecks:
+    """WSGI middleware answering the health check paths, passing everything else to wsgi_app"""
+
+    def __init__(self, app, wsgi_app):
+        self.app = app
+        self.wsgi_app = wsgi_app
+        self._engines = None
+
+    def engines(self):
+        # Engines are created once per app; disposing their pools after a fork keeps the same objects
+        if self._engines is None:
+            with self.app.app_context():
+                self._engines = dict(db.engines)
+        return self._engines
+
+    def ready(self):
+        """(ready, {database: error}) after pinging every engine"""
+        failures = {}
+        for bind_key, engine in self.engines().items():
+            try:
+                with engine.connect() as connection:
+                    connection.exec_driver_sql('SELECT 1')
+            except Exception as e:
+                logger.warning('Readiness check failed for %s: %s', bind_key or 'main', e)
+                failures[bind_key or 'main'] = type(e).__name__
+        return not failures, failures
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO')
+        if path == HEALTH_PATH:
+            return _respond(start_response, '200 OK', {'status': 'ok'})
+        if path == READY_PATH:
+            ready, failures = self.ready()
+            if ready:
+                return _respond(start_response, '200 OK', {'status': 'ready'})
+            return _respond(start_response, '503 Service Unavailable', {'status': 'unavailable', 'failed': failures})
+        return self.wsgi_app(environ, start_response)
+
+
+def init_health_checks(app):
+    """Put the health check middleware in front of the app"""
+    app.wsgi_app = HealthChecks(app, app.wsgi_app)
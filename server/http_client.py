@@ -0,0 +1,60 @@
+"""Shared, pooled HTTP client for outbound calls (OAuth provider, etc.)"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Strict timeouts: a slow provider must never stall a worker for long
+CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '2'))
+READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '5'))
+DEFAULT_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+# Keep-alive connections kept per host
+POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+
+
+class TimeoutSession(requests.Session):
+    """requests.Session that applies a default timeout to every request"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_http_session(timeout=DEFAULT_TIMEOUT, pool_size=POOL_SIZE):
+    """Create a pooled session that retries idempotent GETs on transient errors"""
+    retry = Retry(
+        total=2,
+        connect=2,
+        read=1,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+
+    session = TimeoutSession(timeout=timeout)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Return the process-wide pooled session (recreated after a fork)"""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        with _session_lock:
+            if _session is None or _session_pid != os.getpid():
+                _session, _session_pid = create_http_session(), os.getpid()
+    return _session
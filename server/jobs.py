@@ -0,0 +1,545 @@
+"""
+Durable background jobs stored in the application database
+
+Handlers are plain functions registered with @job_handler(name) and called
+with the job's payload as keyword arguments. enqueue() inserts the job in the
+caller's current transaction, so a job exists exactly when the write that
+needed it commits. Workers (`flask jobs work`) claim due jobs in priority
+order: on Postgres through SELECT ... FOR UPDATE SKIP LOCKED, so any number
+of workers can poll the same table, and on SQLite under its single-writer
+lock.
+
+Delivery is at-least-once. A failing job is retried with exponential backoff
+until max_attempts, and a job whose worker died is requeued once its lease
+expires, so handlers must be idempotent. Handlers registered with cron= are
+also enqueued on that schedule; a compare-and-set on job_schedules makes sure
+only one worker enqueues each run.
+"""
+import importlib
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+
+from config import db
+from models.models import Job, JobSchedule
+from review import utcnow
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+# Idle polling interval and how long a claimed job may go without a lease renewal
+POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', '1'))
+LEASE_SECONDS = int(os.getenv('JOBS_LEASE_SECONDS', '300'))
+
+# Retry backoff: RETRY_BASE_SECONDS * 2^(attempt - 1), capped, with jitter
+RETRY_BASE_SECONDS = int(os.getenv('JOBS_RETRY_BASE_SECONDS', '10'))
+RETRY_MAX_SECONDS = 3600
+
+# Finished jobs are kept this long for metrics; failed jobs are kept until removed by hand
+RETENTION_DAYS = int(os.getenv('JOBS_RETENTION_DAYS', '7'))
+
+# How often each worker requeues expired leases and enqueues due schedules
+MAINTENANCE_INTERVAL = 15
+
+# Modules that register handlers, imported by workers
+HANDLER_MODULES = ('jobs', 'oidc', 'cascade_delete', 'catalog_snapshot', 'attempts', 'rollups', 'problem_stats')
+
+Handler = namedtuple('Handler', ['fn', 'cron', 'priority', 'secret_payload'])
+_handlers = {}
+
+
+def job_handler(name, cron=None, priority=PRIORITY_NORMAL, secret_payload=False):
+    """
+    Register fn as the handler for jobs called name, optionally run on a cron schedule
+    secret_payload: the payload holds credentials, cleared once the job is done or failed
+    """
+    if cron is not None:
+        CronSchedule(cron)  # Fail at import time on a bad expression
+
+    def decorator(fn):
+        _handlers[name] = Handler(fn, cron, priority, secret_payload)
+        return fn
+    return decorator
+
+
+def load_handlers():
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+    return _handlers
+
+
+def enqueue(name, payload=None, priority=PRIORITY_NORMAL, delay=0, dedupe_key=None,
+            max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Add a job to the current transaction; workers see it once the caller commits
+
+    With a dedupe_key, nothing is added while a job with that key is still
+    queued, so bursts of enqueues coalesce into one run.
+    """
+    now = utcnow()
+    values = {
+        'name': name,
+        'payload': payload or {},
+        'priority': priority,
+        'dedupe_key': dedupe_key,
+        'status': 'queued',
+        'attempts': 0,
+        'max_attempts': max_attempts,
+        'run_at': now + timedelta(seconds=delay),
+        'created_at': now,
+    }
+
+    dialect = db.session.get_bind().dialect.name
+    if dedupe_key is None or dialect not in ('postgresql', 'sqlite'):
+        if dedupe_key is not None and db.session.execute(
+            db.select(Job.id).where(Job.dedupe_key == dedupe_key, Job.status == 'queued')
+        ).first():
+            return
+        db.session.execute(db.insert(Job).values(**values))
+        return
+
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    db.session.execute(
+        insert(Job).values(**values).on_conflict_do_nothing(
+            index_elements=['dedupe_key'],
+            index_where=Job.status == 'queued'
+        )
+    )
+
+
+def claim_job(worker_id):
+    """Lease the highest-priority due job to worker_id, or return None"""
+    now = utcnow()
+    candidate = (
+        db.select(Job.id)
+        .where(Job.status == 'queued', Job.run_at <= now)
+        .order_by(Job.priority.desc(), Job.run_at, Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    job = db.session.execute(
+        db.update(Job)
+        .where(Job.id == candidate, Job.status == 'queued')
+        .values(status='running', locked_by=worker_id, locked_at=now, started_at=now, attempts=Job.attempts + 1)
+        .returning(Job.id, Job.name, Job.payload, Job.attempts, Job.max_attempts, Job.run_at, Job.started_at)
+    ).first()
+    db.session.commit()
+    return job
+
+
+def retry_delay(attempts):
+    """Seconds before retry number attempts, with +/-20% jitter"""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def run_job(job, worker_id):
+    """Run a claimed job and record its outcome and timings"""
+    handler = _handlers.get(job.name)
+    start = time.perf_counter()
+    error = None
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for job {job.name!r}')
+        handler.fn(**job.payload)
+    except Exception as exc:
+        db.session.rollback()
+        logger.exception('Job %s (%s) failed on attempt %s', job.id, job.name, job.attempts)
+        error = f'{type(exc).__name__}: {exc}'
+    duration_ms = int((time.perf_counter() - start) * 1000)
+
+    now = utcnow()
+    values = {
+        'locked_by': None,
+        'locked_at': None,
+        'duration_ms': duration_ms,
+        'wait_ms': int((job.started_at - job.run_at).total_seconds() * 1000),
+        'last_error': error,
+    }
+    # A worker that lost its lease must not overwrite the new owner's state
+    owned = Job.locked_by == worker_id
+    if error is None:
+        values.update(status='done', finished_at=now)
+    elif job.attempts >= job.max_attempts:
+        values.update(status='failed', finished_at=now)
+    else:
+        values.update(run_at=now + timedelta(seconds=retry_delay(job.attempts)))
+        requeue_job(job.id, values, owned)
+        scrub_payloads(Job.id == job.id)
+        db.session.commit()
+        return False
+
+    db.session.execute(db.update(Job).where(Job.id == job.id, owned).values(**values))
+    scrub_payloads(Job.id == job.id)
+    db.session.commit()
+    return error is None
+
+
+def requeue_job(job_id, values, *where):
+    """
+    Put a job back in the queue with values, in the current transaction
+
+    If a job with the same dedupe_key is already queued, that one will do
+    the same work, and a second queued job would break uq_jobs_dedupe_key,
+    so this one is failed instead.
+    Returns: whether the job was requeued
+    """
+    twin = db.aliased(Job)
+    queued_twin = db.select(twin.id).where(
+        twin.dedupe_key == Job.dedupe_key, twin.status == 'queued', twin.id != Job.id
+    ).exists()
+    requeued = db.session.execute(
+        db.update(Job).where(Job.id == job_id, *where, ~queued_twin).values(status='queued', **values)
+    ).rowcount
+    if not requeued:
+        last_error = values.get('last_error')
+        db.session.execute(
+            db.update(Job).where(Job.id == job_id, *where).values(
+                **dict(
+                    values, status='failed', finished_at=utcnow(),
+                    last_error=f'{last_error} (not retried: a job with the same dedupe_key is queued)'
+                )
+            )
+        )
+    return bool(requeued)
+
+
+def scrub_payloads(*where):
+    """Clear the payloads of finished jobs whose handler was registered with secret_payload"""
+    names = [name for name, handler in _handlers.items() if handler.secret_payload]
+    if names:
+        db.session.execute(
+            db.update(Job)
+            .where(Job.name.in_(names), Job.status.in_(('done', 'failed')), *where)
+            .values(payload={})
+        )
+
+
+def renew_leases(worker_ids):
+    """Extend the leases of jobs still being run by these workers"""
+    if worker_ids:
+        db.session.execute(
+            db.update(Job)
+            .where(Job.status == 'running', Job.locked_by.in_(worker_ids))
+            .values(locked_at=utcnow())
+        )
+        db.session.commit()
+
+
+def requeue_expired(now=None):
+    """Requeue jobs whose worker stopped renewing its lease (or fail them when out of attempts)"""
+    now = now or utcnow()
+    expired = db.and_(Job.status == 'running', Job.locked_at < now - timedelta(seconds=LEASE_SECONDS))
+    cleared = {'locked_by': None, 'locked_at': None, 'last_error': 'Lease expired'}
+    expired_ids = db.session.execute(db.select(Job.id).where(expired).order_by(Job.id)).scalars().all()
+    if not expired_ids:
+        return
+    db.session.execute(
+        db.update(Job).where(expired, Job.attempts >= Job.max_attempts).values(status='failed', finished_at=now, **cleared)
+    )
+    # One at a time, oldest first: two expired jobs may share a dedupe_key
+    for job_id in expired_ids:
+        requeue_job(job_id, dict(cleared, run_at=now), expired)
+    scrub_payloads(Job.id.in_(expired_ids))
+    db.session.commit()
+
+
+# Cron-style schedules
+
+class CronSchedule:
+    """Five-field cron expression: minute hour day-of-month month day-of-week (0 = Sunday)"""
+
+    FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f'Cron expression needs 5 fields: {expression!r}')
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse(field, low, high) for field, (low, high) in zip(fields, self.FIELD_RANGES)
+        )
+        self.weekdays = {day % 7 for day in weekdays}
+        self.any_day, self.any_weekday = fields[2] == '*', fields[4] == '*'
+
+    @staticmethod
+    def _parse(field, low, high):
+        values = set()
+        for part in field.split(','):
+            part, _, step = part.partition('/')
+            if part == '*':
+                start, end = low, high
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-', 1))
+            else:
+                start = end = int(part)
+            if not low <= start <= end <= high:
+                raise ValueError(f'Cron field out of range: {field!r}')
+            values.update(range(start, end + 1, int(step) if step else 1))
+        return values
+
+    def _day_matches(self, moment):
+        day_ok = moment.day in self.days
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        # Like cron: when both day fields are restricted, either may match
+        if not self.any_day and not self.any_weekday:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_after(self, moment):
+        """First matching minute strictly after moment"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=366 * 5)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f'Cron expression never matches: {self.expression!r}')
+
+
+def sync_schedules(now=None):
+    """Create schedule rows for registered cron handlers and follow expression changes"""
+    now = now or utcnow()
+    existing = dict(db.session.execute(db.select(JobSchedule.name, JobSchedule.cron)).all())
+    for name, handler in _handlers.items():
+        if handler.cron is None or existing.get(name) == handler.cron:
+            continue
+        next_run_at = CronSchedule(handler.cron).next_after(now)
+        if name in existing:
+            db.session.execute(
+                db.update(JobSchedule).where(JobSchedule.name == name)
+                .values(cron=handler.cron, next_run_at=next_run_at)
+            )
+        else:
+            db.session.add(JobSchedule(name=name, cron=handler.cron, next_run_at=next_run_at))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker created them first
+        db.session.rollback()
+
+
+def enqueue_due_schedules(now=None):
+    """Enqueue one job per due schedule; returns the names enqueued by this worker"""
+    now = now or utcnow()
+    due = db.session.execute(
+        db.select(JobSchedule.name, JobSchedule.cron, JobSchedule.next_run_at)
+        .where(JobSchedule.next_run_at <= now)
+    ).all()
+
+    enqueued = []
+    for name, cron, next_run_at in due:
+        # Compare-and-set: only the worker that advances next_run_at enqueues this run
+        claimed = db.session.execute(
+            db.update(JobSchedule)
+            .where(JobSchedule.name == name, JobSchedule.next_run_at == next_run_at)
+            .values(next_run_at=CronSchedule(cron).next_after(now))
+        ).rowcount
+        if claimed:
+            handler = _handlers.get(name)
+            enqueue(name, priority=handler.priority if handler else PRIORITY_NORMAL, dedupe_key=f'cron:{name}')
+            enqueued.append(name)
+        db.session.commit()
+    return enqueued
+
+
+# Worker
+
+class Worker:
+    """Polls the jobs table from one or more threads of this process"""
+
+    def __init__(self, app, concurrency=1, poll_interval=POLL_INTERVAL):
+        self.app = app
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop = threading.Event()
+        self._busy = set()  # Worker ids currently running a job
+        self._busy_lock = threading.Lock()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, once=False):
+        """Work until stopped; with once=True, return when no job is due"""
+        load_handlers()
+        with self.app.app_context():
+            sync_schedules()
+
+        threading.Thread(target=self._renew_loop, name='jobs-lease', daemon=True).start()
+        threads = [
+            threading.Thread(target=self._loop, args=(f'{self.name}:{i}', once), name=f'jobs-worker-{i}')
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            # Let running jobs finish; their leases would requeue them otherwise
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+    def _loop(self, worker_id, once):
+        last_maintenance = 0.0
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    if time.monotonic() - last_maintenance > MAINTENANCE_INTERVAL:
+                        requeue_expired()
+                        enqueue_due_schedules()
+                        last_maintenance = time.monotonic()
+
+                    job = claim_job(worker_id)
+                    if job is None:
+                        if once:
+                            return
+                        self._stop.wait(self.poll_interval)
+                        continue
+
+                    with self._busy_lock:
+                        self._busy.add(worker_id)
+                    try:
+                        run_job(job, worker_id)
+                    finally:
+                        with self._busy_lock:
+                            self._busy.discard(worker_id)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Job worker %s loop failed', worker_id)
+                    self._stop.wait(self.poll_interval)
+                finally:
+                    # Start every job with an empty identity map
+                    db.session.remove()
+
+    def _renew_loop(self):
+        with self.app.app_context():
+            while not self._stop.wait(LEASE_SECONDS / 3):
+                with self._busy_lock:
+                    busy = list(self._busy)
+                try:
+                    renew_leases(busy)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Failed to renew job leases')
+                finally:
+                    db.session.remove()
+
+
+_in_process_pid = None
+_in_process_lock = threading.Lock()
+
+
+def init_jobs(app):
+    """With JOBS_IN_PROCESS_WORKER set (handy in development), serve jobs from a thread of the web process"""
+    if not app.config.get('JOBS_IN_PROCESS_WORKER'):
+        return
+
+    @app.before_request
+    def _start_in_process_worker():
+        global _in_process_pid
+        if _in_process_pid == os.getpid():
+            return
+        with _in_process_lock:
+            if _in_process_pid != os.getpid():
+                _in_process_pid = os.getpid()
+                worker = Worker(app)
+                threading.Thread(target=worker.run, name='jobs-in-process', daemon=True).start()
+
+
+# Metrics and housekeeping
+
+def job_stats():
+    """Counts and timings per job name and status"""
+    rows = db.session.execute(
+        db.select(
+            Job.name, Job.status, db.func.count(),
+            db.func.avg(Job.duration_ms), db.func.max(Job.duration_ms), db.func.avg(Job.wait_ms)
+        ).group_by(Job.name, Job.status).order_by(Job.name, Job.status)
+    ).all()
+    return [
+        {
+            'name': name,
+            'status': status,
+            'count': count,
+            'avg_duration_ms': round(avg_duration, 1) if avg_duration is not None else None,
+            'max_duration_ms': max_duration,
+            'avg_wait_ms': round(avg_wait, 1) if avg_wait is not None else None,
+        }
+        for name, status, count, avg_duration, max_duration, avg_wait in rows
+    ]
+
+
+@job_handler('jobs.purge', cron='43 4 * * *', priority=PRIORITY_LOW)
+def purge_finished_jobs(retention_days=RETENTION_DAYS):
+    """Delete jobs that finished successfully more than retention_days ago"""
+    cutoff = utcnow() - timedelta(days=retention_days)
+    db.session.execute(db.delete(Job).where(Job.status == 'done', Job.finished_at < cutoff))
+    # Failed jobs are kept, but not the credentials in their payloads
+    scrub_payloads()
+    db.session.commit()
+
+
+jobs_cli = AppGroup('jobs', help='Background job queue.')
+
+
+@jobs_cli.command('work')
+@click.option('--concurrency', type=int, default=1, show_default=True, help='Worker threads in this process')
+@click.option('--once', is_flag=True, help='Exit when no job is due instead of polling')
+def work_command(concurrency, once):
+    """Run a job worker"""
+    from flask import current_app
+    Worker(current_app._get_current_object(), concurrency=concurrency).run(once=once)
+
+
+@jobs_cli.command('enqueue')
+@click.argument('name')
+@click.option('--payload', default='{}', help='Handler keyword arguments as JSON')
+@click.option('--priority', type=int, default=PRIORITY_NORMAL, show_default=True)
+def enqueue_command(name, payload, priority):
+    """Queue a job by name"""
+    import json
+    enqueue(name, json.loads(payload), priority=priority)
+    db.session.commit()
+    click.echo(f'Queued {name}.')
+
+
+@jobs_cli.command('stats')
+def stats_command():
+    """Show counts and timings per job"""
+    click.echo(f'{"job":<28}{"status":<9}{"count":>7}{"avg ms":>10}{"max ms":>10}{"wait ms":>10}')
+    for row in job_stats():
+        click.echo(
+            f'{row["name"]:<28}{row["status"]:<9}{row["count"]:>7}'
+            f'{row["avg_duration_ms"] if row["avg_duration_ms"] is not None else "-":>10}'
+            f'{row["max_duration_ms"] if row["max_duration_ms"] is not None else "-":>10}'
+            f'{row["avg_wait_ms"] if row["avg_wait_ms"] is not None else "-":>10}'
+        )
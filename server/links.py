@@ -0,0 +1,53 @@
+"""
+Canonical problem links
+
+The same problem is linked in many ways: http or https, with or without
+www., a trailing slash, a query string, or a tab of the problem page
+(/description/, /solutions/, ...). Problem links are rewritten to one
+canonical form on write; its SHA-256 carries the unique index, and its last
+path segment is the problem's slug.
+"""
+import hashlib
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+# Trailing path segments naming a tab of a problem page rather than the problem
+PAGE_TABS = frozenset(['description', 'solutions', 'solution', 'editorial', 'submissions', 'discuss', 'problem'])
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonical_link(url):
+    """
+    https, lowercase host without www. or a default port, no query or
+    fragment, no repeated or trailing slashes, no page-tab segments
+    """
+    url = url.strip()
+    if '://' not in url:
+        url = f'https://{url}'
+    parts = urlsplit(url)
+
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f'{host}:{parts.port}'
+
+    segments = [segment for segment in re.split(r'/+', parts.path) if segment]
+    while len(segments) > 1 and segments[-1].lower() in PAGE_TABS:
+        segments.pop()
+    path = '/' + '/'.join(segments) if segments else ''
+
+    return urlunsplit(('https', host, path, '', ''))
+
+
+def link_hash(canonical):
+    """Hex SHA-256 of a canonical link, the problems table's unique key for it"""
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def link_slug(canonical):
+    """The canonical link's last path segment, lowercased, or None for a bare host"""
+    path = urlsplit(canonical).path.rstrip('/')
+    slug = path.rsplit('/', 1)[-1].lower()
+    return slug or None
@@ -0,0 +1,128 @@
+"""Add append-only attempt events
+
+Revision ID: 4d9a1c6b2e57
+Revises: c2d84b6e1f07
+Create Date: 2026-10-19 14:02:11.384920
+
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d9a1c6b2e57'
+down_revision = 'c2d84b6e1f07'
+branch_labels = None
+depends_on = None
+
+
+def _parse(date_string):
+    try:
+        parsed = datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _next_month(month_start):
+    if month_start.month == 12:
+        return month_start.replace(year=month_start.year + 1, month=1)
+    return month_start.replace(month=month_start.month + 1)
+
+
+def _create_partitioned_table(months):
+    # Postgres requires the partition key in the primary key
+    op.execute(
+        'CREATE TABLE attempt_events ('
+        'id BIGINT GENERATED BY DEFAULT AS IDENTITY, '
+        'user_id INTEGER NOT NULL, '
+        'problem_id INTEGER NOT NULL, '
+        'ts TIMESTAMP WITHOUT TIME ZONE NOT NULL, '
+        'status VARCHAR NOT NULL, '
+        'attempts INTEGER NOT NULL, '
+        'CONSTRAINT pk_attempt_events PRIMARY KEY (user_id, ts, id), '
+        'CONSTRAINT fk_attempt_events_user_id_users FOREIGN KEY (user_id) '
+        'REFERENCES users (id) ON DELETE CASCADE, '
+        'CONSTRAINT fk_attempt_events_problem_id_problems FOREIGN KEY (problem_id) '
+        'REFERENCES problems (id) ON DELETE CASCADE'
+        ') PARTITION BY RANGE (ts)'
+    )
+    for start in months:
+        end = _next_month(start)
+        op.execute(
+            f'CREATE TABLE attempt_events_y{start.year}m{start.month:02d} PARTITION OF attempt_events '
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    op.execute('CREATE TABLE attempt_events_default PARTITION OF attempt_events DEFAULT')
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # One event per existing attempt, carrying its accumulated attempt count
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = bind.execute(sa.text(
+        'SELECT user_id, problem_id, date_attempted, status, num_attempts FROM user_problems'
+    )).all()
+    backfill = [
+        {
+            'user_id': user_id,
+            'problem_id': problem_id,
+            'ts': _parse(date_attempted) or now,
+            'status': status,
+            'attempts': num_attempts or 1,
+        }
+        for user_id, problem_id, date_attempted, status, num_attempts in rows
+    ]
+
+    if bind.dialect.name == 'postgresql':
+        # Monthly partitions covering the backfilled history and the next three months
+        month = min([row['ts'] for row in backfill] + [now]).date().replace(day=1)
+        last = date(now.year, now.month, 1)
+        for _ in range(3):
+            last = _next_month(last)
+        months = []
+        while month <= last:
+            months.append(month)
+            month = _next_month(month)
+        _create_partitioned_table(months)
+        events = sa.table('attempt_events',
+            sa.column('user_id', sa.Integer()),
+            sa.column('problem_id', sa.Integer()),
+            sa.column('ts', sa.DateTime()),
+            sa.column('status', sa.String()),
+            sa.column('attempts', sa.Integer()),
+        )
+    else:
+        # ### commands auto generated by Alembic - please adjust! ###
+        events = op.create_table('attempt_events',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('problem_id', sa.Integer(), nullable=False),
+        sa.Column('ts', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['problem_id'], ['problems.id'], name=op.f('fk_attempt_events_problem_id_problems'), ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_attempt_events_user_id_users'), ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_attempt_events'))
+        )
+        # ### end Alembic commands ###
+
+    op.create_index('ix_attempt_events_user_id_ts', 'attempt_events', ['user_id', 'ts'], unique=False)
+    op.create_index('ix_attempt_events_user_id_problem_id_ts', 'attempt_events', ['user_id', 'problem_id', 'ts'], unique=False)
+    op.create_index('ix_attempt_events_problem_id', 'attempt_events', ['problem_id'], unique=False)
+
+    if backfill:
+        op.bulk_insert(events, backfill)
+
+
+def downgrade():
+    op.drop_index('ix_attempt_events_problem_id', table_name='attempt_events')
+    op.drop_index('ix_attempt_events_user_id_problem_id_ts', table_name='attempt_events')
+    op.drop_index('ix_attempt_events_user_id_ts', table_name='attempt_events')
+    # Dropping a partitioned table drops its partitions too
+    op.drop_table('attempt_events')
@@ -0,0 +1,164 @@
+"""Canonicalize problem links and merge duplicate problems
+
+Revision ID: 9e1b3d5f7a24
+Revises: 7d2f4b6a8c10
+Create Date: 2026-10-19 16:41:09.382715
+
+"""
+import hashlib
+import re
+from datetime import datetime, timezone
+from urllib.parse import urlsplit, urlunsplit
+
+from alembic import op
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e1b3d5f7a24'
+down_revision = '7d2f4b6a8c10'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of links.py as of this revision, so later changes there can't alter this migration
+PAGE_TABS = frozenset(['description', 'solutions', 'solution', 'editorial', 'submissions', 'discuss', 'problem'])
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonical_link(url):
+    url = url.strip()
+    if '://' not in url:
+        url = f'https://{url}'
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port != DEFAULT_PORTS.get(parts.scheme.lower()):
+        host = f'{host}:{parts.port}'
+    segments = [segment for segment in re.split(r'/+', parts.path) if segment]
+    while len(segments) > 1 and segments[-1].lower() in PAGE_TABS:
+        segments.pop()
+    path = '/' + '/'.join(segments) if segments else ''
+    return urlunsplit(('https', host, path, '', ''))
+
+
+def link_slug(canonical):
+    slug = urlsplit(canonical).path.rstrip('/').rsplit('/', 1)[-1].lower()
+    return slug or None
+
+
+problems = sa.table('problems', sa.column('id'), sa.column('problem_link'), sa.column('link_hash'), sa.column('slug'))
+user_problems = sa.table(
+    'user_problems', sa.column('user_id'), sa.column('problem_id'), sa.column('date_attempted'), sa.column('change_seq')
+)
+attempt_events = sa.table('attempt_events', sa.column('problem_id'))
+change_counters = sa.table('change_counters', sa.column('name'), sa.column('value'))
+tombstones = sa.table(
+    'tombstones', sa.column('seq'), sa.column('entity'), sa.column('problem_id'), sa.column('user_id'), sa.column('deleted_at')
+)
+
+
+def merge_user_problems(connection, merges, seq):
+    """
+    Move duplicates' user_problems rows to the problem they are merged into;
+    where a user has both, the most recently attempted row wins
+    """
+    for duplicate_id, keeper_id in merges.items():
+        rows = connection.execute(
+            sa.select(user_problems.c.user_id, user_problems.c.date_attempted)
+            .where(user_problems.c.problem_id == duplicate_id)
+        ).all()
+        for user_id, date_attempted in rows:
+            kept = connection.execute(
+                sa.select(user_problems.c.date_attempted)
+                .where(user_problems.c.user_id == user_id, user_problems.c.problem_id == keeper_id)
+            ).scalar()
+            loser = duplicate_id if kept is not None and kept >= date_attempted else keeper_id
+            if kept is not None:
+                connection.execute(user_problems.delete().where(
+                    user_problems.c.user_id == user_id, user_problems.c.problem_id == loser
+                ))
+            if loser != duplicate_id:
+                connection.execute(
+                    user_problems.update()
+                    .where(user_problems.c.user_id == user_id, user_problems.c.problem_id == duplicate_id)
+                    .values(problem_id=keeper_id, change_seq=seq)
+                )
+
+
+def upgrade():
+    with op.batch_alter_table('problems', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('link_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('slug', sa.String(), nullable=True))
+
+    connection = op.get_bind()
+    keepers = {}
+    merges = {}
+    for problem_id, problem_link in connection.execute(
+        sa.select(problems.c.id, problems.c.problem_link).order_by(problems.c.id)
+    ):
+        link = canonical_link(problem_link)
+        # The oldest problem with a link absorbs the later ones
+        keeper_id = keepers.setdefault(link, problem_id)
+        if keeper_id != problem_id:
+            merges[problem_id] = keeper_id
+
+    if merges:
+        # One change sequence number per tombstone, plus one for the moved rows
+        seq = connection.execute(
+            sa.select(change_counters.c.value).where(change_counters.c.name == 'changes')
+        ).scalar() or 0
+        connection.execute(
+            change_counters.update().where(change_counters.c.name == 'changes').values(value=seq + len(merges) + 1)
+        )
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        op.bulk_insert(tombstones, [
+            {'seq': seq + 1 + i, 'entity': 'problem', 'problem_id': duplicate_id, 'user_id': None, 'deleted_at': now}
+            for i, duplicate_id in enumerate(merges)
+        ])
+        moved_seq = seq + len(merges) + 1
+
+        merge_user_problems(connection, merges, moved_seq)
+        for duplicate_id, keeper_id in merges.items():
+            connection.execute(
+                attempt_events.update().where(attempt_events.c.problem_id == duplicate_id).values(problem_id=keeper_id)
+            )
+
+        # user_problems rows of users on user shards (sharding.py) live in other databases
+        for bind_key, uri in (current_app.config.get('SQLALCHEMY_BINDS') or {}).items():
+            if not bind_key.startswith('user_shard_'):
+                continue
+            engine = sa.create_engine(uri)
+            try:
+                with engine.begin() as shard:
+                    if sa.inspect(shard).has_table('user_problems'):
+                        merge_user_problems(shard, merges, moved_seq)
+            finally:
+                engine.dispose()
+
+        connection.execute(problems.delete().where(problems.c.id.in_(list(merges))))
+
+    for link, keeper_id in keepers.items():
+        connection.execute(
+            problems.update().where(problems.c.id == keeper_id).values(
+                problem_link=link,
+                link_hash=hashlib.sha256(link.encode('utf-8')).hexdigest(),
+                slug=link_slug(link),
+            )
+        )
+
+    with op.batch_alter_table('problems', schema=None) as batch_op:
+        batch_op.alter_column('link_hash', existing_type=sa.String(length=64), nullable=False)
+        batch_op.create_index(batch_op.f('ix_problems_link_hash'), ['link_hash'], unique=True)
+        batch_op.create_index(batch_op.f('ix_problems_slug'), ['slug'], unique=False)
+    # Solve stats of merged problems are recounted by `flask refresh-problem-stats`
+
+
+def downgrade():
+    # Merged duplicates are not restored
+    with op.batch_alter_table('problems', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_problems_slug'))
+        batch_op.drop_index(batch_op.f('ix_problems_link_hash'))
+        batch_op.drop_column('slug')
+        batch_op.drop_column('link_hash')
@@ -0,0 +1,64 @@
+"""Add tags and the problem_tags association
+
+Revision ID: b4d6f8a0c2e3
+Revises: 9e1b3d5f7a24
+Create Date: 2026-10-19 18:05:27.514309
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d6f8a0c2e3'
+down_revision = '9e1b3d5f7a24'
+branch_labels = None
+depends_on = None
+
+
+def normalize_tag(name):
+    # Frozen copy of tags.normalize_tag as of this revision
+    return '-'.join(name.strip().lower().split())
+
+
+def upgrade():
+    tags = op.create_table('tags',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_tags')),
+    sa.UniqueConstraint('name', name=op.f('uq_tags_name'))
+    )
+    problem_tags = op.create_table('problem_tags',
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.Column('problem_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['problem_id'], ['problems.id'], name=op.f('fk_problem_tags_problem_id_problems'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], name=op.f('fk_problem_tags_tag_id_tags'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('tag_id', 'problem_id', name=op.f('pk_problem_tags'))
+    )
+    with op.batch_alter_table('problem_tags', schema=None) as batch_op:
+        batch_op.create_index('ix_problem_tags_problem_id_tag_id', ['problem_id', 'tag_id'], unique=False)
+
+    # Existing problems start out tagged with their category
+    connection = op.get_bind()
+    problems = sa.table('problems', sa.column('id'), sa.column('category'))
+    categories = {}
+    for problem_id, category in connection.execute(sa.select(problems.c.id, problems.c.category)):
+        name = normalize_tag(category or '')
+        if name:
+            categories.setdefault(name, []).append(problem_id)
+    if categories:
+        op.bulk_insert(tags, [{'name': name} for name in sorted(categories)])
+        tag_ids = dict(connection.execute(sa.select(tags.c.name, tags.c.id)).all())
+        op.bulk_insert(problem_tags, [
+            {'tag_id': tag_ids[name], 'problem_id': problem_id}
+            for name, problem_ids in categories.items()
+            for problem_id in problem_ids
+        ])
+
+
+def downgrade():
+    with op.batch_alter_table('problem_tags', schema=None) as batch_op:
+        batch_op.drop_index('ix_problem_tags_problem_id_tag_id')
+
+    op.drop_table('problem_tags')
+    op.drop_table('tags')
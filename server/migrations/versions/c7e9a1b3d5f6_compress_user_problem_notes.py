@@ -0,0 +1,145 @@
+"""Compress long user_problems notes and store a preview
+
+Revision ID: c7e9a1b3d5f6
+Revises: b4d6f8a0c2e3
+Create Date: 2026-10-19 20:12:48.206193
+
+"""
+import zlib
+
+from alembic import op
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7e9a1b3d5f6'
+down_revision = 'b4d6f8a0c2e3'
+branch_labels = None
+depends_on = None
+
+# Frozen copy of notes.py as of this revision
+NOTES_COMPRESS_THRESHOLD = 1024
+NOTES_PREVIEW_LENGTH = 200
+COMPRESSION_LEVEL = 6
+
+# Rows read and rewritten per batch
+BATCH_SIZE = 1000
+
+user_problems = sa.table(
+    'user_problems',
+    sa.column('user_id'), sa.column('problem_id'),
+    sa.column('notes'), sa.column('notes_compressed'), sa.column('notes_preview'),
+)
+
+
+def notes_preview(text):
+    if len(text) <= NOTES_PREVIEW_LENGTH:
+        return text
+    return text[:NOTES_PREVIEW_LENGTH - 1].rstrip() + '…'
+
+
+def pack_notes(text):
+    encoded = text.encode('utf-8')
+    if len(encoded) <= NOTES_COMPRESS_THRESHOLD:
+        return text, None, notes_preview(text)
+    return None, zlib.compress(encoded, COMPRESSION_LEVEL), notes_preview(text)
+
+
+def add_columns(operations):
+    with operations.batch_alter_table('user_problems', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('notes_compressed', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('notes_preview', sa.String(), nullable=True))
+
+
+def compress_notes(connection):
+    """Fill in previews and compress long notes, a keyset-ordered batch at a time"""
+    update = (
+        user_problems.update()
+        .where(
+            user_problems.c.user_id == sa.bindparam('pk_user_id'),
+            user_problems.c.problem_id == sa.bindparam('pk_problem_id'),
+        )
+        .values(
+            notes=sa.bindparam('notes'),
+            notes_compressed=sa.bindparam('notes_compressed'),
+            notes_preview=sa.bindparam('notes_preview'),
+        )
+    )
+    last_key = (0, 0)
+    while True:
+        rows = connection.execute(
+            sa.select(user_problems.c.user_id, user_problems.c.problem_id, user_problems.c.notes)
+            .where(
+                sa.tuple_(user_problems.c.user_id, user_problems.c.problem_id) > sa.tuple_(*last_key),
+                user_problems.c.notes.isnot(None),
+            )
+            .order_by(user_problems.c.user_id, user_problems.c.problem_id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        params = []
+        for user_id, problem_id, text in rows:
+            notes, compressed, preview = pack_notes(text)
+            params.append({
+                'pk_user_id': user_id, 'pk_problem_id': problem_id,
+                'notes': notes, 'notes_compressed': compressed, 'notes_preview': preview,
+            })
+        connection.execute(update, params)
+        last_key = (rows[-1].user_id, rows[-1].problem_id)
+
+
+def decompress_notes(connection):
+    rows = connection.execute(
+        sa.select(user_problems.c.user_id, user_problems.c.problem_id, user_problems.c.notes_compressed)
+        .where(user_problems.c.notes_compressed.isnot(None))
+    ).all()
+    for user_id, problem_id, compressed in rows:
+        connection.execute(
+            user_problems.update()
+            .where(user_problems.c.user_id == user_id, user_problems.c.problem_id == problem_id)
+            .values(notes=zlib.decompress(compressed).decode('utf-8'))
+        )
+
+
+def drop_columns(operations):
+    with operations.batch_alter_table('user_problems', schema=None) as batch_op:
+        batch_op.drop_column('notes_preview')
+        batch_op.drop_column('notes_compressed')
+
+
+def for_each_shard(fn):
+    """Run fn(connection, operations) on every user shard (sharding.py) that has user_problems"""
+    for bind_key, uri in (current_app.config.get('SQLALCHEMY_BINDS') or {}).items():
+        if not bind_key.startswith('user_shard_'):
+            continue
+        engine = sa.create_engine(uri)
+        try:
+            with engine.begin() as shard:
+                if sa.inspect(shard).has_table('user_problems'):
+                    fn(shard, Operations(MigrationContext.configure(shard)))
+        finally:
+            engine.dispose()
+
+
+def upgrade_shard(shard, operations):
+    # Shards created by `flask shards init` after this revision already have the columns
+    columns = {column['name'] for column in sa.inspect(shard).get_columns('user_problems')}
+    if 'notes_preview' not in columns:
+        add_columns(operations)
+    compress_notes(shard)
+
+
+def upgrade():
+    add_columns(op)
+    compress_notes(op.get_bind())
+    for_each_shard(upgrade_shard)
+
+
+def downgrade():
+    for_each_shard(lambda shard, operations: (decompress_notes(shard), drop_columns(operations)))
+    decompress_notes(op.get_bind())
+    drop_columns(op)
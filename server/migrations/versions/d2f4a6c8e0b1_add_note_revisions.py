@@ -0,0 +1,40 @@
+"""Add note_revisions for notes history
+
+Revision ID: d2f4a6c8e0b1
+Revises: c7e9a1b3d5f6
+Create Date: 2026-10-19 21:34:09.581027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f4a6c8e0b1'
+down_revision = 'c7e9a1b3d5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('note_revisions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('problem_id', sa.Integer(), nullable=False),
+    sa.Column('revision', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('length', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['problem_id'], ['problems.id'], name=op.f('fk_note_revisions_problem_id_problems'), ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], name=op.f('fk_note_revisions_user_id_users'), ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'problem_id', 'revision', name=op.f('pk_note_revisions'))
+    )
+    with op.batch_alter_table('note_revisions', schema=None) as batch_op:
+        batch_op.create_index('ix_note_revisions_problem_id', ['problem_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('note_revisions', schema=None) as batch_op:
+        batch_op.drop_index('ix_note_revisions_problem_id')
+
+    op.drop_table('note_revisions')
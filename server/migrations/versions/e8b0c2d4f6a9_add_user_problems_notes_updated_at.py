@@ -0,0 +1,60 @@
+"""Add user_problems.notes_updated_at for autosave ordering
+
+Revision ID: e8b0c2d4f6a9
+Revises: d2f4a6c8e0b1
+Create Date: 2026-10-19 22:41:53.760418
+
+"""
+from alembic import op
+from alembic.operations import Operations
+from alembic.runtime.migration import MigrationContext
+from flask import current_app
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b0c2d4f6a9'
+down_revision = 'd2f4a6c8e0b1'
+branch_labels = None
+depends_on = None
+
+
+def add_column(operations):
+    with operations.batch_alter_table('user_problems', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('notes_updated_at', sa.DateTime(), nullable=True))
+
+
+def drop_column(operations):
+    with operations.batch_alter_table('user_problems', schema=None) as batch_op:
+        batch_op.drop_column('notes_updated_at')
+
+
+def for_each_shard(fn):
+    """Run fn(operations) on every user shard (sharding.py) that has user_problems"""
+    for bind_key, uri in (current_app.config.get('SQLALCHEMY_BINDS') or {}).items():
+        if not bind_key.startswith('user_shard_'):
+            continue
+        engine = sa.create_engine(uri)
+        try:
+            with engine.begin() as shard:
+                if sa.inspect(shard).has_table('user_problems'):
+                    fn(shard, Operations(MigrationContext.configure(shard)))
+        finally:
+            engine.dispose()
+
+
+def upgrade_shard(shard, operations):
+    # Shards created by `flask shards init` after this revision already have the column
+    columns = {column['name'] for column in sa.inspect(shard).get_columns('user_problems')}
+    if 'notes_updated_at' not in columns:
+        add_column(operations)
+
+
+def upgrade():
+    add_column(op)
+    for_each_shard(upgrade_shard)
+
+
+def downgrade():
+    for_each_shard(lambda shard, operations: drop_column(operations))
+    drop_column(op)
@@ -0,0 +1,26 @@
+"""Add problems.rollup_difficulty for queued rollup moves
+
+Revision ID: f3a5c7e9b1d4
+Revises: e8b0c2d4f6a9
+Create Date: 2026-10-19 23:18:02.417305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a5c7e9b1d4'
+down_revision = 'e8b0c2d4f6a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('problems', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('rollup_difficulty', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('problems', schema=None) as batch_op:
+        batch_op.drop_column('rollup_difficulty')
@@ -0,0 +1,39 @@
+from sqlalchemy_serializer import SerializerMixin
+from config import db
+
+# Append-only log of attempts; user_problems holds the summary derived from it
+class AttemptEvent(db.Model, SerializerMixin):
+    __tablename__ = 'attempt_events'
+
+    # History reads are range scans over (user_id, ts), optionally narrowed to
+    # one problem; problem_id index backs the ON DELETE CASCADE from problems.
+    # On Postgres the table is range-partitioned by month on ts (see attempts.py)
+    __table_args__ = (
+        db.Index('ix_attempt_events_user_id_ts', 'user_id', 'ts'),
+        db.Index('ix_attempt_events_user_id_problem_id_ts', 'user_id', 'problem_id', 'ts'),
+        db.Index('ix_attempt_events_problem_id', 'problem_id'),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    problem_id = db.Column(db.Integer, db.ForeignKey('problems.id', ondelete='CASCADE'), nullable=False)
+
+    ts = db.Column(db.DateTime, nullable=False)  # When the attempt happened (UTC)
+    status = db.Column(db.String, nullable=False)  # Outcome: Completed, Attempted, Skipped
+    attempts = db.Column(db.Integer, nullable=False, default=1)  # Attempts added (negative for corrections)
+
+    def __repr__(self):
+        return f"<AttemptEvent user_id={self.user_id} problem_id={self.problem_id} ts={self.ts} status={self.status}>"
+
+# History deleted after some of it was archived; readers hide matching archived
+# events until the archive is compacted (see archive.py)
+class AttemptArchiveDeletion(db.Model):
+    __tablename__ = 'attempt_archive_deletions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer)  # NULL: every user
+    problem_id = db.Column(db.Integer)  # NULL: every problem
+    deleted_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<AttemptArchiveDeletion user_id={self.user_id} problem_id={self.problem_id} deleted_at={self.deleted_at}>"
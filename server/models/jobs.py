@@ -0,0 +1,53 @@
+from config import db
+
+# A unit of background work, persisted so it survives restarts (see jobs.py)
+class Job(db.Model):
+    __tablename__ = 'jobs'
+
+    # Workers claim the highest-priority due job from (status, priority, run_at);
+    # at most one queued job per dedupe_key, so repeated enqueues coalesce
+    __table_args__ = (
+        db.Index('ix_jobs_status_priority_run_at', 'status', 'priority', 'run_at'),
+        db.Index(
+            'uq_jobs_dedupe_key', 'dedupe_key', unique=True,
+            postgresql_where=db.text("status = 'queued'"),
+            sqlite_where=db.text("status = 'queued'")
+        ),
+    )
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    name = db.Column(db.String, nullable=False)  # Registered handler name
+    payload = db.Column(db.JSON, nullable=False, default=dict)  # Keyword arguments for the handler
+    priority = db.Column(db.Integer, nullable=False, default=0)  # Higher runs first
+    dedupe_key = db.Column(db.String)
+
+    status = db.Column(db.String, nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False)  # Not claimed before this time (UTC)
+    last_error = db.Column(db.Text)
+
+    # Lease held by the worker running the job
+    locked_by = db.Column(db.String)
+    locked_at = db.Column(db.DateTime)
+
+    # Timing metrics
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    wait_ms = db.Column(db.Integer)  # From run_at until a worker picked it up
+    duration_ms = db.Column(db.Integer)  # Run time of the last attempt
+
+    def __repr__(self):
+        return f"<Job id={self.id} name={self.name} status={self.status} attempts={self.attempts}>"
+
+# Next due time of each cron-style schedule, shared by all workers
+class JobSchedule(db.Model):
+    __tablename__ = 'job_schedules'
+
+    name = db.Column(db.String, primary_key=True)  # Job name
+    cron = db.Column(db.String, nullable=False)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<JobSchedule name={self.name} cron={self.cron} next_run_at={self.next_run_at}>"
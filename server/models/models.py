@@ -1,3 +1,10 @@
 from .users import *
 from .problems import *
-from .user_problem import *
\ No newline at end of file
+from .tags import *
+from .user_problem import *
+from .sync import *
+from .attempt_event import *
+from .rollups import *
+from .jobs import *
+from .user_shard import *
+from .note_revision import *
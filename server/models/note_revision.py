@@ -0,0 +1,23 @@
+from config import db
+
+# Versions of a user's notes on a problem: full snapshots with deltas in between (see note_revisions.py)
+class NoteRevision(db.Model):
+    __tablename__ = 'note_revisions'
+
+    # A revision is rebuilt from a primary key range scan: its snapshot, then the deltas after it;
+    # problem_id index backs the ON DELETE CASCADE from problems
+    __table_args__ = (
+        db.Index('ix_note_revisions_problem_id', 'problem_id'),
+    )
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    problem_id = db.Column(db.Integer, db.ForeignKey('problems.id', ondelete='CASCADE'), primary_key=True)
+    revision = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 1, 2, ... per pair
+
+    kind = db.Column(db.String, nullable=False)  # snapshot or delta
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed text (snapshot) or edit ops (delta)
+    length = db.Column(db.Integer, nullable=False)  # Characters in this revision's text
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<NoteRevision user_id={self.user_id} problem_id={self.problem_id} revision={self.revision} kind={self.kind}>"
@@ -1,20 +1,49 @@
 from sqlalchemy_serializer import SerializerMixin
+from sqlalchemy.orm import validates
 from config import db
+from links import canonical_link, link_hash, link_slug
 
 class Problem(db.Model, SerializerMixin):
     __tablename__ = "problems"
 
-    # Prevent circular serialization
-    serialize_rules = ('-user_problems.problem',)
+    # Prevent circular serialization; tags are listed by name
+    serialize_rules = ('-user_problems.problem', '-tags', 'tag_names', '-rollup_difficulty')
 
     id = db.Column(db.Integer, primary_key=True)
     problem_name = db.Column(db.String, nullable=False)
-    problem_link = db.Column(db.String, nullable=False)  # Problem URL
+    problem_link = db.Column(db.String, nullable=False)  # Problem URL, canonicalized on write (links.py)
+    link_hash = db.Column(db.String(64), nullable=False, unique=True, index=True)  # SHA-256 of problem_link
+    slug = db.Column(db.String, index=True)  # Last path segment of problem_link, e.g. two-sum
     difficulty = db.Column(db.String, nullable=False)  # Easy, Medium, Hard
     category = db.Column(db.String, nullable=False)  # Algorithms, Graphs, etc.
+    change_seq = db.Column(db.BigInteger, index=True)  # Sequence of the last write, for delta sync
+    rollup_difficulty = db.Column(db.String)  # Difficulty its activity rollups still count it under until a queued move runs (rollups.py), else NULL
+
+    # Solve stats (problem_stats.py): counters kept current by user_problems writes,
+    # empirical difficulty refitted by a nightly job; indexed for sorting and filtering
+    attempt_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)  # Users who tried it (not skipped)
+    completion_count = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)  # Users who completed it
+    attempts_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Sum of their num_attempts
+    mean_attempts = db.Column(db.Float, index=True)  # attempts_total / attempt_count, NULL if never tried
+    empirical_difficulty = db.Column(db.Float, index=True)  # 0-100, NULL until rated
 
     # Relationship to UserProblem association object
-    user_problems = db.relationship('UserProblem', back_populates='problem', cascade='all, delete-orphan')
+    # Deletes cascade in the database (ON DELETE CASCADE), so rows are never loaded just to be deleted
+    user_problems = db.relationship('UserProblem', back_populates='problem', cascade='all, delete-orphan', passive_deletes=True)
+
+    # Loaded for a whole page in one extra query
+    tags = db.relationship('Tag', secondary='problem_tags', lazy='selectin', order_by='Tag.name', passive_deletes=True)
+
+    @property
+    def tag_names(self):
+        return [tag.name for tag in self.tags]
+
+    @validates("problem_link")
+    def validate_problem_link(self, key, problem_link):
+        problem_link = canonical_link(problem_link)
+        self.link_hash = link_hash(problem_link)
+        self.slug = link_slug(problem_link)
+        return problem_link
 
     def __repr__(self):
         return f"<Problem id={self.id} name={self.problem_name} difficulty={self.difficulty} link={self.problem_link}>"
@@ -0,0 +1,35 @@
+from config import db
+
+# Activity counts per time bucket, maintained from attempt_events (see rollups.py).
+# bucket is 'day', 'week' (starting Monday) or 'month'; bucket_start is its first day.
+# events counts attempt outcomes recorded, attempts sums the attempts they added.
+
+class UserActivityRollup(db.Model):
+    __tablename__ = 'user_activity_rollups'
+
+    # Primary key order makes a user's chart a single range scan
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    bucket = db.Column(db.String, primary_key=True)
+    bucket_start = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String, primary_key=True)
+    difficulty = db.Column(db.String, primary_key=True)
+
+    events = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<UserActivityRollup user_id={self.user_id} {self.bucket}={self.bucket_start} status={self.status} events={self.events}>"
+
+class GlobalActivityRollup(db.Model):
+    __tablename__ = 'global_activity_rollups'
+
+    bucket = db.Column(db.String, primary_key=True)
+    bucket_start = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String, primary_key=True)
+    difficulty = db.Column(db.String, primary_key=True)
+
+    events = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<GlobalActivityRollup {self.bucket}={self.bucket_start} status={self.status} events={self.events}>"
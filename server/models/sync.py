@@ -0,0 +1,30 @@
+from sqlalchemy_serializer import SerializerMixin
+from config import db
+
+# Single-row counters handing out monotonically increasing change sequence numbers
+class ChangeCounter(db.Model):
+    __tablename__ = 'change_counters'
+
+    name = db.Column(db.String, primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ChangeCounter name={self.name} value={self.value}>"
+
+# Record of a deleted row, so delta sync clients can drop it
+class Tombstone(db.Model, SerializerMixin):
+    __tablename__ = 'tombstones'
+
+    # Latest delete per entity type (catalog snapshot version)
+    __table_args__ = (
+        db.Index('ix_tombstones_entity_seq', 'entity', 'seq'),
+    )
+
+    seq = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    entity = db.Column(db.String, nullable=False)  # problem, user_problem
+    problem_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer)  # Owner of a deleted user_problem, NULL for catalog deletes
+    deleted_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<Tombstone seq={self.seq} entity={self.entity} problem_id={self.problem_id} user_id={self.user_id}>"
@@ -0,0 +1,28 @@
+from sqlalchemy_serializer import SerializerMixin
+from config import db
+
+# Topic tags; a problem can have several (see tags.py)
+class Tag(db.Model, SerializerMixin):
+    __tablename__ = 'tags'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False, unique=True)  # Normalized: lowercase, words joined by '-'
+
+    def __repr__(self):
+        return f"<Tag id={self.id} name={self.name}>"
+
+# Association of problems and tags
+# The (tag_id, problem_id) primary key covers tag filters: a tag's problems are one index range;
+# the (problem_id, tag_id) index loads a page's tags and backs the ON DELETE CASCADE from problems
+class ProblemTag(db.Model):
+    __tablename__ = 'problem_tags'
+
+    __table_args__ = (
+        db.Index('ix_problem_tags_problem_id_tag_id', 'problem_id', 'tag_id'),
+    )
+
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True)
+    problem_id = db.Column(db.Integer, db.ForeignKey('problems.id', ondelete='CASCADE'), primary_key=True)
+
+    def __repr__(self):
+        return f"<ProblemTag tag_id={self.tag_id} problem_id={self.problem_id}>"
@@ -1,26 +1,58 @@
+from datetime import datetime, timezone
 from sqlalchemy_serializer import SerializerMixin
 from config import db
+from notes import pack_notes, unpack_notes
 
 # Association Object for many-to-many relationship with additional user-specific data
 class UserProblem(db.Model, SerializerMixin):
     __tablename__ = 'user_problems'
 
-    # Prevent circular serialization
-    serialize_rules = ('-user.user_problems', '-problem.user_problems')
+    # Prevent circular serialization; notes are stored compressed and listed
+    # as notes_preview (add the 'notes' rule for the full text, see notes.py)
+    serialize_rules = ('-user.user_problems', '-problem.user_problems', '-notes_text', '-notes_compressed')
+
+    # Review queue lookups are range scans over (user_id, due_at);
+    # problem_id index backs the ON DELETE CASCADE from problems;
+    # delta sync reads a user's rows changed after a given sequence
+    __table_args__ = (
+        db.Index('ix_user_problems_user_id_due_at', 'user_id', 'due_at'),
+        db.Index('ix_user_problems_problem_id', 'problem_id'),
+        db.Index('ix_user_problems_user_id_change_seq', 'user_id', 'change_seq'),
+    )
 
     # Composite primary key
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
-    problem_id = db.Column(db.Integer, db.ForeignKey('problems.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    problem_id = db.Column(db.Integer, db.ForeignKey('problems.id', ondelete='CASCADE'), primary_key=True)
 
     # User-specific fields for each problem attempt
     date_attempted = db.Column(db.String, nullable=False)
     status = db.Column(db.String, nullable=False)  # Completed, Attempted, Skipped
-    notes = db.Column(db.Text)
+    notes_text = db.Column('notes', db.Text)  # Notes up to NOTES_COMPRESS_THRESHOLD bytes
+    notes_compressed = db.deferred(db.Column(db.LargeBinary))  # Longer notes, zlib-compressed
+    notes_preview = db.Column(db.String)
+    notes_updated_at = db.Column(db.DateTime)  # Last notes write (UTC); older autosaves never overwrite it
     num_attempts = db.Column(db.Integer, default=1)
 
+    # Spaced-repetition (SM-2) review state
+    ease_factor = db.Column(db.Float, default=2.5)
+    review_interval = db.Column(db.Integer, default=0)  # Days until the next review
+    review_repetitions = db.Column(db.Integer, default=0)  # Consecutive successful reviews
+    due_at = db.Column(db.DateTime)  # Next review date (UTC), NULL if not scheduled
+
+    change_seq = db.Column(db.BigInteger)  # Sequence of the last write, for delta sync
+
     # Relationships to User and Problem
     user = db.relationship('User', back_populates='user_problems')
     problem = db.relationship('Problem', back_populates='user_problems')
 
+    @property
+    def notes(self):
+        return unpack_notes(self.notes_text, self.notes_compressed)
+
+    @notes.setter
+    def notes(self, text):
+        self.notes_text, self.notes_compressed, self.notes_preview = pack_notes(text)
+        self.notes_updated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+
     def __repr__(self):
         return f"<UserProblem user_id={self.user_id} problem_id={self.problem_id} status={self.status}>"
@@ -0,0 +1,11 @@
+from config import db
+
+# Which database holds a user's user_problems rows when sharding is enabled (see sharding.py)
+class UserShard(db.Model):
+    __tablename__ = 'user_shards'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    shard = db.Column(db.String, nullable=False)  # 'main' or a user_shard_<n> bind key
+
+    def __repr__(self):
+        return f"<UserShard user_id={self.user_id} shard={self.shard}>"
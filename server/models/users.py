@@ -18,7 +18,8 @@ class User(db.Model, SerializerMixin):
     is_admin = db.Column(db.Boolean, default=False)
 
     # Relationship to UserProblem association object
-    user_problems = db.relationship('UserProblem', back_populates='user', cascade='all, delete-orphan')
+    # Deletes cascade in the database (ON DELETE CASCADE), so rows are never loaded just to be deleted
+    user_problems = db.relationship('UserProblem', back_populates='user', cascade='all, delete-orphan', passive_deletes=True)
 
     @validates("email")
     def validate_email(self, key, email):
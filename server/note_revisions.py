@@ -0,0 +1,159 @@
+"""
+Revision history of user_problems notes
+
+Every change to a pair's notes appends a note_revisions row numbered 1, 2, ...
+Most rows are deltas: word-level edit ops from the previous revision's text,
+JSON-encoded and zlib-compressed, so fixing a typo in a long note stores a few
+bytes rather than another copy of it. A row is a full snapshot instead when it
+is the pair's first, when NOTE_SNAPSHOT_INTERVAL revisions have passed since
+the last snapshot, or when the delta would be no smaller than the snapshot.
+
+Rebuilding any revision reads its nearest snapshot and applies the deltas
+after it in one primary key range scan, so it never touches more than
+NOTE_SNAPSHOT_INTERVAL rows however long the history grows.
+
+A delta is a list of ops producing the new text from the old one's tokens
+(a word with its trailing whitespace, or leading whitespace):
+[start, end] copies old tokens start..end-1, and a string is inserted as is.
+"""
+import json
+import os
+import re
+import zlib
+from difflib import SequenceMatcher
+
+from config import db
+from models.models import NoteRevision
+from review import utcnow
+
+# At most this many revisions per snapshot, bounding the deltas applied per read
+NOTE_SNAPSHOT_INTERVAL = int(os.getenv('NOTE_SNAPSHOT_INTERVAL', '10'))
+
+COMPRESSION_LEVEL = 6
+
+SNAPSHOT = 'snapshot'
+DELTA = 'delta'
+
+_TOKEN = re.compile(r'\S+\s*|\s+')
+
+
+def _tokens(text):
+    return _TOKEN.findall(text)
+
+
+def make_delta(old, new):
+    """Edit ops turning old into new"""
+    a, b = _tokens(old), _tokens(new)
+    ops = []
+    for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif j2 > j1:
+            ops.append(''.join(b[j1:j2]))
+    return ops
+
+
+def apply_delta(old, ops):
+    """The text make_delta(old, new) was made from"""
+    a = _tokens(old)
+    return ''.join(op if isinstance(op, str) else ''.join(a[op[0]:op[1]]) for op in ops)
+
+
+def _compress(text):
+    return zlib.compress(text.encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def _decompress(data):
+    return zlib.decompress(data).decode('utf-8')
+
+
+def _pair(user_id, problem_id):
+    return NoteRevision.user_id == user_id, NoteRevision.problem_id == problem_id
+
+
+def _revision(user_id, problem_id, revision, kind, data, length):
+    return NoteRevision(
+        user_id=user_id, problem_id=problem_id, revision=revision,
+        kind=kind, data=data, length=length, created_at=utcnow(),
+    )
+
+
+def record_note_revision(user_id, problem_id, old_text, new_text):
+    """
+    Append a revision for a change of a pair's notes from old_text to
+    new_text, in the current transaction. Notes written before history was
+    kept become the pair's first revision. Returns the new revision number,
+    or None if the text didn't change.
+    """
+    old_text, new_text = old_text or '', new_text or ''
+    if old_text == new_text:
+        return None
+
+    latest, last_snapshot = db.session.execute(
+        db.select(
+            db.func.max(NoteRevision.revision),
+            db.func.max(NoteRevision.revision).filter(NoteRevision.kind == SNAPSHOT),
+        ).where(*_pair(user_id, problem_id))
+    ).one()
+    if latest is None:
+        latest = last_snapshot = 0
+        if old_text:
+            latest = last_snapshot = 1
+            db.session.add(_revision(user_id, problem_id, 1, SNAPSHOT, _compress(old_text), len(old_text)))
+
+    revision = latest + 1
+    snapshot = _compress(new_text)
+    if last_snapshot and revision - last_snapshot < NOTE_SNAPSHOT_INTERVAL:
+        delta = zlib.compress(
+            json.dumps(make_delta(old_text, new_text), ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+            COMPRESSION_LEVEL
+        )
+        if len(delta) < len(snapshot):
+            db.session.add(_revision(user_id, problem_id, revision, DELTA, delta, len(new_text)))
+            return revision
+
+    db.session.add(_revision(user_id, problem_id, revision, SNAPSHOT, snapshot, len(new_text)))
+    return revision
+
+
+def note_revision_text(user_id, problem_id, revision):
+    """A revision's text, or None if the pair has no such revision"""
+    base = (
+        db.select(db.func.max(NoteRevision.revision))
+        .where(*_pair(user_id, problem_id), NoteRevision.kind == SNAPSHOT, NoteRevision.revision <= revision)
+        .scalar_subquery()
+    )
+    rows = db.session.execute(
+        db.select(NoteRevision.revision, NoteRevision.kind, NoteRevision.data)
+        .where(*_pair(user_id, problem_id), NoteRevision.revision.between(base, revision))
+        .order_by(NoteRevision.revision)
+    ).all()
+    if not rows or rows[-1].revision != revision:
+        return None
+
+    text = _decompress(rows[0].data)
+    for row in rows[1:]:
+        text = apply_delta(text, json.loads(_decompress(row.data)))
+    return text
+
+
+def list_note_revisions(user_id, problem_id, page, per_page):
+    """(revisions newest first, total) for a page of a pair's history"""
+    query = db.select(
+        NoteRevision.revision, NoteRevision.kind, NoteRevision.length, NoteRevision.created_at
+    ).where(*_pair(user_id, problem_id))
+    total = db.session.execute(
+        db.select(db.func.count()).select_from(query.subquery())
+    ).scalar()
+    rows = db.session.execute(
+        query.order_by(NoteRevision.revision.desc()).limit(per_page).offset((page - 1) * per_page)
+    ).all()
+    return [
+        {'revision': row.revision, 'kind': row.kind, 'length': row.length, 'created_at': row.created_at.isoformat()}
+        for row in rows
+    ], total
+
+
+def delete_note_revisions(user_id, problem_id):
+    """Remove a pair's notes history"""
+    db.session.execute(db.delete(NoteRevision).where(*_pair(user_id, problem_id)))
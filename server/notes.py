@@ -0,0 +1,46 @@
+"""
+Storage format of user_problems notes
+
+Notes up to NOTES_COMPRESS_THRESHOLD bytes (UTF-8) are stored as plain text
+in the notes column. Longer ones are zlib-compressed into notes_compressed,
+a deferred column that list queries never read, and notes is left NULL.
+Every note also stores a short notes_preview, which is all that list
+endpoints return unless asked for include=notes.
+
+UserProblem.notes reads and writes through this module, so callers only
+ever see text.
+"""
+import os
+import zlib
+
+# Notes longer than this many UTF-8 bytes are stored compressed
+NOTES_COMPRESS_THRESHOLD = int(os.getenv('NOTES_COMPRESS_THRESHOLD', '1024'))
+
+# Characters of a note returned by list endpoints
+NOTES_PREVIEW_LENGTH = 200
+
+COMPRESSION_LEVEL = 6
+
+
+def notes_preview(text):
+    """The first NOTES_PREVIEW_LENGTH characters of a note, ending in '…' if cut"""
+    if text is None or len(text) <= NOTES_PREVIEW_LENGTH:
+        return text
+    return text[:NOTES_PREVIEW_LENGTH - 1].rstrip() + '…'
+
+
+def pack_notes(text):
+    """(notes, notes_compressed, notes_preview) column values for a note"""
+    if text is None:
+        return None, None, None
+    encoded = text.encode('utf-8')
+    if len(encoded) <= NOTES_COMPRESS_THRESHOLD:
+        return text, None, notes_preview(text)
+    return None, zlib.compress(encoded, COMPRESSION_LEVEL), notes_preview(text)
+
+
+def unpack_notes(text, compressed):
+    """A note's text from its notes and notes_compressed column values"""
+    if compressed is not None:
+        return zlib.decompress(compressed).decode('utf-8')
+    return text
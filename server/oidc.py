@@ -0,0 +1,171 @@
+"""
+Google OAuth client backed by a cached OIDC discovery document and JWKS
+
+Both documents are cached in memory with a TTL and persisted to disk, so a
+restart (or a freshly forked worker) doesn't have to hit the provider, and a
+slow or unavailable provider is served from the last good copy.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import requests
+from authlib.integrations.flask_client import OAuth, FlaskOAuth2App
+
+from jobs import job_handler, PRIORITY_HIGH
+from http_client import get_http_session, DEFAULT_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+DISCOVERY_URL = os.getenv('GOOGLE_DISCOVERY_URL', 'https://accounts.google.com/.well-known/openid-configuration')
+REVOKE_URL = os.getenv('GOOGLE_REVOKE_URL', 'https://oauth2.googleapis.com/revoke')
+
+# Cache lifetimes (seconds)
+DISCOVERY_TTL = int(os.getenv('OIDC_DISCOVERY_TTL', '86400'))
+JWKS_TTL = int(os.getenv('OIDC_JWKS_TTL', '3600'))
+
+# Minimum spacing of forced JWKS refreshes (unknown key ids can't trigger a fetch storm)
+JWKS_MIN_REFRESH_SECONDS = 60
+
+
+class MetadataCache:
+    """TTL cache for the OIDC discovery document and JWKS, persisted to disk"""
+
+    def __init__(self, discovery_url, cache_dir, discovery_ttl=DISCOVERY_TTL, jwks_ttl=JWKS_TTL):
+        self.discovery_url = discovery_url
+        self.cache_dir = Path(cache_dir)
+        self.ttls = {'discovery': discovery_ttl, 'jwks': jwks_ttl}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def discovery(self, force=False):
+        """Return the provider's discovery document"""
+        return self._get('discovery', self.discovery_url, force)
+
+    def jwks(self, force=False):
+        """Return the provider's JSON Web Key Set"""
+        entry = self._entries.get('jwks')
+        if force and entry and time.time() - entry['fetched_at'] < JWKS_MIN_REFRESH_SECONDS:
+            force = False
+        return self._get('jwks', self.discovery()['jwks_uri'], force)
+
+    def _get(self, kind, url, force):
+        entry = self._fresh_entry(kind, url, force)
+        if entry:
+            return entry['document']
+
+        with self._lock:
+            # Another thread may have refreshed it while we waited
+            entry = self._fresh_entry(kind, url, force)
+            if entry:
+                return entry['document']
+
+            stale = self._entries.get(kind)
+            try:
+                response = get_http_session().get(url)
+                response.raise_for_status()
+                document = response.json()
+            except (requests.RequestException, ValueError):
+                if stale and stale['url'] == url:
+                    logger.warning('Failed to refresh OIDC %s from %s, serving cached copy', kind, url)
+                    return stale['document']
+                raise
+
+            entry = {'url': url, 'fetched_at': time.time(), 'document': document}
+            self._entries[kind] = entry
+            self._write_disk(kind, entry)
+            return document
+
+    def _fresh_entry(self, kind, url, force):
+        entry = self._entries.get(kind)
+        if entry is None:
+            entry = self._read_disk(kind)
+            if entry is not None:
+                self._entries[kind] = entry
+
+        if entry is None or force or entry['url'] != url:
+            return None
+        if time.time() - entry['fetched_at'] > self.ttls[kind]:
+            return None
+        return entry
+
+    def _path(self, kind):
+        digest = hashlib.sha1(self.discovery_url.encode('utf-8')).hexdigest()[:16]
+        return self.cache_dir / f'{kind}-{digest}.json'
+
+    def _read_disk(self, kind):
+        try:
+            with open(self._path(kind), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, kind, entry):
+        # Write atomically so concurrent workers never read a partial file
+        path = self._path(kind)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning('Could not persist OIDC %s cache to %s', kind, path)
+
+
+class CachedMetadataApp(FlaskOAuth2App):
+    """OAuth2 client whose server metadata and JWKS come from a MetadataCache"""
+
+    metadata_cache = None
+
+    def load_server_metadata(self):
+        self.server_metadata.update(self.metadata_cache.discovery())
+        return self.server_metadata
+
+    def fetch_jwk_set(self, force=False):
+        jwk_set = self.metadata_cache.jwks(force=force)
+        self.server_metadata['jwks'] = jwk_set
+        return jwk_set
+
+
+class CachedOAuth(OAuth):
+    oauth2_client_cls = CachedMetadataApp
+
+
+def init_google_oauth(app, client_id, client_secret):
+    """Register the Google OAuth client on app and return it"""
+    cache_dir = os.getenv('OIDC_CACHE_DIR', os.path.join(app.instance_path, 'oidc_cache'))
+
+    oauth = CachedOAuth(app)
+    oauth.register(
+        name='google',
+        client_id=client_id,
+        client_secret=client_secret,
+        client_kwargs={'scope': 'openid profile email', 'default_timeout': DEFAULT_TIMEOUT}
+    )
+    oauth.google.metadata_cache = MetadataCache(DISCOVERY_URL, cache_dir)
+    return oauth.google
+
+
+@job_handler('oauth.revoke', priority=PRIORITY_HIGH, secret_payload=True)
+def revoke_token(access_token):
+    """
+    Revoke an OAuth access token with the provider
+
+    Runs as a background job: network errors and provider 5xx responses raise,
+    so the job is retried. Other failures (e.g. an already expired token) don't.
+    """
+    response = get_http_session().post(
+        REVOKE_URL,
+        params={'token': access_token},
+        headers={'content-type': 'application/x-www-form-urlencoded'}
+    )
+    if response.status_code >= 500:
+        response.raise_for_status()
+    if response.status_code != 200:
+        logger.warning('Token revocation failed with status %s', response.status_code)
+    return response.status_code == 200
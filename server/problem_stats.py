@@ -0,0 +1,112 @@
+"""
+Per-problem solve stats on the catalog
+
+Every user_problems write adjusts its problem's counters (users who tried
+it, users who completed it, their summed num_attempts and the mean) in the
+same transaction, with a single relative UPDATE of the problems row. Skipped
+summaries don't count as tries, matching the insights endpoint.
+
+The empirical difficulty can't be maintained incrementally: it is a Rasch
+model fitted across every user's outcomes (analytics.problem_stats), so a
+nightly job (and `flask refresh-problem-stats`) refits it. The same pass
+recounts the counters, which corrects the drift left by bulk paths that
+bypass update_problem_stats (cascading user deletes, summary rebuilds).
+"""
+import click
+from flask.cli import with_appcontext
+
+from config import db
+from models.models import Problem
+from jobs import job_handler, PRIORITY_LOW
+
+# Problems rewritten per UPDATE batch during a refresh
+REFRESH_BATCH_SIZE = 1000
+
+
+def _contribution(summary):
+    """(tried, completed, attempts) a (status, num_attempts) summary adds to its problem"""
+    if summary is None:
+        return 0, 0, 0
+    status, num_attempts = summary
+    if status is None or status == 'Skipped':
+        return 0, 0, 0
+    return 1, int(status == 'Completed'), num_attempts or 1
+
+
+def update_problem_stats(problem_id, before=None, after=None):
+    """
+    Move a problem's counters from one (status, num_attempts) summary to
+    another, in the current transaction; None stands for no summary
+    """
+    tried, completed, attempts = (
+        new - old for new, old in zip(_contribution(after), _contribution(before))
+    )
+    if not (tried or completed or attempts):
+        return
+
+    # Relative update, so concurrent writers to the same problem don't lose counts
+    attempt_count = Problem.attempt_count + tried
+    attempts_total = Problem.attempts_total + attempts
+    db.session.execute(
+        db.update(Problem)
+        .where(Problem.id == problem_id)
+        .values(
+            attempt_count=attempt_count,
+            completion_count=Problem.completion_count + completed,
+            attempts_total=attempts_total,
+            mean_attempts=db.case(
+                (attempt_count > 0, db.cast(attempts_total, db.Float) / attempt_count),
+                else_=None
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+@job_handler('problem_stats.refresh', cron='50 2 * * *', priority=PRIORITY_LOW)
+def refresh_problem_stats(batch_size=REFRESH_BATCH_SIZE):
+    """
+    Recount every problem's counters and refit its empirical difficulty
+    Returns: number of problems rewritten
+    """
+    # Imported here so NumPy stays off the app startup path
+    from analytics import problem_stats
+
+    problem_ids = db.session.execute(db.select(Problem.id).order_by(Problem.id)).scalars().all()
+    stats = problem_stats(problem_ids)
+
+    table = Problem.__table__
+    stmt = (
+        db.update(table)
+        .where(table.c.id == db.bindparam('pk_id'))
+        .values(
+            attempt_count=db.bindparam('attempt_count'),
+            completion_count=db.bindparam('completion_count'),
+            attempts_total=db.bindparam('attempts_total'),
+            mean_attempts=db.bindparam('mean_attempts'),
+            empirical_difficulty=db.bindparam('empirical_difficulty'),
+        )
+    )
+    rows = [
+        {
+            'pk_id': problem_id,
+            'attempt_count': attempt_count,
+            'completion_count': completion_count,
+            'attempts_total': attempts_total,
+            'mean_attempts': attempts_total / attempt_count if attempt_count else None,
+            'empirical_difficulty': empirical_difficulty,
+        }
+        for problem_id, (attempt_count, completion_count, attempts_total, empirical_difficulty) in stats.items()
+    ]
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(stmt, rows[start:start + batch_size])
+        db.session.commit()
+    return len(rows)
+
+
+@click.command('refresh-problem-stats')
+@with_appcontext
+def refresh_problem_stats_command():
+    """Recount problem solve stats and refit their empirical difficulty"""
+    count = refresh_problem_stats()
+    click.echo(f'Refreshed solve stats of {count} problems.')
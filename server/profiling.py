@@ -0,0 +1,246 @@
+"""
+Opt-in request profiling and the slow-query log
+
+Profiling: an admin fetches a short-lived signed token from
+POST /api/admin/profile-token and replays the slow request with it in an
+X-Profile-Token header (or a ?profile_token= query parameter). That one
+request runs under cProfile; the stats are written to PROFILE_DIR, named in
+the X-Profile-Id response header and readable from /api/admin/profiles.
+Only the newest PROFILE_KEEP files are kept. Requests without a token pay
+for a single header lookup.
+
+Slow queries: with SLOW_QUERY_MS set, every statement on the app's engines
+(main database and user shards) is timed, and those over the threshold are
+appended as JSON lines, with their parameters and EXPLAIN output, to a
+rotating log file.
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from flask import g, has_request_context, request
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from sqlalchemy import event
+
+from config import db
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_QUERY_ARG = 'profile_token'
+
+# Lifetime of a profiling token, in seconds
+PROFILE_TOKEN_TTL = int(os.getenv('PROFILE_TOKEN_TTL', '600'))
+
+# Profiles kept in PROFILE_DIR; older ones are deleted as new ones are written
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '50'))
+
+# Functions listed in a profile summary
+PROFILE_SUMMARY_LINES = 40
+
+# Statements slower than this many milliseconds are logged (0 turns the log off)
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '0'))
+
+# Size of the slow-query log before it rotates, and rotated files kept
+SLOW_QUERY_LOG_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# Longest parameter list written per logged statement, as repr() characters
+SLOW_QUERY_PARAMS_CHARS = 2000
+
+EXPLAIN_PREFIXES = {'sqlite': 'EXPLAIN QUERY PLAN ', 'postgresql': 'EXPLAIN ', 'mysql': 'EXPLAIN '}
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+# Profile file names: <utc timestamp>-<method>-<path>-<ms>.prof
+PROFILE_NAME = re.compile(r'^[\w.-]+\.prof$')
+
+# cProfile can only have one active profiler per process on newer Pythons
+_profile_lock = threading.Lock()
+
+slow_query_logger = logging.getLogger('algotrack.slow_queries')
+
+
+def profile_dir(app):
+    return os.getenv('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+
+
+def _serializer(app):
+    return URLSafeTimedSerializer(app.secret_key, salt='profile-request')
+
+
+def issue_profile_token(app, user):
+    """A token that lets the requests it's attached to be profiled, for PROFILE_TOKEN_TTL seconds"""
+    return _serializer(app).dumps({'user_id': user.id})
+
+
+def _token_user_id(app, token):
+    try:
+        return _serializer(app).loads(token, max_age=PROFILE_TOKEN_TTL)['user_id']
+    except (BadSignature, KeyError, TypeError):
+        return None
+
+
+def _token_is_valid(app, token):
+    """The token is genuine, unexpired and its user is still an admin"""
+    from models.models import User
+    user_id = _token_user_id(app, token)
+    if user_id is None:
+        return False
+    user = db.session.get(User, user_id)
+    return bool(user and user.is_admin)
+
+
+def _prune(directory, keep):
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.prof'))
+    for name in names[:-keep] if keep else names:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def list_profiles(app):
+    """Profile file names, newest first"""
+    try:
+        names = os.listdir(profile_dir(app))
+    except FileNotFoundError:
+        return []
+    return sorted((name for name in names if name.endswith('.prof')), reverse=True)
+
+
+def profile_summary(app, name):
+    """The top functions by cumulative time of a saved profile, as text, or None if it doesn't exist"""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(profile_dir(app), name)
+    if not os.path.isfile(path):
+        return None
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LINES)
+    return out.getvalue()
+
+
+def init_profiling(app):
+    """Install the per-request profiler hooks and, if configured, the slow-query log"""
+
+    @app.before_request
+    def _start_profile():
+        token = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_ARG)
+        if not token or not _token_is_valid(app, token):
+            return
+        # Only one request is profiled at a time; others run normally
+        if not _profile_lock.acquire(blocking=False):
+            g.profile_busy = True
+            return
+        g.profile = cProfile.Profile()
+        g.profile_started = time.perf_counter()
+        g.profile.enable()
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            if g.pop('profile_busy', False):
+                response.headers['X-Profile-Id'] = 'busy'
+            return response
+        try:
+            profile.disable()
+            elapsed_ms = (time.perf_counter() - g.pop('profile_started')) * 1000
+            directory = profile_dir(app)
+            os.makedirs(directory, exist_ok=True)
+            path_slug = re.sub(r'[^\w]+', '_', request.path).strip('_') or 'root'
+            stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+            name = f'{stamp}-{request.method}-{path_slug}-{int(elapsed_ms)}ms.prof'
+            profile.dump_stats(os.path.join(directory, name))
+            _prune(directory, PROFILE_KEEP)
+            response.headers['X-Profile-Id'] = name
+        except Exception:
+            logger.exception('Failed to save request profile')
+        finally:
+            _profile_lock.release()
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(exc):
+        # after_request doesn't run when the view raised
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.disable()
+            _profile_lock.release()
+
+    threshold = app.config.get('SLOW_QUERY_MS', SLOW_QUERY_MS)
+    if threshold:
+        with app.app_context():
+            engines = list(db.engines.values())
+        init_slow_query_log(app, engines, threshold)
+
+
+def _explain(cursor, dialect, statement, parameters):
+    """The database's plan for a statement, one string per plan row"""
+    prefix = EXPLAIN_PREFIXES.get(dialect)
+    if prefix is None or not EXPLAINABLE.match(statement):
+        return None
+    # A fresh DBAPI cursor on the same connection: same transaction, no engine events.
+    # On PostgreSQL a failed statement aborts the transaction, hence the savepoint
+    savepoint = dialect == 'postgresql'
+    explain_cursor = cursor.connection.cursor()
+    try:
+        if savepoint:
+            explain_cursor.execute('SAVEPOINT slow_query_explain')
+        explain_cursor.execute(prefix + statement, parameters)
+        plan = [' | '.join(str(value) for value in row) for row in explain_cursor.fetchall()]
+        if savepoint:
+            explain_cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        return plan
+    except Exception as e:
+        if savepoint:
+            explain_cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+        return [f'EXPLAIN failed: {e}']
+    finally:
+        explain_cursor.close()
+
+
+def init_slow_query_log(app, engines, threshold_ms):
+    """Time every statement on engines and log the ones slower than threshold_ms"""
+    path = os.getenv('SLOW_QUERY_LOG') or os.path.join(app.instance_path, 'slow_queries.log')
+    if not slow_query_logger.handlers:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=SLOW_QUERY_LOG_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_query_logger.addHandler(handler)
+        slow_query_logger.setLevel(logging.INFO)
+        slow_query_logger.propagate = False
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.slow_query_started = time.perf_counter()
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - context.slow_query_started) * 1000
+        if duration_ms < threshold_ms:
+            return
+        # executemany plans are explained with the first parameter set
+        explain_parameters = parameters[0] if executemany and parameters else parameters
+        entry = {
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'duration_ms': round(duration_ms, 2),
+            'database': conn.engine.url.render_as_string(hide_password=True),
+            'statement': statement,
+            'parameters': repr(parameters)[:SLOW_QUERY_PARAMS_CHARS],
+            'executemany': executemany,
+            'explain': _explain(cursor, conn.dialect.name, statement, explain_parameters),
+        }
+        if has_request_context():
+            entry['request'] = f'{request.method} {request.path}'
+        slow_query_logger.info(json.dumps(entry, default=str))
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
@@ -0,0 +1,155 @@
+"""Spaced-repetition (SM-2) review scheduling for user-problem attempts"""
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask.cli import with_appcontext
+
+from config import db
+from models.models import UserProblem
+from changes import next_change_seq
+from sharding import update_user_problems
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+# Rows recomputed per UPDATE batch during bulk rescheduling
+RESCHEDULE_BATCH_SIZE = 1000
+
+
+def utcnow():
+    """Current UTC time as a naive datetime (how due_at is stored)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def parse_review_time(date_string):
+    """Parse an ISO 8601 date_attempted value into a naive UTC datetime"""
+    try:
+        parsed = datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def review_quality(status, num_attempts):
+    """
+    Map an attempt outcome onto the SM-2 0-5 quality scale
+    Returns None for skipped problems, which are never scheduled
+    """
+    num_attempts = num_attempts or 1
+    if status == 'Completed':
+        if num_attempts <= 1:
+            return 5
+        return 4 if num_attempts == 2 else 3
+    if status == 'Attempted':
+        return 2 if num_attempts <= 2 else 1
+    return None
+
+
+def next_review(ease_factor, interval, repetitions, quality):
+    """
+    Apply one SM-2 step
+    Returns: (ease_factor, interval_days, repetitions)
+    """
+    ease_factor = ease_factor or DEFAULT_EASE
+    interval = interval or 0
+    repetitions = repetitions or 0
+
+    if quality >= 3:
+        if repetitions == 0:
+            interval = 1
+        elif repetitions == 1:
+            interval = 6
+        else:
+            interval = round(interval * ease_factor)
+        repetitions += 1
+    else:
+        repetitions = 0
+        interval = 1
+
+    ease_factor += 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+    return max(MIN_EASE, ease_factor), interval, repetitions
+
+
+def schedule_review(user_problem, reviewed_at=None):
+    """Advance the review schedule of a UserProblem after a new attempt"""
+    quality = review_quality(user_problem.status, user_problem.num_attempts)
+    if quality is None:
+        user_problem.due_at = None
+        return user_problem
+
+    reviewed_at = reviewed_at or parse_review_time(user_problem.date_attempted) or utcnow()
+    ease_factor, interval, repetitions = next_review(
+        user_problem.ease_factor, user_problem.review_interval, user_problem.review_repetitions, quality
+    )
+
+    user_problem.ease_factor = ease_factor
+    user_problem.review_interval = interval
+    user_problem.review_repetitions = repetitions
+    user_problem.due_at = reviewed_at + timedelta(days=interval)
+    return user_problem
+
+
+def bulk_reschedule(user_id=None, batch_size=RESCHEDULE_BATCH_SIZE):
+    """
+    Recompute review state from scratch for imported attempts
+
+    Rows are read as plain tuples and written back with executemany UPDATEs
+    keyed by primary key, so no ORM objects are loaded.
+    Returns: number of rows rescheduled
+    """
+    stmt = db.select(
+        UserProblem.user_id,
+        UserProblem.problem_id,
+        UserProblem.status,
+        UserProblem.num_attempts,
+        UserProblem.date_attempted,
+    ).order_by(UserProblem.user_id, UserProblem.problem_id)
+    if user_id is not None:
+        stmt = stmt.where(UserProblem.user_id == user_id)
+
+    now = utcnow()
+    rows = db.session.execute(stmt).all()
+    total = 0
+
+    for start in range(0, len(rows), batch_size):
+        # Each batch commits as one change for delta sync clients
+        seq = next_change_seq()
+        mappings = []
+        for row_user_id, problem_id, status, num_attempts, date_attempted in rows[start:start + batch_size]:
+            mapping = {
+                'user_id': row_user_id,
+                'problem_id': problem_id,
+                'ease_factor': DEFAULT_EASE,
+                'review_interval': 0,
+                'review_repetitions': 0,
+                'due_at': None,
+                'change_seq': seq,
+            }
+            quality = review_quality(status, num_attempts)
+            if quality is not None:
+                ease_factor, interval, repetitions = next_review(DEFAULT_EASE, 0, 0, quality)
+                reviewed_at = parse_review_time(date_attempted) or now
+                mapping.update({
+                    'ease_factor': ease_factor,
+                    'review_interval': interval,
+                    'review_repetitions': repetitions,
+                    'due_at': reviewed_at + timedelta(days=interval),
+                })
+            mappings.append(mapping)
+
+        update_user_problems(mappings)
+        db.session.commit()
+        total += len(mappings)
+
+    return total
+
+
+@click.command('reschedule-reviews')
+@click.option('--user-id', type=int, default=None, help='Only reschedule this user\'s attempts')
+@with_appcontext
+def reschedule_reviews_command(user_id):
+    """Recompute spaced-repetition schedules (e.g. after a bulk import)"""
+    count = bulk_reschedule(user_id=user_id)
+    click.echo(f'Rescheduled {count} user-problem attempts.')
@@ -0,0 +1,287 @@
+"""
+Day, week and month activity rollups per user and globally
+
+Every appended attempt event adds to six rollup rows (three buckets, for its
+user and for everyone), keyed by bucket start, status and problem
+difficulty, in the same transaction as the event itself. Deleting an
+attempt's history subtracts it again. Events count under their problem's
+current difficulty: changing it queues a job that moves the problem's
+history between rollup rows, and until it runs the problem's events keep
+counting under the difficulty recorded in problems.rollup_difficulty.
+Chart endpoints read only these tables, so a year of weekly data is at most
+a few hundred rows.
+
+User and problem deletes that cascade in the database don't pass through
+here, so the global rollups drift slightly until the next compaction:
+`flask rebuild-rollups` (also a nightly job) recomputes both tables from
+attempt_events in one streaming pass.
+"""
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import chain, islice
+
+import click
+from flask.cli import with_appcontext
+
+from config import db
+from models.models import AttemptEvent, Problem, UserActivityRollup, GlobalActivityRollup
+from review import utcnow
+from jobs import enqueue, job_handler, PRIORITY_LOW
+
+BUCKETS = ('day', 'week', 'month')
+
+# Primary key columns of the two rollup tables
+USER_KEY = ('user_id', 'bucket', 'bucket_start', 'status', 'difficulty')
+GLOBAL_KEY = ('bucket', 'bucket_start', 'status', 'difficulty')
+
+# Buckets returned when a chart request has no ?from=
+DEFAULT_SPANS = {'day': 90, 'week': 52, 'month': 24}
+
+# Rows read per round trip and inserted per statement during a rebuild
+REBUILD_BATCH_SIZE = 10000
+
+
+def bucket_start(bucket, ts):
+    """First day of the bucket containing ts (weeks start on Monday)"""
+    day = ts.date() if hasattr(ts, 'date') else ts
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def default_start(bucket, today=None):
+    """Start of the default chart range: DEFAULT_SPANS[bucket] buckets back"""
+    today = today or utcnow().date()
+    if bucket == 'month':
+        months = today.year * 12 + today.month - 1 - (DEFAULT_SPANS['month'] - 1)
+        return date(months // 12, months % 12 + 1, 1)
+    days = DEFAULT_SPANS[bucket] * (7 if bucket == 'week' else 1)
+    return bucket_start(bucket, today - timedelta(days=days - 1))
+
+
+def _aggregate(events, sign=1, deltas=None):
+    """
+    Fold (user_id, ts, status, difficulty, attempts) tuples into rollup deltas,
+    new ones or the (per-user, global) deltas of an earlier call
+    Returns: (per-user deltas, global deltas), each {key: [events, attempts]}
+    """
+    per_user, overall = deltas or (defaultdict(lambda: [0, 0]), defaultdict(lambda: [0, 0]))
+    for user_id, ts, status, difficulty, attempts in events:
+        for bucket in BUCKETS:
+            key = (bucket, bucket_start(bucket, ts), status, difficulty)
+            for counts in (per_user[(user_id,) + key], overall[key]):
+                counts[0] += sign
+                counts[1] += sign * (attempts or 0)
+    return per_user, overall
+
+
+def _upsert(model, key_columns, deltas):
+    """Add deltas to rollup rows, creating missing ones, in one executemany"""
+    rows = [
+        dict(zip(key_columns, key), events=events, attempts=attempts)
+        # Sorted so concurrent writers lock rows in the same order
+        for key, (events, attempts) in sorted(deltas.items())
+    ]
+    if not rows:
+        return
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        _upsert_generic(model, key_columns, rows)
+        return
+
+    # Core rather than ORM executemany, which a sharded session (sharding.py) doesn't support
+    table = model.__table__
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={
+            'events': table.c.events + stmt.excluded.events,
+            'attempts': table.c.attempts + stmt.excluded.attempts,
+        }
+    )
+    db.session.execute(stmt, rows)
+
+
+def _upsert_generic(model, key_columns, rows):
+    for row in rows:
+        updated = db.session.execute(
+            db.update(model)
+            .where(*(getattr(model, column) == row[column] for column in key_columns))
+            .values(events=model.events + row['events'], attempts=model.attempts + row['attempts'])
+        ).rowcount
+        if not updated:
+            db.session.execute(db.insert(model).values(**row))
+
+
+def add_to_rollups(events, sign=1):
+    """Apply attempt events to the rollups in the current transaction (sign=-1 removes them)"""
+    per_user, overall = _aggregate(events, sign)
+    _upsert(UserActivityRollup, USER_KEY, per_user)
+    _upsert(GlobalActivityRollup, GLOBAL_KEY, overall)
+
+
+def rollup_difficulty(problem):
+    """The difficulty a problem's events are counted under in the rollups right now"""
+    return problem.rollup_difficulty or problem.difficulty
+
+
+def schedule_rollup_move(problem, old_difficulty):
+    """
+    Queue moving a problem's rollups to its new difficulty, in the current
+    transaction, if old_difficulty was its difficulty before this change
+
+    Until the move runs, new and deleted events keep counting under the
+    difficulty the rollups hold (rollup_difficulty), so the move stays
+    exact. Repeated edits collapse into one queued run.
+    """
+    if problem.difficulty == old_difficulty:
+        return
+    # Evaluated when the row is written, after any move that was running commits
+    problem.rollup_difficulty = db.func.coalesce(Problem.rollup_difficulty, old_difficulty)
+    enqueue('rollups.move_problem', {'problem_id': problem.id}, dedupe_key=f'rollups.move:{problem.id}')
+
+
+@job_handler('rollups.move_problem')
+def move_problem_rollups(problem_id, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Background job: re-bucket a problem's history from the difficulty its
+    rollups hold to its current one
+
+    The problem row stays locked until the move commits, so a concurrent
+    edit sees either the old pending difficulty or none.
+    """
+    problem = db.session.execute(
+        db.select(Problem).where(Problem.id == problem_id).with_for_update()
+    ).scalar_one_or_none()
+    if problem is None or problem.rollup_difficulty is None:
+        db.session.rollback()
+        return
+    old_difficulty, new_difficulty = problem.rollup_difficulty, problem.difficulty
+
+    if old_difficulty != new_difficulty:
+        live = db.session.execute(
+            db.select(AttemptEvent.user_id, AttemptEvent.ts, AttemptEvent.status, AttemptEvent.attempts)
+            .where(AttemptEvent.problem_id == problem_id)
+            .execution_options(yield_per=batch_size)
+        )
+        # Imported here: attempts imports this module
+        from attempts import iter_archived_events
+        archived = (
+            (user_id, ts, status, attempts)
+            for user_id, event_problem_id, ts, status, attempts in iter_archived_events()
+            if event_problem_id == problem_id
+        )
+
+        deltas = None
+        events = chain(live, archived)
+        while True:
+            batch = list(islice(events, batch_size))
+            if not batch:
+                break
+            deltas = _aggregate(((u, ts, s, old_difficulty, a) for u, ts, s, a in batch), -1, deltas)
+            deltas = _aggregate(((u, ts, s, new_difficulty, a) for u, ts, s, a in batch), 1, deltas)
+        if deltas:
+            per_user, overall = deltas
+            _upsert(UserActivityRollup, USER_KEY, per_user)
+            _upsert(GlobalActivityRollup, GLOBAL_KEY, overall)
+
+    problem.rollup_difficulty = None
+    db.session.commit()
+
+
+@job_handler('rollups.rebuild', cron='17 3 * * *', priority=PRIORITY_LOW)
+def rebuild_rollups(batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recompute every rollup row from attempt_events and the archive
+
+    Events are streamed in batches and only the aggregated rows are held in
+    memory. Old rows are replaced within one transaction, so readers see
+    either the old or the new rollups.
+    Returns: (user rollup rows, global rollup rows)
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Hold off incremental updates until the rebuilt rows are committed
+        db.session.execute(db.text(
+            'LOCK TABLE user_activity_rollups, global_activity_rollups IN EXCLUSIVE MODE'
+        ))
+
+    db.session.execute(db.delete(UserActivityRollup))
+    db.session.execute(db.delete(GlobalActivityRollup))
+
+    result = db.session.execute(
+        db.select(AttemptEvent.user_id, AttemptEvent.ts, AttemptEvent.status,
+                  Problem.difficulty, AttemptEvent.attempts)
+        .join(Problem, Problem.id == AttemptEvent.problem_id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    # Imported here: attempts imports this module
+    from attempts import iter_archived_events
+    difficulties = dict(db.session.execute(db.select(Problem.id, Problem.difficulty)).all())
+    archived = (
+        (user_id, ts, status, difficulties[problem_id], attempts)
+        for user_id, problem_id, ts, status, attempts in iter_archived_events()
+        if problem_id in difficulties
+    )
+    per_user, overall = _aggregate(chain(result, archived))
+
+    for model, key_columns, deltas in ((UserActivityRollup, USER_KEY, per_user),
+                                       (GlobalActivityRollup, GLOBAL_KEY, overall)):
+        rows = [dict(zip(key_columns, key), events=e, attempts=a) for key, (e, a) in deltas.items()]
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(db.insert(model.__table__), rows[start:start + batch_size])
+    # Everything now counts under the current difficulties, so queued moves have nothing left to do
+    db.session.execute(
+        db.update(Problem).where(Problem.rollup_difficulty.is_not(None)).values(rollup_difficulty=None)
+    )
+
+    db.session.commit()
+    return len(per_user), len(overall)
+
+
+def timeseries(bucket, start, end=None, user_id=None):
+    """
+    Rollups for [start, end) grouped into one entry per bucket, oldest first
+    Reads the user's rollups, or the global ones when user_id is None
+    """
+    model = GlobalActivityRollup if user_id is None else UserActivityRollup
+    stmt = db.select(model.bucket_start, model.status, model.difficulty, model.events, model.attempts).where(
+        model.bucket == bucket,
+        model.bucket_start >= start
+    )
+    if user_id is not None:
+        stmt = stmt.where(model.user_id == user_id)
+    if end is not None:
+        stmt = stmt.where(model.bucket_start < end)
+
+    series = {}
+    for start_day, status, difficulty, events, attempts in db.session.execute(stmt.order_by(model.bucket_start)):
+        entry = series.setdefault(start_day, {
+            'start': start_day.isoformat(),
+            'events': 0,
+            'attempts': 0,
+            'by_status': {},
+            'by_difficulty': {},
+        })
+        entry['events'] += events
+        entry['attempts'] += attempts
+        entry['by_status'][status] = entry['by_status'].get(status, 0) + events
+        entry['by_difficulty'][difficulty] = entry['by_difficulty'].get(difficulty, 0) + events
+
+    # Drop buckets whose events were all removed again
+    return [entry for entry in series.values() if entry['events']]
+
+
+@click.command('rebuild-rollups')
+@with_appcontext
+def rebuild_rollups_command():
+    """Recompute the activity rollup tables from attempt_events"""
+    user_rows, global_rows = rebuild_rollups()
+    click.echo(f'Rebuilt {user_rows} user and {global_rows} global rollup rows.')
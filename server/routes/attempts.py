@@ -0,0 +1,66 @@
+from flask import request, make_response
+from flask_restful import Resource
+from models.models import User
+from config import api
+from auth_utils import login_required
+from attempts import attempt_history
+from encoding import encode_response
+from review import parse_review_time
+from .user_problems import check_user_problem_access
+
+def require_auth_for_method(methods_config):
+    """
+    Decorator to apply different auth requirements to different HTTP methods
+    methods_config: dict mapping method names to decorator functions
+    """
+    def decorator(resource_class):
+        for method_name, auth_decorator in methods_config.items():
+            method = getattr(resource_class, method_name, None)
+            if method:
+                setattr(resource_class, method_name, auth_decorator(method))
+        return resource_class
+    return decorator
+
+# Resource for a user's attempt history, across all problems or for one problem
+@require_auth_for_method({'get': login_required})
+class AttemptHistory(Resource):
+    def get(self, user_id, problem_id=None):
+        """
+        Get attempt events in time order
+
+        Optional ?from= and ?to= (ISO 8601) bound the range, ?limit= caps the
+        number of events returned.
+        """
+        allowed, error_response = check_user_problem_access(user_id)
+        if not allowed:
+            return error_response
+
+        if not User.query.get(user_id):
+            return make_response({'error': 'User not found'}, 404)
+
+        bounds = {}
+        for param in ('from', 'to'):
+            value = request.args.get(param)
+            if value is not None:
+                bounds[param] = parse_review_time(value)
+                if bounds[param] is None:
+                    return make_response({'error': f'Invalid {param} date. Use ISO 8601 format'}, 400)
+
+        limit = request.args.get('limit', 1000, type=int)
+
+        # Limit to prevent abuse
+        limit = max(1, min(limit, 5000))
+
+        events = attempt_history(
+            user_id, problem_id, start=bounds.get('from'), end=bounds.get('to'), limit=limit
+        )
+        return encode_response(request, {
+            'attempts': [event.to_dict() for event in events],
+            'limit': limit
+        })
+
+api.add_resource(
+    AttemptHistory,
+    '/api/users/<int:user_id>/attempts',
+    '/api/users/<int:user_id>/problems/<int:problem_id>/history'
+)
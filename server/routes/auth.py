@@ -1,65 +1,38 @@
 import os
-from config import app, db
-from flask import session, jsonify, redirect, url_for, request
-from authlib.integrations.flask_client import OAuth
+import threading
+from config import db
+from flask import Blueprint, current_app, session, jsonify, redirect, url_for, request
 from models.models import User
+from jobs import enqueue, PRIORITY_HIGH
 from sqlalchemy.exc import IntegrityError
-import requests
-import re
+from validation import REGISTRATION
 
-oauth = OAuth(app)
+auth_bp = Blueprint('auth', __name__)
 
 # Set OAuth details from environment variables
 GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET')
-CONF_URL = 'https://accounts.google.com/.well-known/openid-configuration'
-
-# Register the OAuth client (Google in this case)
-oauth.register(
-    name='google',
-    client_id=GOOGLE_CLIENT_ID,
-    client_secret=GOOGLE_CLIENT_SECRET,
-    server_metadata_url=CONF_URL,
-    client_kwargs={'scope': 'openid profile email'}
-)
-
-# Password validation helper
-def validate_password_strength(password):
-    """
-    Validate password strength
-    Returns: (is_valid, error_message)
-    """
-    if len(password) < 8:
-        return False, 'Password must be at least 8 characters long'
-
-    if len(password) > 128:
-        return False, 'Password cannot exceed 128 characters'
-
-    # Check for at least one uppercase letter
-    if not re.search(r'[A-Z]', password):
-        return False, 'Password must contain at least one uppercase letter'
 
-    # Check for at least one lowercase letter
-    if not re.search(r'[a-z]', password):
-        return False, 'Password must contain at least one lowercase letter'
+_oauth_lock = threading.Lock()
 
-    # Check for at least one digit
-    if not re.search(r'\d', password):
-        return False, 'Password must contain at least one number'
-
-    # Check for at least one special character
-    if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
-        return False, 'Password must contain at least one special character (!@#$%^&*(),.?":{}|<>)'
+def get_google_client():
+    """
+    Return the Google OAuth client, registering it on first use
 
-    # Check for common weak passwords
-    common_passwords = ['Password123!', 'Welcome123!', 'Qwerty123!', 'Admin123!']
-    if password in common_passwords:
-        return False, 'This password is too common. Please choose a stronger password'
+    authlib and requests are imported lazily so that app startup doesn't pay
+    for them. The OIDC discovery document and JWKS are served from the cache
+    in oidc.py, which only contacts the provider when its copy has expired.
+    """
+    with _oauth_lock:
+        oauth = current_app.extensions.get('authlib.integrations.flask_client')
+        if oauth is None:
+            from oidc import init_google_oauth
 
-    return True, None
+            return init_google_oauth(current_app, GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET)
+    return oauth.google
 
 # This route checks if the user is authenticated
-@app.route('/api/authorized')
+@auth_bp.route('/api/authorized')
 def check_auth():
     if session.get('email'):
         user = User.query.filter_by(email=session.get('email')).first()
@@ -76,17 +49,18 @@ def check_auth():
         return jsonify({"error": "unauthorized"}), 401
 
 # Redirects user to Google for OAuth login
-@app.route('/google/')
+@auth_bp.route('/google/')
 def google():
-    redirect_uri = url_for('google_auth', _external=True)
+    redirect_uri = url_for('auth.google_auth', _external=True)
     session['nonce'] = os.urandom(16).hex()  # Random nonce for security
-    return oauth.google.authorize_redirect(redirect_uri, nonce=session['nonce'])
+    return get_google_client().authorize_redirect(redirect_uri, nonce=session['nonce'])
 
 # Callback route after Google authentication
-@app.route('/google/auth')
+@auth_bp.route('/google/auth')
 def google_auth():
-    token = oauth.google.authorize_access_token()
-    user_info = oauth.google.parse_id_token(token, nonce=session['nonce'])
+    google_client = get_google_client()
+    token = google_client.authorize_access_token()
+    user_info = google_client.parse_id_token(token, nonce=session['nonce'])
 
     # Validate nonce to prevent replay attacks
     if user_info.get('nonce') != session['nonce']:
@@ -141,59 +115,52 @@ def google_auth():
               </script></html>'''
 
 # Log out and clear the session
-@app.route('/clear')
+@auth_bp.route('/clear')
 def clear():
     session.clear()
     return redirect('/')
 
 # Revoke the OAuth token (useful for logout and resetting state)
-@app.route('/revoke')
+@auth_bp.route('/revoke')
 def revoke():
     access_token = session.get('access_token')
     if not access_token:
         return redirect('/clear')
 
-    # Send revoke request to Google OAuth API
-    revoke_response = requests.post(
-        'https://oauth2.googleapis.com/revoke',
-        params={'token': access_token},
-        headers={'content-type': 'application/x-www-form-urlencoded'}
-    )
+    # Revocation runs as a background job so this request never waits on Google;
+    # the token is cleared from the job's payload once it is done or has failed
+    try:
+        enqueue('oauth.revoke', {'access_token': access_token}, priority=PRIORITY_HIGH)
+        db.session.commit()
+        queued = True
+    except Exception:
+        db.session.rollback()
+        queued = False
+    session.clear()
 
-    if revoke_response.status_code == 200:
-        session.clear()
+    if queued:
         return redirect('/')
     else:
-        session.clear()
         return jsonify({'error': 'Failed to revoke token, but session cleared'}), 200
 
 
 # Email/Password Authentication Routes
 
-@app.route('/api/register', methods=['POST'])
+@auth_bp.route('/api/register', methods=['POST'])
 def register():
     """Register a new user with email and password"""
     try:
         data = request.get_json()
 
-        # Validate required fields
-        if not data.get('email') or not data.get('password') or not data.get('user_name'):
-            return jsonify({'error': 'Email, password, and user_name are required'}), 400
+        # Validate required fields, email format and password strength
+        error = REGISTRATION.validate(data)
+        if error:
+            return jsonify({'error': error}), 400
 
         email = data['email'].strip().lower()
         password = data['password']
         user_name = data['user_name'].strip()
 
-        # Validate email format
-        email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        if not re.match(email_regex, email):
-            return jsonify({'error': 'Invalid email format'}), 400
-
-        # Validate password strength
-        is_valid, error_message = validate_password_strength(password)
-        if not is_valid:
-            return jsonify({'error': error_message}), 400
-
         # Check if user already exists
         existing_user = User.query.filter_by(email=email).first()
         if existing_user:
@@ -234,7 +201,7 @@ def register():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/login', methods=['POST'])
+@auth_bp.route('/api/login', methods=['POST'])
 def login():
     """Login with email and password"""
     try:
@@ -273,7 +240,7 @@ def login():
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/logout', methods=['POST'])
+@auth_bp.route('/api/logout', methods=['POST'])
 def logout():
     """Logout the current user"""
     session.clear()
@@ -0,0 +1,89 @@
+from flask import request, make_response
+from flask_restful import Resource
+from models.models import Problem, UserProblem, Tombstone
+from config import api, db
+from auth_utils import login_required, get_current_user
+from changes import current_change_seq
+from .user_problems import include_notes, WITH_NOTES
+
+def require_auth_for_method(methods_config):
+    """
+    Decorator to apply different auth requirements to different HTTP methods
+    methods_config: dict mapping method names to decorator functions
+    """
+    def decorator(resource_class):
+        for method_name, auth_decorator in methods_config.items():
+            method = getattr(resource_class, method_name, None)
+            if method:
+                setattr(resource_class, method_name, auth_decorator(method))
+        return resource_class
+    return decorator
+
+# Resource for incremental client refresh: catalog and own attempts changed since a sequence
+@require_auth_for_method({'get': login_required})
+class Changes(Resource):
+    def get(self):
+        """
+        Get rows changed after ?since=<seq>
+
+        Clients store the returned 'seq' and pass it as 'since' next time.
+        Deleting a problem also deletes its user_problems through the database
+        cascade, which records no user_problem tombstones, so every deleted
+        problem id is listed under deleted.user_problems as well. A deletion
+        is only listed if no returned row supersedes it (a user-problem
+        deleted and added again since), so deletions and rows never
+        contradict each other.
+        """
+        current_user = get_current_user()
+        if not current_user:
+            return make_response({'error': 'Authentication required'}, 401)
+
+        since = request.args.get('since', 0, type=int)
+
+        # Read the high-water mark first: anything committed later is picked up next time
+        seq = current_change_seq()
+
+        problems = Problem.query.filter(
+            Problem.change_seq > since
+        ).order_by(Problem.change_seq).all()
+
+        user_problems_query = UserProblem.query.filter(
+            UserProblem.user_id == current_user.id,
+            UserProblem.change_seq > since
+        ).order_by(UserProblem.change_seq)
+        # Rows carry notes_preview; ?include=notes adds the full notes
+        rules = ('-user', '-problem')
+        if include_notes():
+            user_problems_query = user_problems_query.options(db.undefer(UserProblem.notes_compressed))
+            rules += WITH_NOTES
+        user_problems = user_problems_query.all()
+
+        tombstones = Tombstone.query.filter(
+            Tombstone.seq > since,
+            db.or_(Tombstone.user_id.is_(None), Tombstone.user_id == current_user.id)
+        ).order_by(Tombstone.seq).all()
+
+        # Latest live seq per problem id, for dropping tombstones of rows re-created after them
+        live_problems = {problem.id: problem.change_seq for problem in problems}
+        live_user_problems = {up.problem_id: up.change_seq for up in user_problems}
+        deleted_problems, deleted_user_problems = [], []
+        for tombstone in tombstones:
+            problem_id = tombstone.problem_id
+            if tombstone.entity == 'problem' and live_problems.get(problem_id, 0) < tombstone.seq:
+                deleted_problems.append(problem_id)
+            # A problem's tombstone stands for its cascaded user_problems too
+            if live_user_problems.get(problem_id, 0) < tombstone.seq:
+                deleted_user_problems.append(problem_id)
+
+        return make_response({
+            'since': since,
+            'seq': seq,
+            'problems': [problem.to_dict(rules=('-user_problems',)) for problem in problems],
+            'user_problems': [up.to_dict(rules=rules) for up in user_problems],
+            'deleted': {
+                'problems': deleted_problems,
+                'user_problems': deleted_user_problems,
+            }
+        }, 200)
+
+api.add_resource(Changes, '/api/changes')
@@ -0,0 +1,53 @@
+import json
+from flask import Blueprint, Response, current_app, jsonify, session
+from auth_utils import login_required
+from events import init_events, HEARTBEAT_SECONDS
+
+events_bp = Blueprint('events', __name__)
+
+def format_event(event_id, payload):
+    """Format a single server-sent event frame"""
+    return f"id: {event_id}\nevent: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+
+# Server-sent event stream of catalog changes and the user's own progress writes
+@events_bp.route('/api/events')
+@login_required
+def event_stream():
+    """
+    Stream change events to the current user until they disconnect
+
+    Each open stream blocks in subscriber.wait() for as long as it lasts, so
+    it holds whatever the server runs a request on. Under gunicorn's sync or
+    gthread workers that is a worker thread, so gunicorn.conf.py caps streams
+    at the threads a process can spare while keeping one for other requests:
+    GUNICORN_THREADS - 1 under gthread, and none under the default sync worker,
+    where streams are refused with a 503 and clients sync through
+    /api/changes. Thousands of idle subscribers need a cooperative worker,
+    GUNICORN_WORKER_CLASS=gevent (with gevent installed), where a stream
+    costs one greenlet; EVENTS_MAX_SUBSCRIBERS caps streams per process.
+    """
+    hub = init_events(current_app)
+    subscriber = hub.subscribe(session['user_id'])
+    if subscriber is None:
+        return jsonify({'error': 'Too many open event streams, try again later'}), 503
+
+    def generate():
+        try:
+            # Reconnect delay hint for EventSource clients
+            yield 'retry: 3000\n\n'
+            while True:
+                events, overflowed = subscriber.wait(HEARTBEAT_SECONDS)
+                if overflowed:
+                    # Events were dropped: the client should catch up via /api/changes
+                    yield 'event: resync\ndata: {}\n\n'
+                for event_id, payload in events:
+                    yield format_event(event_id, payload)
+                if not events and not overflowed:
+                    yield ': heartbeat\n\n'
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # Disable proxy buffering (nginx)
+    })
@@ -0,0 +1,39 @@
+from flask import make_response, current_app
+from flask_restful import Resource
+from models.models import User
+from config import api
+from auth_utils import login_required
+from .user_problems import check_user_problem_access
+
+def require_auth_for_method(methods_config):
+    """
+    Decorator to apply different auth requirements to different HTTP methods
+    methods_config: dict mapping method names to decorator functions
+    """
+    def decorator(resource_class):
+        for method_name, auth_decorator in methods_config.items():
+            method = getattr(resource_class, method_name, None)
+            if method:
+                setattr(resource_class, method_name, auth_decorator(method))
+        return resource_class
+    return decorator
+
+# Resource for a user's performance insights (weakest areas, cohort percentiles)
+@require_auth_for_method({'get': login_required})
+class UserInsights(Resource):
+    def get(self, user_id):
+        """Get precomputed cohort insights for a specific user"""
+        allowed, error_response = check_user_problem_access(user_id)
+        if not allowed:
+            return error_response
+
+        if not User.query.get(user_id):
+            return make_response({'error': 'User not found'}, 404)
+
+        # Imported lazily so NumPy stays off the app startup path
+        from analytics import get_snapshot
+
+        snapshot = get_snapshot(current_app._get_current_object())
+        return make_response(snapshot.insights_for(user_id), 200)
+
+api.add_resource(UserInsights, '/api/users/<int:user_id>/insights')
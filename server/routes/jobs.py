@@ -0,0 +1,27 @@
+from flask import make_response
+from flask_restful import Resource
+from config import api
+from auth_utils import admin_required
+from jobs import job_stats
+
+def require_auth_for_method(methods_config):
+    """
+    Decorator to apply different auth requirements to different HTTP methods
+    methods_config: dict mapping method names to decorator functions
+    """
+    def decorator(resource_class):
+        for method_name, auth_decorator in methods_config.items():
+            method = getattr(resource_class, method_name, None)
+            if method:
+                setattr(resource_class, method_name, auth_decorator(method))
+        return resource_class
+    return decorator
+
+# Resource for background job metrics (admin only)
+@require_auth_for_method({'get': admin_required})
+class JobStats(Resource):
+    def get(self):
+        """Get job counts and timings per job name and status"""
+        return make_response({'jobs': job_stats()}, 200)
+
+api.add_resource(JobStats, '/api/jobs/stats')
@@ -0,0 +1,94 @@
+from flask import request, make_response
+from flask_restful import Resource
+from config import api
+from auth_utils import login_required
+from encoding import encode_response
+from note_revisions import list_note_revisions, note_revision_text
+from autosave import notes_autosave
+from validation import NOTES_AUTOSAVE
+from .user_problems import check_user_problem_access
+import math
+
+def require_auth_for_method(methods_config):
+    """
+    Decorator to apply different auth requirements to different HTTP methods
+    methods_config: dict mapping method names to decorator functions
+    """
+    def decorator(resource_class):
+        for method_name, auth_decorator in methods_config.items():
+            method = getattr(resource_class, method_name, None)
+            if method:
+                setattr(resource_class, method_name, auth_decorator(method))
+        return resource_class
+    return decorator
+
+# Resource for listing the revisions of a user's notes on a problem
+@require_auth_for_method({'get': login_required})
+class NoteRevisions(Resource):
+    def get(self, user_id, problem_id):
+        """Get a page of note revisions, newest first, without their text"""
+        allowed, error_response = check_user_problem_access(user_id)
+        if not allowed:
+            return error_response
+
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = request.args.get('per_page', 50, type=int)
+        per_page = max(min(per_page, 100), 1)
+
+        revisions, total = list_note_revisions(user_id, problem_id, page, per_page)
+        return encode_response(request, {
+            'revisions': revisions,
+            'page': page,
+            'per_page': per_page,
+            'total': total,
+            'pages': math.ceil(total / per_page)
+        })
+
+api.add_resource(NoteRevisions, '/api/users/<int:user_id>/problems/<int:problem_id>/notes/revisions')
+
+
+# Resource for the notes as of one revision
+@require_auth_for_method({'get': login_required})
+class NoteRevisionResource(Resource):
+    def get(self, user_id, problem_id, revision):
+        """Get the text of a note revision, rebuilt from its nearest snapshot"""
+        allowed, error_response = check_user_problem_access(user_id)
+        if not allowed:
+            return error_response
+
+        notes = note_revision_text(user_id, problem_id, revision)
+        if notes is None:
+            return make_response({'error': 'Note revision not found'}, 404)
+
+        return encode_response(request, {'revision': revision, 'notes': notes})
+
+api.add_resource(NoteRevisionResource, '/api/users/<int:user_id>/problems/<int:problem_id>/notes/revisions/<int:revision>')
+
+
+# Resource for autosaving notes: buffered, coalesced per problem and written in batches
+@require_auth_for_method({'put': login_required})
+class AutosaveNotes(Resource):
+    def put(self, user_id, problem_id):
+        """
+        Save the latest notes without waiting for the database
+
+        The notes are written within NOTES_AUTOSAVE_FLUSH_INTERVAL seconds,
+        unless newer notes are saved first. Notes for a problem the user
+        hasn't tracked are dropped.
+        """
+        allowed, error_response = check_user_problem_access(user_id)
+        if not allowed:
+            return error_response
+
+        request_json = request.get_json(silent=True)
+        error = NOTES_AUTOSAVE.validate(request_json)
+        if error:
+            return make_response({'error': error}, 400)
+        if 'notes' not in request_json:
+            return make_response({'error': 'Missing required field: notes'}, 400)
+
+        autosave = notes_autosave()
+        saved_at = autosave.save(user_id, problem_id, request_json['notes'])
+        return make_response({'saved_at': saved_at.isoformat(), 'flush_interval': autosave.flush_interval}, 202)
+
+api.add_resource(AutosaveNotes, '/api/users/<int:user_id>/problems/<int:problem_id>/notes/autosave')
@@ -1,8 +1,20 @@
-from flask import request, make_response
+import os
+from flask import request, make_response, current_app, redirect, send_file, url_for
 from flask_restful import Resource
-from models.models import Problem  # Import your Problem model
+from models.models import Problem, UserProblem  # Import your Problem model
 from config import api, db
-from auth_utils import admin_required, login_required
+from cascade_delete import has_large_fanout, schedule_chunked_delete, delete_sharded_children
+from attempts import forget_archived_attempts
+from rollups import schedule_rollup_move
+from changes import stamp_change, record_tombstone
+from catalog_snapshot import ensure_snapshot, snapshot_dir, snapshot_exists, snapshot_path, FORMAT_EXTENSIONS
+from encoding import negotiate_format, negotiate_encoding, encode_response, JSON_MIMETYPE
+from auth_utils import admin_required, login_required, get_current_user
+from validation import PROBLEM_CREATE, PROBLEM_UPDATE
+from tags import set_problem_tags, filter_by_tags, parse_tags, MATCH_MODES
+from facets import problem_facets
+from links import canonical_link, link_hash
+from sqlalchemy.exc import IntegrityError
 
 def require_auth_for_method(methods_config):
     """
@@ -17,6 +29,14 @@ def require_auth_for_method(methods_config):
         return resource_class
     return decorator
 
+def find_by_link(url):
+    """The problem whose canonical link matches url: one unique index lookup"""
+    return Problem.query.filter_by(link_hash=link_hash(canonical_link(url))).first()
+
+
+# Problem columns the catalog listing can be sorted by
+SORTABLE_FIELDS = ('id', 'attempt_count', 'completion_count', 'mean_attempts', 'empirical_difficulty')
+
 # Resource for getting all problems or adding a new problem
 @require_auth_for_method({'get': login_required, 'post': admin_required})
 class Problems(Resource):
@@ -32,17 +52,48 @@ class Problems(Resource):
         difficulty = request.args.get('difficulty')
         category = request.args.get('category')
 
+        # Optional filtering by tags: problems with all (or any) of them
+        tags = parse_tags(request.args.get('tags', ''))
+        match = request.args.get('match', 'all')
+
+        # Optional filtering and sorting by the indexed solve stats (problem_stats.py)
+        min_score = request.args.get('min_empirical_difficulty', type=float)
+        max_score = request.args.get('max_empirical_difficulty', type=float)
+        min_attempts = request.args.get('min_attempt_count', type=int)
+        sort = request.args.get('sort', 'id')
+        order = request.args.get('order', 'asc')
+
+        if sort not in SORTABLE_FIELDS:
+            return make_response({'error': f'Invalid sort. Must be one of: {", ".join(SORTABLE_FIELDS)}'}, 400)
+        if order not in ('asc', 'desc'):
+            return make_response({'error': 'Invalid order. Must be asc or desc'}, 400)
+        if match not in MATCH_MODES:
+            return make_response({'error': 'Invalid match. Must be all or any'}, 400)
+
         query = Problem.query
 
         if difficulty:
             query = query.filter_by(difficulty=difficulty)
         if category:
             query = query.filter_by(category=category)
+        if min_score is not None:
+            query = query.filter(Problem.empirical_difficulty >= min_score)
+        if max_score is not None:
+            query = query.filter(Problem.empirical_difficulty <= max_score)
+        if min_attempts is not None:
+            query = query.filter(Problem.attempt_count >= min_attempts)
+        if tags:
+            query = filter_by_tags(query, tags, match)
+
+        # Unrated problems sort last either way; id keeps pages stable
+        column = getattr(Problem, sort)
+        direction = column.desc() if order == 'desc' else column.asc()
+        query = query.order_by(direction.nulls_last(), Problem.id)
 
         problems_query = query.paginate(page=page, per_page=per_page, error_out=False)
         problems = [problem.to_dict() for problem in problems_query.items]
 
-        return make_response({
+        return encode_response(request, {
             'problems': problems,
             'page': page,
             'per_page': per_page,
@@ -55,10 +106,9 @@ class Problems(Resource):
             request_json = request.get_json()
 
             # Validate required fields for problem catalog
-            required_fields = ['problem_name', 'problem_link', 'difficulty', 'category']
-            for field in required_fields:
-                if not request_json.get(field):
-                    return make_response({'error': f'Missing required field: {field}'}, 400)
+            error = PROBLEM_CREATE.validate(request_json)
+            if error:
+                return make_response({'error': error}, 400)
 
             # Extract fields from the incoming request data
             problem_name = request_json.get('problem_name')
@@ -66,6 +116,11 @@ class Problems(Resource):
             difficulty = request_json.get('difficulty')
             category = request_json.get('category')
 
+            # Links are compared in canonical form, so variants of a known URL are rejected
+            existing = find_by_link(problem_link)
+            if existing:
+                return make_response({'error': 'A problem with this link already exists', 'id': existing.id}, 409)
+
             # Create new problem instance (catalog entry only)
             problem = Problem(
                 problem_name = problem_name,
@@ -74,11 +129,20 @@ class Problems(Resource):
                 category = category
             )
 
+            # Without explicit tags, a problem is tagged with its category
+            set_problem_tags(problem, request_json.get('tags') or [category])
+
             # Add to database
             db.session.add(problem)
-            db.session.commit()
+            stamp_change(problem)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Race condition: another request added the same link
+                db.session.rollback()
+                return make_response({'error': 'A problem with this link already exists'}, 409)
 
-            return make_response(problem.to_dict(), 201)
+            return encode_response(request, problem.to_dict(), 201)
         except Exception as e:
             db.session.rollback()
             # Don't expose internal error details
@@ -102,6 +166,20 @@ class ProblemResource(Resource):
             if not problem:
                 return make_response({'error': 'Problem not found'}, 404)
 
+            # Tell delta sync clients to drop the problem and its attempts
+            record_tombstone('problem', id)
+
+            # Archived attempt history is hidden now and compacted away later
+            forget_archived_attempts(problem_id=id)
+
+            # Very large fan-outs are deleted in chunks by a background job
+            if has_large_fanout(UserProblem.problem_id, id):
+                schedule_chunked_delete('problem', id)
+                db.session.commit()
+                return make_response({'message': 'Problem deletion scheduled'}, 202)
+
+            # user_problems rows are removed by ON DELETE CASCADE, or explicitly on user shards
+            delete_sharded_children('problem', id)
             db.session.delete(problem)
             db.session.commit()
 
@@ -119,15 +197,35 @@ class ProblemResource(Resource):
 
             request_json = request.get_json()
 
+            error = PROBLEM_UPDATE.validate(request_json)
+            if error:
+                return make_response({'error': error}, 400)
+
             # Define allowed fields for update (catalog fields only)
             allowed_fields = ['problem_name', 'problem_link', 'difficulty', 'category']
 
+            if request_json.get('problem_link'):
+                existing = find_by_link(request_json['problem_link'])
+                if existing and existing.id != problem.id:
+                    return make_response({'error': 'A problem with this link already exists', 'id': existing.id}, 409)
+
             # Update the problem with new values from the request
+            old_difficulty = problem.difficulty
             for key in request_json:
                 if key in allowed_fields:
                     setattr(problem, key, request_json[key])
+            # Activity charts count attempts under the problem's current difficulty; a job moves them
+            schedule_rollup_move(problem, old_difficulty)
+            if 'tags' in request_json:
+                set_problem_tags(problem, request_json['tags'])
 
-            db.session.commit()
+            stamp_change(problem)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Race condition: another request took the same link
+                db.session.rollback()
+                return make_response({'error': 'A problem with this link already exists'}, 409)
 
             return make_response(problem.to_dict(), 200)
         except Exception as e:
@@ -136,3 +234,111 @@ class ProblemResource(Resource):
             return make_response({'error': 'Failed to update problem'}, 500)
 
 api.add_resource(ProblemResource, '/api/problems/<int:id>')
+
+
+# Resource for finding a problem by any variant of its URL
+@require_auth_for_method({'get': login_required})
+class ProblemByLink(Resource):
+    def get(self):
+        url = request.args.get('url', '').strip()
+        if not url:
+            return make_response({'error': 'Missing required parameter: url'}, 400)
+
+        problem = find_by_link(url)
+        if not problem:
+            return make_response({'error': 'Problem not found'}, 404)
+        return make_response(problem.to_dict(), 200)
+
+api.add_resource(ProblemByLink, '/api/problems/by-link')
+
+
+# Resource for finding a problem by its slug (e.g. two-sum)
+@require_auth_for_method({'get': login_required})
+class ProblemBySlug(Resource):
+    def get(self, slug):
+        # Slugs aren't unique across sites; the oldest problem wins
+        problem = Problem.query.filter_by(slug=slug.lower()).order_by(Problem.id).first()
+        if not problem:
+            return make_response({'error': 'Problem not found'}, 404)
+        return make_response(problem.to_dict(), 200)
+
+api.add_resource(ProblemBySlug, '/api/problems/by-slug/<string:slug>')
+
+
+# Resource for the filter UI's counts per difficulty and category (see facets.py)
+@require_auth_for_method({'get': login_required})
+class ProblemFacets(Resource):
+    def get(self):
+        """
+        Facet counts under the same difficulty, category and tags filters as /api/problems
+        include=completed adds the current user's completed counts
+        """
+        match = request.args.get('match', 'all')
+        if match not in MATCH_MODES:
+            return make_response({'error': 'Invalid match. Must be all or any'}, 400)
+
+        completed_by = None
+        if request.args.get('include') == 'completed':
+            user = get_current_user()
+            if not user:
+                return make_response({'error': 'User not found'}, 404)
+            completed_by = user.id
+
+        facets = problem_facets(
+            difficulty=request.args.get('difficulty'),
+            category=request.args.get('category'),
+            tags=parse_tags(request.args.get('tags', '')),
+            match=match,
+            completed_by=completed_by,
+        )
+        return encode_response(request, facets, 200)
+
+api.add_resource(ProblemFacets, '/api/problems/facets')
+
+
+
+# Resource for the full catalog: redirects to the current versioned snapshot
+@require_auth_for_method({'get': login_required})
+class ProblemSnapshot(Resource):
+    def get(self):
+        version = ensure_snapshot(current_app._get_current_object())
+        response = redirect(url_for('problemsnapshotversion', version=version, **request.args.to_dict()))
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+api.add_resource(ProblemSnapshot, '/api/problems/snapshot')
+
+
+# Resource for one immutable catalog snapshot version, served straight from disk
+@require_auth_for_method({'get': login_required})
+class ProblemSnapshotVersion(Resource):
+    def get(self, version):
+        directory = snapshot_dir(current_app)
+        if not snapshot_exists(directory, version):
+            # Pruned or never built: send the client to the current version
+            return redirect(url_for('problemsnapshot', **request.args.to_dict()))
+
+        mimetype = negotiate_format(request)
+        if not os.path.exists(snapshot_path(directory, version, mimetype)):
+            mimetype = JSON_MIMETYPE
+
+        encoding = negotiate_encoding(request)
+        path = snapshot_path(directory, version, mimetype, encoding)
+        if not os.path.exists(path):
+            encoding = 'identity'
+            path = snapshot_path(directory, version, mimetype)
+
+        # send_file hands the open file to the server's file wrapper (sendfile where supported)
+        response = send_file(
+            path,
+            mimetype=mimetype,
+            conditional=True,
+            etag=f'catalog-{version}-{FORMAT_EXTENSIONS[mimetype]}-{encoding}',
+        )
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+        response.vary.update(('Accept', 'Accept-Encoding'))
+        return response
+
+api.add_resource(ProblemSnapshotVersion, '/api/problems/snapshot/<int:version>')
@@ -0,0 +1,53 @@
+from flask import make_response, current_app
+from flask_restful import Resource
+from config import api
+from auth_utils import admin_required, get_current_user
+from profiling import issue_profile_token, list_profiles, profile_summary, PROFILE_HEADER, PROFILE_TOKEN_TTL
+
+def require_auth_for_method(methods_config):
+    """
+    Decorator to apply different auth requirements to different HTTP methods
+    methods_config: dict mapping method names to decorator functions
+    """
+    def decorator(resource_class):
+        for method_name, auth_decorator in methods_config.items():
+            method = getattr(resource_class, method_name, None)
+            if method:
+                setattr(resource_class, method_name, auth_decorator(method))
+        return resource_class
+    return decorator
+
+# Resource for issuing request profiling tokens (admin only)
+@require_auth_for_method({'post': admin_required})
+class ProfileToken(Resource):
+    def post(self):
+        """Issue a short-lived token; requests sent with it are profiled"""
+        token = issue_profile_token(current_app, get_current_user())
+        return make_response({'token': token, 'header': PROFILE_HEADER, 'expires_in': PROFILE_TOKEN_TTL}, 200)
+
+api.add_resource(ProfileToken, '/api/admin/profile-token')
+
+
+# Resource for listing saved request profiles (admin only)
+@require_auth_for_method({'get': admin_required})
+class Profiles(Resource):
+    def get(self):
+        """Get the names of saved profiles, newest first"""
+        return make_response({'profiles': list_profiles(current_app)}, 200)
+
+api.add_resource(Profiles, '/api/admin/profiles')
+
+
+# Resource for reading one saved request profile (admin only)
+@require_auth_for_method({'get': admin_required})
+class ProfileResource(Resource):
+    def get(self, name):
+        """Get a profile's top functions by cumulative time, as plain text"""
+        summary = profile_summary(current_app, name)
+        if summary is None:
+            return make_response({'error': 'Profile not found'}, 404)
+        response = make_response(summary, 200)
+        response.headers['Content-Type'] = 'text/plain; charset=utf-8'
+        return response
+
+api.add_resource(ProfileResource, '/api/admin/profiles/<string:name>')
@@ -0,0 +1,50 @@
+from flask import request, make_response
+from flask_restful import Resource
+from models.models import User, UserProblem
+from config import api
+from auth_utils import login_required
+from review import utcnow
+from .user_problems import check_user_problem_access
+
+def require_auth_for_method(methods_config):
+    """
+    Decorator to apply different auth requirements to different HTTP methods
+    methods_config: dict mapping method names to decorator functions
+    """
+    def decorator(resource_class):
+        for method_name, auth_decorator in methods_config.items():
+            method = getattr(resource_class, method_name, None)
+            if method:
+                setattr(resource_class, method_name, auth_decorator(method))
+        return resource_class
+    return decorator
+
+# Resource for the problems a user is due to review
+@require_auth_for_method({'get': login_required})
+class ReviewQueue(Resource):
+    def get(self, user_id):
+        """Get the user's due reviews, most overdue first"""
+        allowed, error_response = check_user_problem_access(user_id)
+        if not allowed:
+            return error_response
+
+        if not User.query.get(user_id):
+            return make_response({'error': 'User not found'}, 404)
+
+        limit = request.args.get('limit', 20, type=int)
+
+        # Limit to prevent abuse
+        limit = max(1, min(limit, 100))
+
+        # Range scan over ix_user_problems_user_id_due_at, already in due_at order
+        due = UserProblem.query.filter(
+            UserProblem.user_id == user_id,
+            UserProblem.due_at <= utcnow()
+        ).order_by(UserProblem.due_at).limit(limit).all()
+
+        return make_response({
+            'review_queue': [up.to_dict() for up in due],
+            'limit': limit
+        }, 200)
+
+api.add_resource(ReviewQueue, '/api/users/<int:user_id>/review-queue')
@@ -1,4 +1,14 @@
 from .auth import *
 from .user import *
 from .problems import *
-from .user_problems import *  
\ No newline at end of file
+from .user_problems import *
+from .insights import *
+from .review import *
+from .changes import *
+from .events import *
+from .attempts import *
+from .timeseries import *
+from .jobs import *
+from .profiles import *
+from .tags import *
+from .notes import *
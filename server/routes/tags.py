@@ -0,0 +1,28 @@
+from flask import request
+from flask_restful import Resource
+from config import api
+from auth_utils import login_required
+from encoding import encode_response
+from tags import tag_counts
+
+def require_auth_for_method(methods_config):
+    """
+    Decorator to apply different auth requirements to different HTTP methods
+    methods_config: dict mapping method names to decorator functions
+    """
+    def decorator(resource_class):
+        for method_name, auth_decorator in methods_config.items():
+            method = getattr(resource_class, method_name, None)
+            if method:
+                setattr(resource_class, method_name, auth_decorator(method))
+        return resource_class
+    return decorator
+
+# Resource for listing tags with their problem counts
+@require_auth_for_method({'get': login_required})
+class Tags(Resource):
+    def get(self):
+        """Get every tag and how many problems have it, most used first"""
+        return encode_response(request, {'tags': tag_counts()}, 200)
+
+api.add_resource(Tags, '/api/tags')
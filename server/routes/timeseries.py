@@ -0,0 +1,82 @@
+from flask import request, make_response
+from flask_restful import Resource
+from models.models import User
+from config import api
+from auth_utils import login_required
+from rollups import timeseries, default_start, bucket_start, BUCKETS
+from review import parse_review_time
+from .user_problems import check_user_problem_access
+
+def require_auth_for_method(methods_config):
+    """
+    Decorator to apply different auth requirements to different HTTP methods
+    methods_config: dict mapping method names to decorator functions
+    """
+    def decorator(resource_class):
+        for method_name, auth_decorator in methods_config.items():
+            method = getattr(resource_class, method_name, None)
+            if method:
+                setattr(resource_class, method_name, auth_decorator(method))
+        return resource_class
+    return decorator
+
+def parse_timeseries_args():
+    """
+    Read ?bucket=day|week|month and optional ?from= / ?to= (ISO 8601)
+    Returns: (bucket, start, end, error_response)
+    """
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        return None, None, None, make_response({'error': f'Invalid bucket. Must be one of: {", ".join(BUCKETS)}'}, 400)
+
+    bounds = {}
+    for param in ('from', 'to'):
+        value = request.args.get(param)
+        if value is not None:
+            parsed = parse_review_time(value)
+            if parsed is None:
+                return None, None, None, make_response({'error': f'Invalid {param} date. Use ISO 8601 format'}, 400)
+            # The bucket containing ?from= is included; ?to= is exclusive
+            bounds[param] = bucket_start(bucket, parsed) if param == 'from' else parsed.date()
+
+    start = bounds.get('from') or default_start(bucket)
+    return bucket, start, bounds.get('to'), None
+
+# Resource for a user's activity per day, week or month (reads only the rollup tables)
+@require_auth_for_method({'get': login_required})
+class UserTimeseries(Resource):
+    def get(self, user_id):
+        """Get the user's attempt counts per bucket, by status and difficulty"""
+        allowed, error_response = check_user_problem_access(user_id)
+        if not allowed:
+            return error_response
+
+        if not User.query.get(user_id):
+            return make_response({'error': 'User not found'}, 404)
+
+        bucket, start, end, error_response = parse_timeseries_args()
+        if error_response:
+            return error_response
+
+        return make_response({
+            'bucket': bucket,
+            'series': timeseries(bucket, start, end, user_id=user_id)
+        }, 200)
+
+api.add_resource(UserTimeseries, '/api/users/<int:user_id>/timeseries')
+
+# Resource for activity across all users
+@require_auth_for_method({'get': login_required})
+class GlobalTimeseries(Resource):
+    def get(self):
+        """Get everyone's attempt counts per bucket, by status and difficulty"""
+        bucket, start, end, error_response = parse_timeseries_args()
+        if error_response:
+            return error_response
+
+        return make_response({
+            'bucket': bucket,
+            'series': timeseries(bucket, start, end)
+        }, 200)
+
+api.add_resource(GlobalTimeseries, '/api/timeseries')
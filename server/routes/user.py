@@ -1,7 +1,10 @@
 from flask import request, make_response, session
 from flask_restful import Resource
-from models.models import User  # Import your User model
+from models.models import User, UserProblem  # Import your User model
 from config import api, db
+from cascade_delete import has_large_fanout, schedule_chunked_delete, delete_sharded_children
+from attempts import forget_archived_attempts
+from encoding import encode_response
 from auth_utils import admin_required, login_required, get_current_user
 from functools import wraps
 
@@ -34,7 +37,7 @@ class Users(Resource):
         users_query = User.query.paginate(page=page, per_page=per_page, error_out=False)
         users = [user.to_dict() for user in users_query.items]
 
-        return make_response({
+        return encode_response(request, {
             'users': users,
             'page': page,
             'per_page': per_page,
@@ -79,7 +82,7 @@ class Users(Resource):
             db.session.add(user)
             db.session.commit()
 
-            return make_response(user.to_dict(), 201)
+            return encode_response(request, user.to_dict(), 201)
         except Exception as e:
             db.session.rollback()
             # Don't expose internal error details
@@ -124,6 +127,17 @@ class UserResource(Resource):
             if not user:
                 return make_response({'error': 'User not found'}, 404)
 
+            # Archived attempt history is hidden now and compacted away later
+            forget_archived_attempts(user_id=id)
+
+            # Very large fan-outs are deleted in chunks by a background job
+            if has_large_fanout(UserProblem.user_id, id):
+                schedule_chunked_delete('user', id)
+                db.session.commit()
+                return make_response({'message': 'User deletion scheduled'}, 202)
+
+            # user_problems rows are removed by ON DELETE CASCADE, or explicitly on user shards
+            delete_sharded_children('user', id)
             db.session.delete(user)
             db.session.commit()
 
@@ -3,7 +3,22 @@ from flask_restful import Resource
 from models.models import UserProblem, User, Problem
 from config import api, db
 from auth_utils import admin_required, login_required, get_current_user, require_user_ownership
-from datetime import datetime
+from review import schedule_review, utcnow
+from attempts import record_attempt, delete_attempts, increment_attempt
+from note_revisions import record_note_revision, delete_note_revisions
+from problem_stats import update_problem_stats
+from changes import stamp_change, record_tombstone
+from encoding import encode_response
+from sharding import paginate_user_problems
+from validation import USER_PROBLEM_CREATE, USER_PROBLEM_UPDATE, USER_PROBLEM_ATTEMPT
+from sqlalchemy.exc import IntegrityError
+import math
+
+# Most user-problem attempts created by one batch request
+BATCH_MAX_ITEMS = 100
+
+# Serialization rule adding the full notes; lists only carry notes_preview
+WITH_NOTES = ('notes',)
 
 def require_auth_for_method(methods_config):
     """
@@ -18,31 +33,30 @@ def require_auth_for_method(methods_config):
         return resource_class
     return decorator
 
-def validate_date_format(date_string):
-    """Validate and parse ISO date format"""
-    try:
-        return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
-    except (ValueError, AttributeError):
-        return None
+def include_notes():
+    """Whether a list request asked for full notes (?include=notes)"""
+    return 'notes' in request.args.get('include', '').split(',')
 
 # Resource for getting all user-problem attempts or adding a new attempt
 @require_auth_for_method({'get': admin_required, 'post': login_required})
 class UserProblems(Resource):
     def get(self):
         """Get all user-problem attempts (admin only)"""
-        page = request.args.get('page', 1, type=int)
+        page = max(request.args.get('page', 1, type=int), 1)
         per_page = request.args.get('per_page', 50, type=int)
-        per_page = min(per_page, 100)
+        per_page = max(min(per_page, 100), 1)
 
-        user_problems_query = UserProblem.query.paginate(page=page, per_page=per_page, error_out=False)
-        user_problems = [up.to_dict() for up in user_problems_query.items]
+        # Rows may be spread over several user shards, queried in parallel
+        with_notes = include_notes()
+        items, total = paginate_user_problems(page, per_page, include_notes=with_notes)
+        user_problems = [up.to_dict(rules=WITH_NOTES if with_notes else ()) for up in items]
 
-        return make_response({
+        return encode_response(request, {
             'user_problems': user_problems,
             'page': page,
             'per_page': per_page,
-            'total': user_problems_query.total,
-            'pages': user_problems_query.pages
+            'total': total,
+            'pages': math.ceil(total / per_page)
         }, 200)
 
     def post(self):
@@ -54,37 +68,20 @@ class UserProblems(Resource):
             if not current_user:
                 return make_response({'error': 'Authentication required'}, 401)
 
-            # Validate required fields
-            required_fields = ['problem_id', 'date_attempted', 'status']
-            for field in required_fields:
-                if not request_json.get(field):
-                    return make_response({'error': f'Missing required field: {field}'}, 400)
+            # Validate required fields, date format, status, num_attempts and notes length
+            error = USER_PROBLEM_CREATE.validate(request_json)
+            if error:
+                return make_response({'error': error}, 400)
 
             # Use authenticated user's ID (prevent users from creating attempts for others)
             user_id = current_user.id
-            problem_id = request_json.get('problem_id')
+            # An int, or its decimal string as a form <select> sends it
+            problem_id = int(request_json['problem_id'])
             date_attempted = request_json.get('date_attempted')
             status = request_json.get('status')
             notes = request_json.get('notes', '')
             num_attempts = request_json.get('num_attempts', 1)
 
-            # Validate date format
-            if not validate_date_format(date_attempted):
-                return make_response({'error': 'Invalid date format. Use ISO 8601 format (e.g., 2024-01-15T10:30:00)'}, 400)
-
-            # Validate status
-            valid_statuses = ['Completed', 'Attempted', 'Skipped']
-            if status not in valid_statuses:
-                return make_response({'error': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'}, 400)
-
-            # Validate num_attempts is positive
-            if not isinstance(num_attempts, int) or num_attempts < 1:
-                return make_response({'error': 'num_attempts must be a positive integer'}, 400)
-
-            # Validate notes length (prevent abuse)
-            if len(notes) > 10000:
-                return make_response({'error': 'Notes cannot exceed 10,000 characters'}, 400)
-
             # Check if problem exists
             problem = Problem.query.get(problem_id)
             if not problem:
@@ -99,21 +96,27 @@ class UserProblems(Resource):
             if existing:
                 return make_response({'error': 'You already have an attempt for this problem. Use PATCH to update.'}, 400)
 
-            # Create new user-problem attempt
+            # Create the summary row and log the first attempt event
             user_problem = UserProblem(
                 user_id=user_id,
                 problem_id=problem_id,
-                date_attempted=date_attempted,
-                status=status,
-                notes=notes,
-                num_attempts=num_attempts
+                notes=notes
             )
+            record_attempt(user_problem, date_attempted, status, num_attempts)
+            schedule_review(user_problem)
+            record_note_revision(user_id, problem_id, None, notes)
 
             # Add to database
             db.session.add(user_problem)
-            db.session.commit()
+            stamp_change(user_problem)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Race condition: a concurrent request created the same attempt
+                db.session.rollback()
+                return make_response({'error': 'You already have an attempt for this problem. Use PATCH to update.'}, 400)
 
-            return make_response(user_problem.to_dict(), 201)
+            return encode_response(request, user_problem.to_dict(rules=WITH_NOTES), 201)
         except Exception as e:
             db.session.rollback()
             # Don't expose internal error details
@@ -122,6 +125,80 @@ class UserProblems(Resource):
 api.add_resource(UserProblems, '/api/user-problems')
 
 
+# Resource for adding several attempts in one request
+@require_auth_for_method({'post': login_required})
+class UserProblemsBatch(Resource):
+    def post(self):
+        """Create user-problem attempts for several problems, all or none"""
+        try:
+            request_json = request.get_json()
+            current_user = get_current_user()
+
+            if not current_user:
+                return make_response({'error': 'Authentication required'}, 401)
+
+            items = request_json.get('user_problems') if isinstance(request_json, dict) else None
+            if not isinstance(items, list) or not items:
+                return make_response({'error': 'Missing required field: user_problems'}, 400)
+            if len(items) > BATCH_MAX_ITEMS:
+                return make_response({'error': f'A batch cannot exceed {BATCH_MAX_ITEMS} items'}, 400)
+
+            # Same checks as a single create; the first failing item is reported
+            for index, item in enumerate(items):
+                error = USER_PROBLEM_CREATE.validate(item)
+                if error:
+                    return make_response({'error': error, 'index': index}, 400)
+
+            user_id = current_user.id
+            problem_ids = [int(item['problem_id']) for item in items]
+            if len(set(problem_ids)) != len(problem_ids):
+                return make_response({'error': 'Each problem can only appear once in a batch'}, 400)
+
+            known = set(db.session.execute(
+                db.select(Problem.id).where(Problem.id.in_(problem_ids))
+            ).scalars())
+            existing = set(db.session.execute(
+                db.select(UserProblem.problem_id).where(
+                    UserProblem.user_id == user_id,
+                    UserProblem.problem_id.in_(problem_ids)
+                )
+            ).scalars())
+            for index, problem_id in enumerate(problem_ids):
+                if problem_id not in known:
+                    return make_response({'error': 'Problem not found', 'index': index}, 404)
+                if problem_id in existing:
+                    return make_response({'error': 'You already have an attempt for this problem. Use PATCH to update.', 'index': index}, 400)
+
+            user_problems = []
+            for item, problem_id in zip(items, problem_ids):
+                user_problem = UserProblem(
+                    user_id=user_id,
+                    problem_id=problem_id,
+                    notes=item.get('notes', '')
+                )
+                record_attempt(user_problem, item['date_attempted'], item['status'], item.get('num_attempts', 1))
+                schedule_review(user_problem)
+                record_note_revision(user_id, problem_id, None, user_problem.notes)
+                db.session.add(user_problem)
+                stamp_change(user_problem)
+                user_problems.append(user_problem)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Race condition: a concurrent request created one of the attempts
+                db.session.rollback()
+                return make_response({'error': 'You already have an attempt for one of these problems. Use PATCH to update.'}, 400)
+
+            rules = WITH_NOTES if include_notes() else ()
+            return encode_response(request, {'user_problems': [up.to_dict(rules=rules) for up in user_problems]}, 201)
+        except Exception as e:
+            db.session.rollback()
+            # Don't expose internal error details
+            return make_response({'error': 'Failed to create user-problem attempts'}, 500)
+
+api.add_resource(UserProblemsBatch, '/api/user-problems/batch')
+
+
 # Helper function to check user ownership
 def check_user_problem_access(user_id):
     """Check if current user can access the specified user's problems"""
@@ -148,8 +225,12 @@ class UserProblemsByUser(Resource):
         if not user:
             return make_response({'error': 'User not found'}, 404)
 
-        user_problems = [up.to_dict() for up in user.user_problems]
-        return make_response(user_problems, 200)
+        if include_notes():
+            query = UserProblem.query.filter_by(user_id=user_id).options(db.undefer(UserProblem.notes_compressed))
+            user_problems = [up.to_dict(rules=WITH_NOTES) for up in query]
+        else:
+            user_problems = [up.to_dict() for up in user.user_problems]
+        return encode_response(request, user_problems)
 
 api.add_resource(UserProblemsByUser, '/api/users/<int:user_id>/problems')
 
@@ -171,7 +252,7 @@ class UserProblemResource(Resource):
         if not user_problem:
             return make_response({'error': 'User-problem attempt not found'}, 404)
 
-        return make_response(user_problem.to_dict(), 200)
+        return make_response(user_problem.to_dict(rules=WITH_NOTES), 200)
 
     def patch(self, user_id, problem_id):
         """Update a specific user-problem attempt"""
@@ -190,35 +271,30 @@ class UserProblemResource(Resource):
 
             request_json = request.get_json()
 
-            # Define allowed fields for update
-            allowed_fields = ['date_attempted', 'status', 'notes', 'num_attempts']
-
             # Validate inputs before updating
-            if 'date_attempted' in request_json:
-                if not validate_date_format(request_json['date_attempted']):
-                    return make_response({'error': 'Invalid date format. Use ISO 8601 format'}, 400)
-
-            if 'status' in request_json:
-                valid_statuses = ['Completed', 'Attempted', 'Skipped']
-                if request_json['status'] not in valid_statuses:
-                    return make_response({'error': f'Invalid status. Must be one of: {", ".join(valid_statuses)}'}, 400)
-
-            if 'num_attempts' in request_json:
-                if not isinstance(request_json['num_attempts'], int) or request_json['num_attempts'] < 1:
-                    return make_response({'error': 'num_attempts must be a positive integer'}, 400)
+            error = USER_PROBLEM_UPDATE.validate(request_json)
+            if error:
+                return make_response({'error': error}, 400)
 
             if 'notes' in request_json:
-                if len(request_json['notes']) > 10000:
-                    return make_response({'error': 'Notes cannot exceed 10,000 characters'}, 400)
-
-            # Update the user-problem with new values from the request
-            for key in request_json:
-                if key in allowed_fields:
-                    setattr(user_problem, key, request_json[key])
-
+                record_note_revision(user_id, problem_id, user_problem.notes, request_json['notes'])
+                user_problem.notes = request_json['notes']
+
+            # Attempt fields are appended to the event log and folded into the summary;
+            # a new attempt outcome advances the spaced-repetition schedule
+            if any(key in request_json for key in ('date_attempted', 'status', 'num_attempts')):
+                record_attempt(
+                    user_problem,
+                    request_json.get('date_attempted', user_problem.date_attempted),
+                    request_json.get('status', user_problem.status),
+                    request_json.get('num_attempts', user_problem.num_attempts or 1)
+                )
+                schedule_review(user_problem)
+
+            stamp_change(user_problem)
             db.session.commit()
 
-            return make_response(user_problem.to_dict(), 200)
+            return make_response(user_problem.to_dict(rules=WITH_NOTES), 200)
         except Exception as e:
             db.session.rollback()
             # Don't expose internal error details
@@ -240,6 +316,10 @@ class UserProblemResource(Resource):
                 return make_response({'error': 'User-problem attempt not found'}, 404)
 
             db.session.delete(user_problem)
+            delete_attempts(user_id, problem_id)
+            delete_note_revisions(user_id, problem_id)
+            update_problem_stats(problem_id, before=(user_problem.status, user_problem.num_attempts))
+            record_tombstone('user_problem', problem_id, user_id)
             db.session.commit()
 
             return make_response({'message': 'User-problem attempt deleted successfully'}, 200)
@@ -249,3 +329,44 @@ class UserProblemResource(Resource):
             return make_response({'error': 'Failed to delete user-problem attempt'}, 500)
 
 api.add_resource(UserProblemResource, '/api/users/<int:user_id>/problems/<int:problem_id>')
+
+
+# Resource for logging one more try at a problem without reading it first
+@require_auth_for_method({'post': login_required})
+class UserProblemAttempts(Resource):
+    def post(self, user_id, problem_id):
+        """
+        Add one to a user-problem's num_attempts, creating it on the first try
+        Optional body: status (default: unchanged, Attempted on the first try)
+        and date_attempted (default now)
+        """
+        allowed, error_response = check_user_problem_access(user_id)
+        if not allowed:
+            return error_response
+
+        try:
+            request_json = request.get_json(silent=True) or {}
+
+            error = USER_PROBLEM_ATTEMPT.validate(request_json)
+            if error:
+                return make_response({'error': error}, 400)
+
+            if not db.session.get(Problem, problem_id):
+                return make_response({'error': 'Problem not found'}, 404)
+
+            user_problem = increment_attempt(
+                user_id,
+                problem_id,
+                request_json.get('date_attempted') or utcnow().isoformat(),
+                request_json.get('status')
+            )
+            db.session.commit()
+
+            status = 201 if user_problem.num_attempts == 1 else 200
+            return make_response(user_problem.to_dict(rules=('-user', '-problem') + WITH_NOTES), status)
+        except Exception as e:
+            db.session.rollback()
+            # Don't expose internal error details
+            return make_response({'error': 'Failed to record attempt'}, 500)
+
+api.add_resource(UserProblemAttempts, '/api/users/<int:user_id>/problems/<int:problem_id>/attempts')
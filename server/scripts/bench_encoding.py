@@ -0,0 +1,108 @@
+"""
+Encoding benchmark: bytes and CPU time per list response
+
+Compares flask_restful's stdlib JSON output with the negotiated encodings
+(orjson JSON, MessagePack, each optionally gzip/brotli compressed) on
+payloads shaped like the Problems and UserProblemsByUser list responses.
+Run from server/:
+
+    python scripts/bench_encoding.py [--rows 100] [--iterations 200]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from encoding import (  # noqa: E402
+    dumps_json, dumps_msgpack, compress, msgpack, orjson,
+    available_encodings, JSON_MIMETYPE, MSGPACK_MIMETYPE
+)
+
+DIFFICULTIES = ['Easy', 'Medium', 'Hard']
+CATEGORIES = ['Array', 'String', 'Tree', 'Graph', 'Dynamic Programming', 'Binary Search']
+STATUSES = ['Solved', 'Attempted', 'Not Started']
+
+
+def user_problem(user_id, problem_id):
+    return {
+        'id': user_id * 10000 + problem_id,
+        'user_id': user_id,
+        'problem_id': problem_id,
+        'date_attempted': '2024-01-15T10:30:00',
+        'status': STATUSES[problem_id % len(STATUSES)],
+        'notes': 'Two pointers from both ends, watch for duplicates. ' * (problem_id % 4),
+        'num_attempts': 1 + problem_id % 5,
+        'ease_factor': 2.5,
+        'review_interval': problem_id % 30,
+        'review_repetitions': problem_id % 6,
+        'due_at': '2024-02-01T10:30:00',
+        'change_seq': problem_id,
+    }
+
+
+def problem(problem_id):
+    return {
+        'id': problem_id,
+        'problem_name': f'Problem {problem_id}',
+        'problem_link': f'https://leetcode.com/problems/problem-{problem_id}/',
+        'difficulty': DIFFICULTIES[problem_id % len(DIFFICULTIES)],
+        'category': CATEGORIES[problem_id % len(CATEGORIES)],
+        'change_seq': problem_id,
+        'user_problems': [user_problem(user_id, problem_id) for user_id in range(1, 1 + problem_id % 4)],
+    }
+
+
+def payloads(rows):
+    return {
+        'problems page': {
+            'problems': [problem(i) for i in range(1, rows + 1)],
+            'page': 1, 'per_page': rows, 'total': rows * 10, 'pages': 10,
+        },
+        'user problems': [user_problem(1, i) for i in range(1, rows + 1)],
+    }
+
+
+def stdlib_json(data):
+    """What flask_restful's output_json produces"""
+    return (json.dumps(data) + '\n').encode('utf-8')
+
+
+def encoders():
+    result = [('stdlib json', stdlib_json)]
+    result.append(('orjson json' if orjson is not None else 'compact json', dumps_json))
+    if msgpack is not None:
+        result.append(('msgpack', dumps_msgpack))
+    return result
+
+
+def measure(fn, iterations):
+    """CPU microseconds per call"""
+    start = time.process_time()
+    for _ in range(iterations):
+        result = fn()
+    return result, (time.process_time() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f'formats: {JSON_MIMETYPE}' + (f', {MSGPACK_MIMETYPE}' if msgpack is not None else ''))
+    for name, data in payloads(args.rows).items():
+        print(f'\n{name} ({args.rows} rows)')
+        print(f'{"encoding":<28}{"bytes":>10}{"cpu us":>10}')
+        for label, encode in encoders():
+            body, encode_us = measure(lambda: encode(data), args.iterations)
+            print(f'{label:<28}{len(body):>10}{encode_us:>10.0f}')
+            for encoding in available_encodings():
+                compressed, compress_us = measure(lambda: compress(body, encoding), args.iterations)
+                print(f'{f"{label} + {encoding}":<28}{len(compressed):>10}{encode_us + compress_us:>10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Startup benchmark: cold import, app creation and first request time
+
+Each sample runs in a fresh interpreter so nothing is warm. Run from server/:
+
+    python scripts/bench_startup.py [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import subprocess
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+# Modules that should stay off the startup path
+HEAVY_MODULES = ['authlib', 'requests', 'numpy']
+
+PROBE = '''
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app()
+t2 = time.perf_counter()
+client = app.test_client()
+client.get('/api/authorized')
+t3 = time.perf_counter()
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'create_app_ms': (t2 - t1) * 1000,
+    'first_request_ms': (t3 - t2) * 1000,
+    'heavy_loaded': [m for m in %r if m in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+def run_probe():
+    env = dict(os.environ)
+    env.setdefault('FLASK_SECRET_KEY', 'benchmark')
+    env.setdefault('DATABASE_URI', 'sqlite://')
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE], cwd=SERVER_DIR, env=env,
+        check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    samples = [run_probe() for _ in range(args.runs)]
+
+    print(f'{"metric":<18}{"median":>10}{"min":>10}{"max":>10}  (ms, {args.runs} runs)')
+    for metric in ('import_ms', 'create_app_ms', 'first_request_ms', 'process_ms'):
+        values = [s[metric] for s in samples]
+        print(f'{metric:<18}{statistics.median(values):>10.1f}{min(values):>10.1f}{max(values):>10.1f}')
+
+    loaded = sorted({m for s in samples for m in s['heavy_loaded']})
+    print(f'heavy modules loaded at startup: {", ".join(loaded) if loaded else "none"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+"""
+Validation benchmark: declarative schemas against the hand-written checks they replaced
+
+First checks that both produce the same error for every payload in a corpus
+of valid and invalid requests, then times them per payload. Run from server/:
+
+    python scripts/bench_validation.py [--iterations 20000]
+"""
+import argparse
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from validation import (  # noqa: E402
+    PROBLEM_CREATE, USER_PROBLEM_CREATE, USER_PROBLEM_UPDATE, REGISTRATION, password_error
+)
+
+
+# The previous, hand-written validation, as it was in the route handlers
+
+def legacy_validate_date_format(date_string):
+    try:
+        return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+
+
+def legacy_password(password):
+    if len(password) < 8:
+        return 'Password must be at least 8 characters long'
+    if len(password) > 128:
+        return 'Password cannot exceed 128 characters'
+    if not re.search(r'[A-Z]', password):
+        return 'Password must contain at least one uppercase letter'
+    if not re.search(r'[a-z]', password):
+        return 'Password must contain at least one lowercase letter'
+    if not re.search(r'\d', password):
+        return 'Password must contain at least one number'
+    if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
+        return 'Password must contain at least one special character (!@#$%^&*(),.?":{}|<>)'
+    common_passwords = ['Password123!', 'Welcome123!', 'Qwerty123!', 'Admin123!']
+    if password in common_passwords:
+        return 'This password is too common. Please choose a stronger password'
+    return None
+
+
+def legacy_problem_create(request_json):
+    for field in ['problem_name', 'problem_link', 'difficulty', 'category']:
+        if not request_json.get(field):
+            return f'Missing required field: {field}'
+    return None
+
+
+def legacy_user_problem_create(request_json):
+    for field in ['problem_id', 'date_attempted', 'status']:
+        if not request_json.get(field):
+            return f'Missing required field: {field}'
+    date_attempted = request_json.get('date_attempted')
+    status = request_json.get('status')
+    notes = request_json.get('notes', '')
+    num_attempts = request_json.get('num_attempts', 1)
+    if not legacy_validate_date_format(date_attempted):
+        return 'Invalid date format. Use ISO 8601 format (e.g., 2024-01-15T10:30:00)'
+    valid_statuses = ['Completed', 'Attempted', 'Skipped']
+    if status not in valid_statuses:
+        return f'Invalid status. Must be one of: {", ".join(valid_statuses)}'
+    if not isinstance(num_attempts, int) or num_attempts < 1:
+        return 'num_attempts must be a positive integer'
+    if len(notes) > 10000:
+        return 'Notes cannot exceed 10,000 characters'
+    return None
+
+
+def legacy_user_problem_update(request_json):
+    if 'date_attempted' in request_json:
+        if not legacy_validate_date_format(request_json['date_attempted']):
+            return 'Invalid date format. Use ISO 8601 format'
+    if 'status' in request_json:
+        valid_statuses = ['Completed', 'Attempted', 'Skipped']
+        if request_json['status'] not in valid_statuses:
+            return f'Invalid status. Must be one of: {", ".join(valid_statuses)}'
+    if 'num_attempts' in request_json:
+        if not isinstance(request_json['num_attempts'], int) or request_json['num_attempts'] < 1:
+            return 'num_attempts must be a positive integer'
+    if 'notes' in request_json:
+        if len(request_json['notes']) > 10000:
+            return 'Notes cannot exceed 10,000 characters'
+    return None
+
+
+def legacy_registration(data):
+    if not data.get('email') or not data.get('password') or not data.get('user_name'):
+        return 'Email, password, and user_name are required'
+    email = data['email'].strip().lower()
+    if not re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', email):
+        return 'Invalid email format'
+    return legacy_password(data['password'])
+
+
+ATTEMPT = {'problem_id': 3, 'date_attempted': '2024-01-15T10:30:00Z', 'status': 'Completed',
+           'num_attempts': 2, 'notes': 'Sliding window, shrink from the left. ' * 20}
+
+CASES = {
+    'problem create': (legacy_problem_create, PROBLEM_CREATE.validate, [
+        {'problem_name': 'Two Sum', 'problem_link': 'https://leetcode.com/problems/two-sum/',
+         'difficulty': 'Easy', 'category': 'Arrays'},
+        {'problem_name': 'Two Sum', 'difficulty': 'Easy'},
+        {'problem_name': '', 'problem_link': 'x', 'difficulty': 'Easy', 'category': 'Arrays'},
+    ]),
+    'attempt create': (legacy_user_problem_create, USER_PROBLEM_CREATE.validate, [
+        ATTEMPT,
+        {**ATTEMPT, 'status': None},
+        {**ATTEMPT, 'date_attempted': 'yesterday', 'status': None},
+        {**ATTEMPT, 'date_attempted': 'yesterday'},
+        {**ATTEMPT, 'status': 'Done'},
+        {**ATTEMPT, 'num_attempts': 0},
+        {**ATTEMPT, 'num_attempts': '2'},
+        {**ATTEMPT, 'notes': 'x' * 10001},
+        {key: value for key, value in ATTEMPT.items() if key not in ('notes', 'num_attempts')},
+    ]),
+    'attempt update': (legacy_user_problem_update, USER_PROBLEM_UPDATE.validate, [
+        {'status': 'Attempted', 'num_attempts': 3},
+        {'notes': 'Revisit the recurrence.'},
+        {'date_attempted': None},
+        {'status': 'Done', 'num_attempts': 0},
+        {'num_attempts': -1, 'notes': 'x' * 10001},
+        {},
+    ]),
+    'registration': (legacy_registration, REGISTRATION.validate, [
+        {'email': ' Ada@Example.com ', 'password': 'Str0ng!Pass', 'user_name': 'ada'},
+        {'email': 'ada@example.com', 'password': 'Str0ng!Pass'},
+        {'email': 'not-an-email', 'password': 'short', 'user_name': 'ada'},
+        {'email': 'ada@example.com', 'password': 'short', 'user_name': 'ada'},
+        {'email': 'ada@example.com', 'password': 'alllowercase1!', 'user_name': 'ada'},
+        {'email': 'ada@example.com', 'password': 'ALLUPPERCASE1!', 'user_name': 'ada'},
+        {'email': 'ada@example.com', 'password': 'NoDigits!!', 'user_name': 'ada'},
+        {'email': 'ada@example.com', 'password': 'Unicode٣Digit!', 'user_name': 'ada'},
+        {'email': 'ada@example.com', 'password': 'NoSpecial123', 'user_name': 'ada'},
+        {'email': 'ada@example.com', 'password': 'Welcome123!', 'user_name': 'ada'},
+        {'email': 'ada@example.com', 'password': 'A1!' + 'a' * 200, 'user_name': 'ada'},
+    ]),
+}
+
+PASSWORDS = ['Str0ng!Pass', 'short', 'alllowercase1!', 'NoSpecial123', 'Correct-Horse-Battery-Staple-9' * 4]
+
+
+def check_equivalence():
+    mismatches = 0
+    for label, (legacy, schema, payloads) in CASES.items():
+        for payload in payloads:
+            expected, actual = legacy(payload), schema(payload)
+            if expected != actual:
+                mismatches += 1
+                print(f'MISMATCH {label}: {payload!r}\n  legacy:   {expected!r}\n  schema:   {actual!r}')
+    for password in PASSWORDS:
+        if legacy_password(password) != password_error(password):
+            mismatches += 1
+            print(f'MISMATCH password: {password!r}')
+    return mismatches
+
+
+def time_per_call(fn, payloads, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for payload in payloads:
+            fn(payload)
+    return (time.perf_counter() - start) / (iterations * len(payloads)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    mismatches = check_equivalence()
+    print(f'error messages: {"identical" if not mismatches else f"{mismatches} mismatches"}\n')
+
+    print(f'{"validator":<18}{"legacy us":>12}{"schema us":>14}{"speedup":>10}')
+    rows = [(label, legacy, schema, payloads) for label, (legacy, schema, payloads) in CASES.items()]
+    rows.append(('password', legacy_password, password_error, PASSWORDS))
+    for label, legacy, schema, payloads in rows:
+        legacy_us = time_per_call(legacy, payloads, args.iterations)
+        schema_us = time_per_call(schema, payloads, args.iterations)
+        print(f'{label:<18}{legacy_us:>12.2f}{schema_us:>14.2f}{legacy_us / schema_us:>9.2f}x')
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""
+Local stub OIDC provider for exercising the OAuth client without Google
+
+Serves a discovery document, an empty JWKS and a revocation endpoint that
+logs the tokens it receives. Point the server at it with:
+
+    GOOGLE_DISCOVERY_URL=http://127.0.0.1:9000/.well-known/openid-configuration
+    GOOGLE_REVOKE_URL=http://127.0.0.1:9000/revoke
+
+Use --delay to simulate a slow provider (timeouts, stale cache fallback).
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def make_handler(base_url, delay):
+    discovery = {
+        'issuer': base_url,
+        'authorization_endpoint': f'{base_url}/authorize',
+        'token_endpoint': f'{base_url}/token',
+        'userinfo_endpoint': f'{base_url}/userinfo',
+        'revocation_endpoint': f'{base_url}/revoke',
+        'jwks_uri': f'{base_url}/jwks',
+        'response_types_supported': ['code'],
+        'subject_types_supported': ['public'],
+        'id_token_signing_alg_values_supported': ['RS256'],
+    }
+
+    class StubOIDCHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            time.sleep(delay)
+            path = urlparse(self.path).path
+            if path == '/.well-known/openid-configuration':
+                self._send_json(200, discovery)
+            elif path == '/jwks':
+                self._send_json(200, {'keys': []})
+            else:
+                self._send_json(404, {'error': 'not_found'})
+
+        def do_POST(self):
+            time.sleep(delay)
+            url = urlparse(self.path)
+            if url.path == '/revoke':
+                token = parse_qs(url.query).get('token', [''])[0]
+                print(f'revoked token {token[:8]}...')
+                self._send_json(200, {})
+            else:
+                self._send_json(404, {'error': 'not_found'})
+
+    return StubOIDCHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stub OIDC provider')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before each response')
+    args = parser.parse_args()
+
+    base_url = f'http://{args.host}:{args.port}'
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(base_url, args.delay))
+    print(f'Stub OIDC provider at {base_url}/.well-known/openid-configuration')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
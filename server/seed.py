@@ -1,14 +1,23 @@
-from config import app, db
-from models.models import User, Problem, UserProblem
+from app import create_app
+from config import db
+from models.models import User, Problem, UserProblem, AttemptEvent, NoteRevision, Tag
+from changes import stamp_change
+from tags import set_problem_tags
+from attempts import append_attempt
+from review import parse_review_time
 from datetime import datetime
 
+app = create_app()
 
 with app.app_context():
     # Clear existing data to avoid duplicates
+    AttemptEvent.query.delete()
+    NoteRevision.query.delete()
     UserProblem.query.delete()
     db.session.commit()
 
     Problem.query.delete()
+    Tag.query.delete()
     db.session.commit()
 
     User.query.delete()
@@ -61,6 +70,7 @@ with app.app_context():
         difficulty = "Easy",
         category = "Arrays"
     )
+    set_problem_tags(problem1, ["Arrays", "Hash Table"])
     problems.append(problem1)
 
     problem2 = Problem(
@@ -69,6 +79,7 @@ with app.app_context():
         difficulty = "Medium",
         category = "Linked Lists"
     )
+    set_problem_tags(problem2, ["Linked Lists", "Math", "Recursion"])
     problems.append(problem2)
 
     problem3 = Problem(
@@ -77,9 +88,11 @@ with app.app_context():
         difficulty = "Medium",
         category = "Strings"
     )
+    set_problem_tags(problem3, ["Strings", "Hash Table", "Sliding Window"])
     problems.append(problem3)
 
     db.session.add_all(problems)
+    stamp_change(*problems)
     db.session.commit()
 
     # Create user-problem attempts (user-specific data)
@@ -128,6 +141,9 @@ with app.app_context():
     user_problems.append(up4)
 
     db.session.add_all(user_problems)
+    for up in user_problems:
+        append_attempt(up.user_id, up.problem_id, parse_review_time(up.date_attempted), up.status, up.num_attempts)
+    stamp_change(*user_problems)
     db.session.commit()
 
     print("Seeding completed!")
@@ -0,0 +1,516 @@
+"""
+Optional per-user sharding of user_problems across several databases
+
+With USER_SHARD_URIS unset, user_problems lives in the main database and
+nothing here changes how sessions behave. Listing one or more database URIs
+there (several SQLite files locally, several Postgres instances in
+production) adds one bind per database, named user_shard_<n>, and swaps
+db.session for a sharded session that routes user_problems by user_id:
+
+- every user's rows live on exactly one shard, recorded in the user_shards
+  directory table of the main database. A user without an entry is pinned
+  to user_id % N on their first write, so adding shards later only changes
+  where new users go. `flask shards init` pins users whose rows predate
+  sharding to the main database
+- ORM statements that filter on user_id, and lazy loads of
+  User.user_problems, go to that user's shard; other user_problems
+  statements run on every shard and their results are concatenated.
+  Everything else goes to the main database
+- admin-wide reads call fan_out(), which queries every shard in parallel
+
+Directory entries are cached per process for SHARD_DIRECTORY_TTL seconds.
+`flask shards move` relocates users while the app keeps serving them: copy
+their rows, catch up on rows written meanwhile (by change_seq), flip the
+directory entry, wait out the cache TTL, catch up once more, replay deletes
+from the tombstones, then delete the source rows.
+
+Shards hold no foreign keys to users or problems, which live in the main
+database, so parent deletes remove their user_problems rows explicitly.
+A transaction writing to the main database and a shard commits on each in
+turn, not atomically.
+"""
+import heapq
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import inspect
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+
+from config import db
+from models.models import User, UserProblem, UserShard, Tombstone
+from changes import current_change_seq
+
+MAIN_SHARD = 'main'
+SHARD_BIND_PREFIX = 'user_shard_'
+
+# Seconds a process keeps routing by a cached directory entry
+DIRECTORY_TTL = float(os.getenv('SHARD_DIRECTORY_TTL', '5'))
+
+# Threads used to query shards in parallel
+FAN_OUT_WORKERS = int(os.getenv('SHARD_FAN_OUT_WORKERS', '8'))
+
+# Catch-up passes made before a moved user's directory entry is flipped
+MOVE_CATCH_UP_ROUNDS = 5
+
+
+def shard_ids():
+    """Bind keys of the configured user shards, in order (empty when sharding is off)"""
+    keys = [key for key in db.engines if key and key.startswith(SHARD_BIND_PREFIX)]
+    return sorted(keys, key=lambda key: int(key[len(SHARD_BIND_PREFIX):]))
+
+
+def sharding_enabled():
+    return bool(shard_ids())
+
+
+def all_shards():
+    """Every database that can hold user_problems rows"""
+    return [MAIN_SHARD] + shard_ids()
+
+
+def engine_for(shard_id):
+    return db.engines[None if shard_id == MAIN_SHARD else shard_id]
+
+
+def default_shard(user_id):
+    """Where a user without a directory entry is placed"""
+    shards = shard_ids()
+    return shards[user_id % len(shards)] if shards else MAIN_SHARD
+
+
+# Per-process directory cache: user_id -> (shard_id, pinned, expires_at)
+_directory = {}
+
+
+def shard_for_user(user_id, pin=False):
+    """
+    The shard holding a user's user_problems rows
+    With pin=True a user without a directory entry is given one, inside the
+    current transaction
+    """
+    if not sharding_enabled():
+        return MAIN_SHARD
+
+    now = time.monotonic()
+    cached = _directory.get(user_id)
+    if cached is not None and cached[2] > now and (cached[1] or not pin):
+        return cached[0]
+
+    # Read through the session's own connection, so a pin made by an
+    # in-flight write is visible to it and rolled back with it
+    connection = db.session.connection(bind_arguments={'shard_id': MAIN_SHARD})
+    shard_id = connection.execute(
+        db.select(UserShard.shard).where(UserShard.user_id == user_id)
+    ).scalar_one_or_none()
+    pinned = shard_id is not None
+    if not pinned:
+        shard_id = default_shard(user_id)
+        if pin:
+            _pin(connection, user_id, shard_id)
+            pinned = True
+
+    _directory[user_id] = (shard_id, pinned, now + DIRECTORY_TTL)
+    return shard_id
+
+
+def _pin(connection, user_id, shard_id):
+    """Insert a directory entry unless a concurrent writer already has"""
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        connection.execute(db.insert(UserShard).values(user_id=user_id, shard=shard_id))
+        return
+    connection.execute(
+        insert(UserShard).values(user_id=user_id, shard=shard_id).on_conflict_do_nothing()
+    )
+
+
+def _user_ids(statement):
+    """The user_ids a statement's WHERE clause restricts user_problems to, or None"""
+    where = getattr(statement, 'whereclause', None)
+    if where is None:
+        return None
+
+    column = UserProblem.__table__.c.user_id
+    if isinstance(where, BooleanClauseList) and where.operator is operators.and_:
+        clauses = where.clauses
+    else:
+        clauses = [where]
+
+    for clause in clauses:
+        if not (isinstance(clause, BinaryExpression)
+                and isinstance(clause.right, BindParameter)
+                and column in getattr(clause.left, 'proxy_set', ())):
+            continue
+        value = clause.right.effective_value
+        if clause.operator is operators.eq and value is not None:
+            return [value]
+        if clause.operator is operators.in_op and value:
+            return list(value)
+    return None
+
+
+def choose_shard(mapper, instance, clause=None, **kw):
+    """Shard an object is flushed to"""
+    if isinstance(instance, UserProblem):
+        user_id = instance.user_id if instance.user_id is not None else instance.user.id
+        return shard_for_user(user_id, pin=True)
+    return MAIN_SHARD
+
+
+def choose_identity_shards(mapper, primary_key, **kw):
+    """Shards that may hold the object with this primary key"""
+    if mapper.class_ is UserProblem:
+        return [shard_for_user(primary_key[0])]
+    return [MAIN_SHARD]
+
+
+def choose_execute_shards(orm_context):
+    """Shards an ORM statement runs on"""
+    if orm_context.is_select:
+        mappers = orm_context.all_mappers
+    else:
+        mappers = [orm_context.bind_mapper]
+    if not any(mapper is not None and mapper.class_ is UserProblem for mapper in mappers):
+        return [MAIN_SHARD]
+
+    if orm_context.is_select:
+        loaded_from = orm_context.lazy_loaded_from
+        if loaded_from is not None and loaded_from.class_ is User:
+            return [shard_for_user(loaded_from.obj().id)]
+
+    user_ids = _user_ids(orm_context.statement)
+    if user_ids:
+        return sorted({shard_for_user(user_id) for user_id in user_ids})
+    return all_shards()
+
+
+class ShardRoutingSession(ShardedSession, FlaskSession):
+    """db.session while sharding is enabled"""
+
+    def __init__(self, db, **kwargs):
+        shards = {shard_id: engine_for(shard_id) for shard_id in all_shards()}
+        super().__init__(
+            shard_chooser=choose_shard,
+            identity_chooser=choose_identity_shards,
+            execute_chooser=choose_execute_shards,
+            shards=shards,
+            db=db,
+            **kwargs
+        )
+
+    def get_bind(self, mapper=None, *, shard_id=None, instance=None, clause=None, **kw):
+        # Core statements and dialect checks that name no model use the main database
+        if shard_id is None and mapper is None and instance is None:
+            shard_id = MAIN_SHARD
+        return super().get_bind(mapper, shard_id=shard_id, instance=instance, clause=clause, **kw)
+
+
+def init_sharding(app):
+    """Route db.session by user when user shards are configured"""
+    with app.app_context():
+        if sharding_enabled():
+            db.session.session_factory.class_ = ShardRoutingSession
+
+
+def fan_out(fn, shards=None):
+    """
+    Call fn(connection) once per shard, in parallel threads
+    Returns: {shard_id: result}
+    """
+    shards = list(shards or all_shards())
+    engines = {shard_id: engine_for(shard_id) for shard_id in shards}
+
+    def run(shard_id):
+        with engines[shard_id].connect() as connection:
+            return fn(connection)
+
+    if len(shards) == 1:
+        return {shards[0]: run(shards[0])}
+    with ThreadPoolExecutor(max_workers=min(len(shards), FAN_OUT_WORKERS)) as pool:
+        return dict(zip(shards, pool.map(run, shards)))
+
+
+def paginate_user_problems(page, per_page, include_notes=False):
+    """
+    One page of all user_problems rows, ordered by (user_id, problem_id)
+    include_notes: also load compressed notes (see notes.py)
+
+    Every shard returns its first page * per_page keys and its row count in
+    parallel; the keys are merged and only the page's rows are loaded as
+    objects, from the shards holding them.
+    Returns: (UserProblem objects, total rows)
+    """
+    table = UserProblem.__table__
+    limit = page * per_page
+
+    def keys_and_count(connection):
+        keys = connection.execute(
+            db.select(table.c.user_id, table.c.problem_id)
+            .order_by(table.c.user_id, table.c.problem_id)
+            .limit(limit)
+        ).all()
+        count = connection.execute(db.select(db.func.count()).select_from(table)).scalar_one()
+        return [tuple(key) for key in keys], count
+
+    results = list(fan_out(keys_and_count).values())
+    total = sum(count for _, count in results)
+    page_keys = list(islice(heapq.merge(*(keys for keys, _ in results)), limit - per_page, limit))
+    if not page_keys:
+        return [], total
+
+    query = UserProblem.query.filter(
+        UserProblem.user_id.in_(sorted({user_id for user_id, _ in page_keys})),
+        db.tuple_(UserProblem.user_id, UserProblem.problem_id).in_(page_keys)
+    )
+    if include_notes:
+        query = query.options(db.undefer(UserProblem.notes_compressed))
+    loaded = {(up.user_id, up.problem_id): up for up in query}
+    return [loaded[key] for key in page_keys if key in loaded], total
+
+
+def update_user_problems(mappings):
+    """
+    Executemany UPDATE of user_problems rows by primary key, on whichever
+    shards hold them, in the current transaction
+
+    The ORM's bulk UPDATE isn't available on a sharded session, so this is a
+    Core UPDATE per shard. Mappings for rows that don't exist are ignored.
+    """
+    table = UserProblem.__table__
+    stmt = db.update(table).where(
+        table.c.user_id == db.bindparam('pk_user_id'),
+        table.c.problem_id == db.bindparam('pk_problem_id')
+    )
+    by_shard = {}
+    for mapping in mappings:
+        params = {key: value for key, value in mapping.items() if key not in ('user_id', 'problem_id')}
+        params.update(pk_user_id=mapping['user_id'], pk_problem_id=mapping['problem_id'])
+        by_shard.setdefault(shard_for_user(mapping['user_id']), []).append(params)
+
+    for shard_id, params in by_shard.items():
+        db.session.execute(stmt, params, bind_arguments={'shard_id': shard_id})
+
+
+def create_shard_schema(shard_id):
+    """
+    Create user_problems and its indexes on a shard, without the foreign keys
+    Returns: whether the table had to be created
+    """
+    table = UserProblem.__table__
+    with engine_for(shard_id).begin() as connection:
+        if inspect(connection).has_table(table.name):
+            return False
+        connection.execute(CreateTable(table, include_foreign_key_constraints=[]))
+        for index in table.indexes:
+            index.create(connection)
+    return True
+
+
+def pin_existing_users():
+    """
+    Pin users with rows in the main database's user_problems to it, so they
+    stay readable until moved
+    Returns: number of users pinned
+    """
+    unpinned = db.session.execute(
+        db.select(UserProblem.user_id).distinct()
+        .where(UserProblem.user_id.not_in(db.select(UserShard.user_id))),
+        bind_arguments={'shard_id': MAIN_SHARD}
+    ).scalars().all()
+    db.session.add_all(UserShard(user_id=user_id, shard=MAIN_SHARD) for user_id in unpinned)
+    db.session.commit()
+    return len(unpinned)
+
+
+def _user_rows(connection, user_id, since=None):
+    table = UserProblem.__table__
+    stmt = db.select(table).where(table.c.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(table.c.change_seq > since)
+    return [dict(row._mapping) for row in connection.execute(stmt)]
+
+
+def _copy_rows(connection, user_id, rows):
+    """
+    Write rows to a shard, keeping whichever copy has the newer change_seq
+    Returns: number of rows written
+    """
+    table = UserProblem.__table__
+    current = dict(connection.execute(
+        db.select(table.c.problem_id, table.c.change_seq).where(table.c.user_id == user_id)
+    ).all())
+
+    inserts, updates = [], []
+    for row in rows:
+        if row['problem_id'] not in current:
+            inserts.append(row)
+        elif (row['change_seq'] or 0) > (current[row['problem_id']] or 0):
+            updates.append(row)
+
+    if inserts:
+        connection.execute(db.insert(table), inserts)
+    for row in updates:
+        connection.execute(
+            db.update(table)
+            .where(table.c.user_id == user_id, table.c.problem_id == row['problem_id'])
+            .values(**row)
+        )
+    return len(inserts) + len(updates)
+
+
+def _catch_up(source, target, user_id, since):
+    with engine_for(source).connect() as connection:
+        rows = _user_rows(connection, user_id, since)
+    with engine_for(target).begin() as connection:
+        return _copy_rows(connection, user_id, rows)
+
+
+def _replay_deletes(target, user_id, since):
+    """Delete rows on the target whose deletion hit the source after the move began"""
+    deleted = db.session.execute(
+        db.select(Tombstone.problem_id, Tombstone.seq).where(
+            Tombstone.entity == 'user_problem',
+            Tombstone.user_id == user_id,
+            Tombstone.seq > since
+        )
+    ).all()
+    db.session.commit()
+
+    table = UserProblem.__table__
+    with engine_for(target).begin() as connection:
+        for problem_id, seq in deleted:
+            # A row recreated after the delete carries a later change_seq
+            connection.execute(db.delete(table).where(
+                table.c.user_id == user_id,
+                table.c.problem_id == problem_id,
+                db.or_(table.c.change_seq.is_(None), table.c.change_seq < seq)
+            ))
+
+
+def move_users(targets, grace=None, echo=lambda message: None):
+    """
+    Move users' user_problems rows to other shards while the app keeps
+    serving them
+    targets: {user_id: target shard}
+    Returns: number of users moved
+    """
+    unknown = set(targets.values()) - set(all_shards())
+    if unknown:
+        raise ValueError(f'Unknown shards: {", ".join(sorted(unknown))}')
+
+    sources = {}
+    for user_id, target in targets.items():
+        entry = db.session.get(UserShard, user_id)
+        source = entry.shard if entry else default_shard(user_id)
+        if source != target:
+            sources[user_id] = source
+    if not sources:
+        return 0
+
+    start_seq = current_change_seq()
+    db.session.commit()
+
+    # Copy, then keep catching up until a pass finds nothing new
+    for user_id, source in sources.items():
+        copied = _catch_up(source, targets[user_id], user_id, None)
+        for _ in range(MOVE_CATCH_UP_ROUNDS):
+            if not _catch_up(source, targets[user_id], user_id, start_seq):
+                break
+        echo(f'user {user_id}: copied {copied} rows from {source} to {targets[user_id]}')
+
+    # Route the users to their new shards
+    for user_id in sources:
+        entry = db.session.get(UserShard, user_id)
+        if entry is None:
+            db.session.add(UserShard(user_id=user_id, shard=targets[user_id]))
+        else:
+            entry.shard = targets[user_id]
+        _directory.pop(user_id, None)
+    db.session.commit()
+
+    # Other processes may write to the old shard until their cached entry expires
+    time.sleep(DIRECTORY_TTL + 1 if grace is None else grace)
+
+    for user_id, source in sources.items():
+        target = targets[user_id]
+        _catch_up(source, target, user_id, start_seq)
+        _replay_deletes(target, user_id, start_seq)
+        table = UserProblem.__table__
+        with engine_for(source).begin() as connection:
+            connection.execute(db.delete(table).where(table.c.user_id == user_id))
+    return len(sources)
+
+
+shards_cli = AppGroup('shards', help='Per-user sharding of user_problems.')
+
+
+@shards_cli.command('init')
+def init_command():
+    """Create user_problems on every shard and pin existing users to the main database"""
+    if not sharding_enabled():
+        raise click.ClickException('No shards configured; set USER_SHARD_URIS.')
+    for shard_id in shard_ids():
+        created = create_shard_schema(shard_id)
+        click.echo(f'{shard_id}: {"created user_problems" if created else "already initialized"}')
+    click.echo(f'Pinned {pin_existing_users()} existing users to {MAIN_SHARD}.')
+
+
+@shards_cli.command('move')
+@click.option('--user-id', type=int, required=True, multiple=True)
+@click.option('--to', 'target', required=True, help='Target shard, e.g. user_shard_1 or main')
+@click.option('--grace', type=float, default=None, help='Seconds to wait after routing flips')
+def move_command(user_id, target, grace):
+    """Move users to another shard online"""
+    try:
+        moved = move_users({uid: target for uid in user_id}, grace=grace, echo=click.echo)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Moved {moved} users to {target}.')
+
+
+@shards_cli.command('drain')
+@click.argument('source')
+@click.option('--grace', type=float, default=None, help='Seconds to wait after routing flips')
+def drain_command(source, grace):
+    """Move every user off a shard, to their default placement"""
+    shards = shard_ids()
+    if not shards or source not in all_shards():
+        raise click.ClickException(f'Unknown shard: {source}')
+
+    user_ids = db.session.execute(
+        db.select(UserShard.user_id).where(UserShard.shard == source)
+    ).scalars().all()
+    targets = {}
+    for user_id in user_ids:
+        target = default_shard(user_id)
+        if target == source:
+            if len(shards) == 1:
+                raise click.ClickException(f'No other shard to drain {source} into.')
+            target = shards[(shards.index(source) + 1) % len(shards)]
+        targets[user_id] = target
+    moved = move_users(targets, grace=grace, echo=click.echo)
+    click.echo(f'Moved {moved} users off {source}.')
+
+
+@shards_cli.command('status')
+def status_command():
+    """Show users and rows per shard"""
+    table = UserProblem.__table__
+    counts = fan_out(lambda connection: connection.execute(
+        db.select(db.func.count(db.distinct(table.c.user_id)), db.func.count())
+    ).one())
+    click.echo(f'{"shard":<16}{"users":>8}{"rows":>10}')
+    for shard_id, (users, rows) in counts.items():
+        click.echo(f'{shard_id:<16}{users:>8}{rows:>10}')
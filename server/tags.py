@@ -0,0 +1,83 @@
+"""
+Problem tags and tag filters
+
+Tags live in an association table whose primary key, (tag_id, problem_id),
+is a covering index: filtering never reads the problems table to decide
+membership. match=any is a semi-join on the union of the tags' index
+ranges; match=all groups those same ranges by problem and keeps problems
+found under every tag, so its cost grows with the postings of the
+requested tags, not with the catalog.
+"""
+from config import db
+from models.models import Problem, Tag, ProblemTag
+from sharding import MAIN_SHARD
+
+MATCH_MODES = ('all', 'any')
+
+
+def normalize_tag(name):
+    """'Two Pointers ' -> 'two-pointers'"""
+    return '-'.join(name.strip().lower().split())
+
+
+def parse_tags(value):
+    """Normalized, de-duplicated tag names from a comma-separated string"""
+    names = (normalize_tag(name) for name in value.split(','))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def _insert_missing(names):
+    """Create tags that don't exist yet, unless a concurrent writer just has"""
+    # A Core executemany on the main database: the sharded session (sharding.py) has no ORM bulk insert
+    table = Tag.__table__
+    bind_arguments = {'shard_id': MAIN_SHARD}
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for name in names:
+            db.session.execute(db.insert(table).values(name=name), bind_arguments=bind_arguments)
+        return
+    db.session.execute(
+        insert(table).on_conflict_do_nothing(index_elements=['name']),
+        [{'name': name} for name in names],
+        bind_arguments=bind_arguments
+    )
+
+
+def set_problem_tags(problem, names):
+    """Replace a problem's tags with names (normalized), creating new tags as needed"""
+    names = list(dict.fromkeys(filter(None, (normalize_tag(name) for name in names))))
+    tags = Tag.query.filter(Tag.name.in_(names)).all() if names else []
+    missing = set(names) - {tag.name for tag in tags}
+    if missing:
+        _insert_missing(sorted(missing))
+        tags = Tag.query.filter(Tag.name.in_(names)).all()
+    problem.tags = tags
+
+
+def filter_by_tags(query, names, match='all'):
+    """Restrict a Problem query to problems with all (or any) of the tag names"""
+    ids = db.session.execute(db.select(Tag.id).where(Tag.name.in_(names))).scalars().all()
+    if not ids or (match == 'all' and len(ids) < len(names)):
+        # An unknown tag can't be matched by any problem
+        return query.filter(db.false())
+
+    postings = db.select(ProblemTag.problem_id).where(ProblemTag.tag_id.in_(ids))
+    if match == 'all' and len(ids) > 1:
+        postings = postings.group_by(ProblemTag.problem_id).having(db.func.count() == len(ids))
+    return query.filter(Problem.id.in_(postings))
+
+
+def tag_counts():
+    """Every tag with its number of problems, most used first"""
+    count = db.func.count(ProblemTag.problem_id)
+    rows = db.session.execute(
+        db.select(Tag.name, count)
+        .outerjoin(ProblemTag, ProblemTag.tag_id == Tag.id)
+        .group_by(Tag.id, Tag.name)
+        .order_by(count.desc(), Tag.name)
+    ).all()
+    return [{'name': name, 'problem_count': problem_count} for name, problem_count in rows]
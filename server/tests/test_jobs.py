@@ -0,0 +1,92 @@
+"""Regression tests for retries and lease expiry of deduplicated jobs (jobs.py)"""
+from datetime import timedelta
+
+import pytest
+
+from app import create_app
+from config import db
+from models.models import Job
+import jobs
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.delenv('USER_SHARD_URIS', raising=False)
+    app = create_app({
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "jobs.db"}',
+        'TESTING': True,
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+@pytest.fixture
+def failing_handler(monkeypatch):
+    def fail():
+        raise RuntimeError('boom')
+    monkeypatch.setitem(jobs._handlers, 'test.dedupe', jobs.Handler(fail, None, jobs.PRIORITY_NORMAL, False))
+
+
+def statuses():
+    return [tuple(row) for row in db.session.execute(db.select(Job.id, Job.status).order_by(Job.id))]
+
+
+def claim_and_enqueue_again():
+    """A deduplicated job is claimed, then the same key is enqueued again"""
+    jobs.enqueue('test.dedupe', dedupe_key='test:dedupe')
+    db.session.commit()
+    job = jobs.claim_job('worker-1')
+    jobs.enqueue('test.dedupe', dedupe_key='test:dedupe')
+    db.session.commit()
+    return job
+
+
+def test_expired_lease_with_queued_twin_fails_instead_of_requeueing(app):
+    job = claim_and_enqueue_again()
+
+    later = jobs.utcnow() + timedelta(seconds=jobs.LEASE_SECONDS + 1)
+    jobs.requeue_expired(now=later)
+
+    assert statuses() == [(job.id, 'failed'), (job.id + 1, 'queued')]
+    # The next maintenance pass has nothing left to do
+    jobs.requeue_expired(now=later)
+
+
+def test_expired_leases_sharing_a_key_requeue_one(app):
+    first = claim_and_enqueue_again()
+    second = jobs.claim_job('worker-2')
+
+    jobs.requeue_expired(now=jobs.utcnow() + timedelta(seconds=jobs.LEASE_SECONDS + 1))
+
+    assert statuses() == [(first.id, 'queued'), (second.id, 'failed')]
+
+
+def test_retry_with_queued_twin_fails_instead_of_requeueing(app, failing_handler):
+    job = claim_and_enqueue_again()
+
+    assert jobs.run_job(job, 'worker-1') is False
+    assert statuses() == [(job.id, 'failed'), (job.id + 1, 'queued')]
+    assert 'not retried' in db.session.get(Job, job.id).last_error
+
+
+def test_retry_without_twin_requeues(app, failing_handler):
+    jobs.enqueue('test.dedupe', dedupe_key='test:dedupe')
+    db.session.commit()
+    job = jobs.claim_job('worker-1')
+
+    jobs.run_job(job, 'worker-1')
+
+    assert statuses() == [(job.id, 'queued')]
+
+
+def test_secret_payload_is_cleared_when_finished(app, monkeypatch):
+    monkeypatch.setitem(jobs._handlers, 'test.secret', jobs.Handler(lambda token: None, None, jobs.PRIORITY_NORMAL, True))
+    jobs.enqueue('test.secret', {'token': 'abc'})
+    db.session.commit()
+
+    jobs.run_job(jobs.claim_job('worker-1'), 'worker-1')
+
+    assert db.session.execute(db.select(Job.status, Job.payload)).one() == ('done', {})
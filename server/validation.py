@@ -0,0 +1,282 @@
+"""
+Declarative request validation
+
+A Schema lists a payload's fields and the checks each value must pass. It
+is composed once, when this module is imported, into one validator closure
+over flat tuples of keys, messages and check constants, which tests each
+check's kind inline rather than calling a function per check.
+
+Errors match the hand-written checks they replace: missing required fields
+are reported before invalid values, and otherwise the first failing check,
+in field order, wins. Keys absent from the payload are only checked for
+presence, which is what partial updates (PATCH) need.
+"""
+from datetime import datetime
+import re
+
+VALID_STATUSES = ('Completed', 'Attempted', 'Skipped')
+
+NOTES_MAX_LENGTH = 10000
+
+MAX_TAGS_PER_PROBLEM = 20
+TAG_MAX_LENGTH = 50
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+
+def validate_date_format(date_string):
+    """Validate and parse ISO date format"""
+    try:
+        return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+
+
+# Checks: a kind the validator tests inline, a constant and the error
+# message. VALID and ERROR_OF call their constant: a predicate true for a
+# valid value, or a function returning the error message or None
+
+ONE_OF = 'one_of'
+STRING = 'string'
+MAX_LENGTH = 'max_length'
+POSITIVE_INT = 'positive_int'
+POSITIVE_ID = 'positive_id'
+ISO_DATETIME = 'iso_datetime'
+VALID = 'valid'
+ERROR_OF = 'error_of'
+
+
+class Check:
+    """One test of a value, by kind"""
+
+    def __init__(self, kind, message, constant=None):
+        self.kind = kind
+        self.message = message
+        self.constant = constant
+
+
+def one_of(choices, message):
+    return Check(ONE_OF, message, frozenset(choices))
+
+
+def string(message):
+    return Check(STRING, message)
+
+
+def max_length(limit, message):
+    return Check(MAX_LENGTH, message, limit)
+
+
+def positive_int(message):
+    return Check(POSITIVE_INT, message)
+
+
+def positive_id(message):
+    """A row id: an int of at least 1 or its decimal string, as a <select> sends it, but not a bool"""
+    return Check(POSITIVE_ID, message)
+
+
+def iso_datetime(message):
+    return Check(ISO_DATETIME, message)
+
+
+def _is_email(v):
+    return v.__class__ is str and EMAIL_PATTERN.match(v.strip().lower()) is not None
+
+
+def email_address(message):
+    """Checked as stored: stripped and lowercased"""
+    return Check(VALID, message, _is_email)
+
+
+def error_of(fn):
+    """A check that is a function returning the error message or None"""
+    return Check(ERROR_OF, None, fn)
+
+
+# Whether a string is an ISO 8601 date. Clients send the same few dates
+# (the web client sends today's), so each is parsed once; the cache starts
+# over when it holds DATE_CACHE_SIZE strings
+DATE_CACHE_SIZE = 1024
+_parsed_dates = {}
+
+
+# Password rules, checked from one set of the password's characters
+PASSWORD_MIN_LENGTH = 8
+PASSWORD_MAX_LENGTH = 128
+UPPERCASE = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+LOWERCASE = frozenset('abcdefghijklmnopqrstuvwxyz')
+ASCII_DIGITS = frozenset('0123456789')
+SPECIAL_CHARACTERS = frozenset('!@#$%^&*(),.?":{}|<>')
+COMMON_PASSWORDS = frozenset(['Password123!', 'Welcome123!', 'Qwerty123!', 'Admin123!'])
+
+
+def password_error(password):
+    """The first password strength rule password breaks, or None"""
+    if len(password) < PASSWORD_MIN_LENGTH:
+        return 'Password must be at least 8 characters long'
+    if len(password) > PASSWORD_MAX_LENGTH:
+        return 'Password cannot exceed 128 characters'
+
+    characters = set(password)
+    if characters.isdisjoint(UPPERCASE):
+        return 'Password must contain at least one uppercase letter'
+    if characters.isdisjoint(LOWERCASE):
+        return 'Password must contain at least one lowercase letter'
+    # Any Unicode decimal digit counts, as with the \d this replaces
+    if characters.isdisjoint(ASCII_DIGITS) and not any(c.isdecimal() for c in characters):
+        return 'Password must contain at least one number'
+    if characters.isdisjoint(SPECIAL_CHARACTERS):
+        return 'Password must contain at least one special character (!@#$%^&*(),.?":{}|<>)'
+    if password in COMMON_PASSWORDS:
+        return 'This password is too common. Please choose a stronger password'
+    return None
+
+
+def tags_error(tags):
+    """A problem's tags: a list of at most 20 non-empty names of at most 50 characters"""
+    if not isinstance(tags, list) or len(tags) > MAX_TAGS_PER_PROBLEM:
+        return f'tags must be a list of at most {MAX_TAGS_PER_PROBLEM} names'
+    for tag in tags:
+        if not isinstance(tag, str) or not tag.strip() or len(tag) > TAG_MAX_LENGTH:
+            return f'Each tag must be a non-empty name of at most {TAG_MAX_LENGTH} characters'
+    return None
+
+
+class Field:
+    """One payload key: whether it must be present (and truthy) and the checks its value must pass"""
+
+    def __init__(self, key, *checks, required=False):
+        self.key = key
+        self.checks = checks
+        self.required = required
+
+
+class Schema:
+    """
+    A list of fields composed into one validate(payload) function
+    missing_message: error for any missing required field, instead of naming it
+    """
+
+    def __init__(self, *fields, missing_message=None):
+        self.keys = tuple(field.key for field in fields)
+        self.validate = _compose(fields, missing_message)
+
+
+def _compose(fields, missing_message):
+    """
+    Build the validator once: presence of the required keys first, then every
+    check in field order, tested inline by kind, with keys, messages and
+    constants bound in the closure. Required keys are present by the time
+    their checks run; optional keys are only checked if sent, which keeps
+    sparse PATCH bodies cheap
+    """
+    required = tuple(
+        (field.key, missing_message or f'Missing required field: {field.key}')
+        for field in fields if field.required
+    )
+    checks = tuple(
+        (field.key, (check.kind, check.constant, check.message))
+        for field in fields for check in field.checks
+    )
+
+    def validate(payload):
+        if payload.__class__ is not dict:
+            return 'Request body must be a JSON object'
+        for key, message in required:
+            if not payload.get(key):
+                return message
+        for key, check in checks:
+            if key not in payload:
+                continue
+            v = payload[key]
+            kind, c, message = check
+            # Tested inline, most common kinds first, so a check costs no function call
+            if kind is ONE_OF:
+                if v.__class__ is str and v in c:
+                    continue
+            elif kind is ISO_DATETIME:
+                # As validate_date_format, but a value that isn't a string fails without raising
+                if v.__class__ is str:
+                    valid = _parsed_dates.get(v)
+                    if valid is None:
+                        if len(_parsed_dates) >= DATE_CACHE_SIZE:
+                            _parsed_dates.clear()
+                        valid = _parsed_dates[v] = validate_date_format(v) is not None
+                    if valid:
+                        continue
+            elif kind is POSITIVE_INT:
+                if isinstance(v, int) and v >= 1:
+                    continue
+            elif kind is MAX_LENGTH:
+                if v.__class__ is not str or len(v) <= c:
+                    continue
+            elif kind is POSITIVE_ID:
+                if v.__class__ is int:
+                    if v >= 1:
+                        continue
+                elif v.__class__ is str and len(v) <= 18 and v.isascii() and v.isdigit() and int(v) >= 1:
+                    continue
+            elif kind is STRING:
+                if v.__class__ is str:
+                    continue
+            elif kind is VALID:
+                if c(v):
+                    continue
+            else:
+                message = c(v)
+                if message is None:
+                    continue
+            return message
+        return None
+    return validate
+
+
+# Schemas shared by the single and batch endpoints
+
+STATUS_CHECK = one_of(VALID_STATUSES, f'Invalid status. Must be one of: {", ".join(VALID_STATUSES)}')
+NUM_ATTEMPTS_CHECK = positive_int('num_attempts must be a positive integer')
+NOTES_CHECK = max_length(NOTES_MAX_LENGTH, 'Notes cannot exceed 10,000 characters')
+
+PROBLEM_CREATE = Schema(
+    Field('problem_name', required=True),
+    Field('problem_link', required=True),
+    Field('difficulty', required=True),
+    Field('category', required=True),
+    Field('tags', error_of(tags_error)),
+)
+
+PROBLEM_UPDATE = Schema(
+    Field('tags', error_of(tags_error)),
+)
+
+USER_PROBLEM_CREATE = Schema(
+    Field('problem_id', positive_id('problem_id must be a positive integer'), required=True),
+    Field('date_attempted', iso_datetime('Invalid date format. Use ISO 8601 format (e.g., 2024-01-15T10:30:00)'), required=True),
+    Field('status', STATUS_CHECK, required=True),
+    Field('num_attempts', NUM_ATTEMPTS_CHECK),
+    Field('notes', NOTES_CHECK),
+)
+
+USER_PROBLEM_UPDATE = Schema(
+    Field('date_attempted', iso_datetime('Invalid date format. Use ISO 8601 format')),
+    Field('status', STATUS_CHECK),
+    Field('num_attempts', NUM_ATTEMPTS_CHECK),
+    Field('notes', NOTES_CHECK),
+)
+
+USER_PROBLEM_ATTEMPT = Schema(
+    Field('date_attempted', iso_datetime('Invalid date format. Use ISO 8601 format')),
+    Field('status', STATUS_CHECK),
+)
+
+NOTES_AUTOSAVE = Schema(
+    Field('notes', string('notes must be a string'), NOTES_CHECK),
+)
+
+REGISTRATION = Schema(
+    Field('email', email_address('Invalid email format'), required=True),
+    Field('password', error_of(password_error), required=True),
+    Field('user_name', required=True),
+    missing_message='Email, password, and user_name are required',
+)
@@ -0,0 +1,12 @@
+"""
+WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is created when this module is imported. With gunicorn's
+preload_app (gunicorn.conf.py) that happens once in the master, before the
+workers fork.
+"""
+from app import create_app
+
+app = create_app()